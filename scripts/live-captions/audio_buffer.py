@@ -0,0 +1,95 @@
+"""
+In-memory audio buffering for the live captions pipeline.
+Holds 16 kHz mono float32 samples in a preallocated ring so windows can be
+handed to Whisper as zero-copy views.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # s16le
+
+
+class PcmRingBuffer:
+    """Fixed-capacity ring of float32 samples addressed by absolute sample offset.
+
+    Every sample is written twice (at i and i + capacity) so any window of up to
+    `capacity` samples is contiguous in memory and can be returned as a view.
+    """
+
+    def __init__(self, capacity_seconds: float = 120.0, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._data = np.zeros(self.capacity * 2, dtype=np.float32)
+        self.total = 0  # Samples written since the stream started
+
+    @property
+    def oldest(self) -> int:
+        """Absolute offset of the oldest sample still held in the ring."""
+        return max(0, self.total - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        """Append samples (int16 or float32) to the ring."""
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        if len(samples) > self.capacity:
+            # Only the most recent `capacity` samples can be kept anyway
+            self.total += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+
+        pos = self.total % self.capacity
+        n = len(samples)
+        first = min(n, self.capacity - pos)
+        self._data[pos:pos + first] = samples[:first]
+        self._data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        if first < n:
+            rest = n - first
+            self._data[:rest] = samples[first:]
+            self._data[self.capacity:self.capacity + rest] = samples[first:]
+        self.total += n
+
+    def write_pcm16(self, data: memoryview):
+        """Append raw s16le bytes to the ring."""
+        self.write(np.frombuffer(data, dtype='<i2'))
+
+    def view(self, start: int, end: int) -> Optional[np.ndarray]:
+        """Return a view of samples [start, end), or None if they were already overwritten."""
+        if start < self.oldest or end > self.total or end <= start:
+            return None
+        pos = start % self.capacity
+        return self._data[pos:pos + (end - start)]
+
+
+@dataclass
+class AudioChunk:
+    """A window of ingested audio, addressed by absolute sample offsets in a ring."""
+    ring: PcmRingBuffer
+    start: int
+    end: int
+    seq: int = 0
+    stream_id: str = ''
+    next_start: Optional[int] = None  # Where the following window starts, if it overlaps this one
+    marks: dict[str, float] = field(default_factory=dict)  # Pipeline stage -> time.monotonic()
+
+    @property
+    def start_seconds(self) -> float:
+        return self.start / self.ring.sample_rate
+
+    @property
+    def end_seconds(self) -> float:
+        return self.end / self.ring.sample_rate
+
+    @property
+    def stable_until_seconds(self) -> float:
+        """Stream time up to which no later window will re-transcribe this audio."""
+        return min(self.end, self.next_start if self.next_start is not None else self.end) / self.ring.sample_rate
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) / self.ring.sample_rate
+
+    def samples(self) -> Optional[np.ndarray]:
+        return self.ring.view(self.start, self.end)
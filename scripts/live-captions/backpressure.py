@@ -0,0 +1,184 @@
+"""
+Overload handling for the live captions pipeline.
+When inference is slower than real time, queued chunks are merged into fewer,
+longer windows or the engine steps down a quality ladder (greedy decoding,
+then smaller models) driven by the measured real-time factor, and steps back
+up once the backlog has cleared.
+"""
+
+import sys
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from audio_buffer import AudioChunk
+from engines import AsrEngine, MAX_BATCH_ITEM_SECONDS, TranscriptionResult
+
+# drop-oldest: shed the oldest queued chunk; merge: decode the two oldest as one window;
+# degrade: like drop-oldest, plus cheaper decoding while the model is behind
+OVERLOAD_POLICIES = ('drop-oldest', 'merge', 'degrade')
+
+# Whisper sizes from most to least expensive
+MODEL_LADDER = ('large', 'medium', 'small', 'base', 'tiny')
+
+
+def merge_chunks(older: AudioChunk, newer: AudioChunk) -> Optional[AudioChunk]:
+    """One window covering both chunks, or None if it would not fit in a single decode.
+
+    The merged chunk takes the newer sequence number (the older one counts as dropped)
+    and keeps the older queue time, so latency is still measured from the first chunk.
+    """
+    if older.ring is not newer.ring or (newer.end - older.start) / newer.ring.sample_rate > MAX_BATCH_ITEM_SECONDS:
+        return None
+    return AudioChunk(newer.ring, older.start, newer.end, newer.seq, newer.stream_id,
+                      next_start=newer.next_start, marks=dict(older.marks))
+
+
+def smaller_models(model_size: str, min_model: str = 'tiny') -> list[str]:
+    """Cheaper sizes below model_size down to min_model, keeping an '.en' suffix."""
+    base, suffix = (model_size[:-3], '.en') if model_size.endswith('.en') else (model_size, '')
+    family = next((size for size in MODEL_LADDER if base.startswith(size)), None)
+    if family is None or min_model not in MODEL_LADDER:
+        return []  # A local path or unknown size; only the beam can be reduced
+    lower = MODEL_LADDER[MODEL_LADDER.index(family) + 1:MODEL_LADDER.index(min_model) + 1]
+    return [size + suffix for size in lower]
+
+
+class AdaptiveEngine(AsrEngine):
+    """Wraps an engine and trades accuracy for speed while transcription falls behind.
+
+    Levels run from the configured model and beam, through greedy decoding, to smaller
+    models. The controller steps down when the smoothed real-time factor times the number
+    of streams sharing the model exceeds high_load, or the backlog reaches max_backlog;
+    it steps back up after `patience` results with an empty backlog and load below low_load.
+    A smaller model is loaded in a background thread when the controller first wants it, and
+    the current level keeps transcribing until it is ready; it is kept once loaded. A model
+    that fails to load is dropped from the ladder.
+    """
+    name = 'adaptive'
+
+    def __init__(self, engine: AsrEngine, load: Callable[[str], AsrEngine], min_model: str = 'tiny',
+                 high_load: float = 0.9, low_load: float = 0.4, max_backlog: int = 2, patience: int = 5):
+        self.engines = {engine.model_size: engine}
+        self.load = load
+        beam = getattr(engine, 'beam_size', None)
+        self.levels: list[tuple[str, Optional[int]]] = [(engine.model_size, beam)]
+        if beam not in (None, 1):
+            self.levels.append((engine.model_size, 1))
+        self.levels += [(size, 1) for size in smaller_models(engine.model_size, min_model)]
+        self.high_load = high_load
+        self.low_load = low_load
+        self.max_backlog = max_backlog
+        self.patience = patience
+        self.backlog: Callable[[], int] = lambda: 0
+        self.streams = 1
+        self.level = 0
+        self.rtf: Optional[float] = None  # Smoothed real-time factor at the current level
+        self._calm = 0
+        self._observed = 0  # Results measured at the current level
+        self._loading: set[str] = set()  # Sizes being loaded in the background
+        self._lock = threading.Lock()
+
+    def attach(self, backlog: Callable[[], int], streams: int):
+        """Give the controller the queue depth and the number of streams sharing this engine."""
+        self.backlog = backlog
+        self.streams = max(1, streams)
+
+    @property
+    def model_size(self) -> str:
+        return self.levels[self.level][0]
+
+    @property
+    def n_mels(self) -> Optional[int]:
+        # Smaller models may take fewer bands (large-v3 has 128); they ignore features that do not fit
+        return self.engines[self.levels[0][0]].n_mels
+
+    def describe(self, level: Optional[int] = None) -> str:
+        size, beam = self.levels[self.level if level is None else level]
+        return f"{size} ({'greedy' if beam in (None, 1) else f'beam {beam}'})"
+
+    def transcribe(self, audio, language: Optional[str] = 'en', initial_prompt: Optional[str] = None,
+                   word_timestamps: bool = False, features: Optional[np.ndarray] = None) -> TranscriptionResult:
+        result = self._current().transcribe(audio, language=language, initial_prompt=initial_prompt,
+                                            word_timestamps=word_timestamps, features=features)
+        self.observe([result])
+        return result
+
+    def transcribe_batch(self, audios: list[np.ndarray], language: Optional[str] = 'en', word_timestamps: bool = False,
+                         features: Optional[list[Optional[np.ndarray]]] = None) -> list[TranscriptionResult]:
+        results = self._current().transcribe_batch(audios, language=language, word_timestamps=word_timestamps,
+                                                   features=features)
+        self.observe(results)
+        return results
+
+    def _current(self) -> AsrEngine:
+        with self._lock:
+            size, beam = self.levels[self.level]
+            engine = self.engines[size]  # _set_level only moves to loaded models
+            if hasattr(engine, 'beam_size'):
+                engine.beam_size = beam
+            return engine
+
+    def observe(self, results: list[TranscriptionResult]):
+        """Update the smoothed real-time factor and move one level down or up if needed."""
+        with self._lock:
+            for result in results:
+                if result.audio_seconds <= 0:
+                    continue
+                rtf = result.real_time_factor
+                self.rtf = rtf if self.rtf is None else self.rtf + 0.3 * (rtf - self.rtf)
+            if self.rtf is None:
+                return
+            self._observed += 1
+            load = self.rtf * self.streams
+            backlog = self.backlog()
+            # The backlog takes a while to drain, so give each level a couple of results before going lower
+            settled = self._observed >= 2
+            if (load > self.high_load or backlog >= self.max_backlog) and settled and self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1, f"load {load:.2f}, backlog {backlog}")
+            elif backlog == 0 and load < self.low_load and self.level > 0:
+                self._calm += 1
+                if self._calm >= self.patience:
+                    self._set_level(self.level - 1, f"load {load:.2f}, backlog cleared")
+            else:
+                self._calm = 0
+
+    def _load_in_background(self, size: str):
+        """Load a fallback model off the transcription path; call with the lock held."""
+        if size in self._loading:
+            return
+        self._loading.add(size)
+        print(f"[Info] Loading fallback model '{size}' in the background...")
+
+        def load():
+            try:
+                engine = self.load(size)
+            except Exception as e:
+                print(f"[Warning] Could not load fallback model '{size}' ({e}); removing it from the ladder",
+                      file=sys.stderr)
+                with self._lock:
+                    current = self.levels[self.level]
+                    self.levels = [level for level in self.levels if level[0] != size]
+                    self.level = self.levels.index(current)
+                    self._loading.discard(size)
+                return
+            with self._lock:
+                self.engines[size] = engine
+                self._loading.discard(size)
+            print(f"[Info] Fallback model '{size}' ready")
+
+        threading.Thread(target=load, name=f"load-{size}", daemon=True).start()
+
+    def _set_level(self, level: int, reason: str):
+        size = self.levels[level][0]
+        if size not in self.engines:
+            # Keep the current level until the model is loaded; the next result that is still behind moves
+            self._load_in_background(size)
+            return
+        direction = "Falling behind" if level > self.level else "Caught up"
+        print(f"[Info] {direction} ({reason}); switching to {self.describe(level)}")
+        self.level = level
+        self.rtf = None  # The new level has its own speed
+        self._calm = 0
+        self._observed = 0
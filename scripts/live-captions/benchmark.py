@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the live captions pipeline.
+Feeds local WAV/PCM fixtures through the same ring, chunker, scheduler and
+stitcher as live streams and reports real-time factor, caption latency
+percentiles, peak RSS and word error rate against reference transcripts.
+Runs without network access, so it can gate changes in CI.
+
+Fixtures are 16 kHz mono 16-bit files (name.wav or raw s16le name.pcm) with an
+optional reference transcript next to them (name.txt).
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# Never reach out to the model hub; models must already be cached or given as local paths
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+from backpressure import AdaptiveEngine, OVERLOAD_POLICIES
+from engines import ENGINES, load_engine
+from ingest import ReplaySource
+from metrics import PipelineMetrics, percentile
+from session import CaptionSession
+from stitching import normalize_word
+from worker_pool import TranscriptionPool
+
+FIXTURE_SUFFIXES = ('.wav', '.pcm')
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref = [w for w in map(normalize_word, reference.split()) if w]
+    hyp = [w for w in map(normalize_word, hypothesis.split()) if w]
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process plus finished children (worker processes), in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def find_fixtures(paths: list[str]) -> list[Path]:
+    fixtures = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            fixtures.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in FIXTURE_SUFFIXES))
+        else:
+            fixtures.append(path)
+    return fixtures
+
+
+def fixture_seconds(path: Path) -> float:
+    header = 44 if path.suffix.lower() == '.wav' else 0  # Canonical WAV header; close enough for reporting
+    return max(0, path.stat().st_size - header) / 2 / 16000
+
+
+def run_session(model, fixtures: list[Path], args, pool: Optional[TranscriptionPool] = None) -> tuple[dict, PipelineMetrics, float]:
+    """Replay fixtures as concurrent streams of one session; return (captions per fixture, metrics, wall seconds)."""
+    captions = {fixture.stem: [] for fixture in fixtures}
+    metrics = PipelineMetrics(window=100000)  # Keep every sample for exact percentiles
+
+    session = CaptionSession(model, lambda stream_id, text: captions[stream_id].append(text),
+                             batch_size=args.batch_size, batch_wait=args.batch_wait_ms / 1000,
+                             pool=pool, metrics=metrics, max_queue=args.max_queue or None, overload=args.overload,
+                             feature_cache=not args.no_feature_cache)
+    for fixture in fixtures:
+        session.add_stream(fixture.stem, lambda ring, on_samples, path=str(fixture): ReplaySource(path, ring, on_samples, speed=args.speed),
+                           chunk_duration=args.chunk_duration, overlap=args.overlap, vad=args.vad,
+                           streaming=args.streaming, step=args.step, max_restarts=1,
+                           # Unpaced replay must wait for the worker instead of overwriting queued windows
+                           max_pending=1 if args.speed <= 0 else None)
+    started = time.perf_counter()
+    session.run()
+    return {name: ' '.join(texts) for name, texts in captions.items()}, metrics, time.perf_counter() - started
+
+
+def report(fixtures: list[Path], runs: list[tuple[dict, PipelineMetrics, float]]) -> dict:
+    """Summarize one or more sessions (sequential runs add up their wall time)."""
+    captions = {name: text for run_captions, _, _ in runs for name, text in run_captions.items()}
+    streams = {name: values for _, metrics, _ in runs for name, values in metrics.snapshot()['streams'].items()}
+    latencies = [value for _, metrics, _ in runs for value in metrics.latencies()]
+    wall_seconds = sum(wall for _, _, wall in runs)
+    audio_seconds = sum(fixture_seconds(f) for f in fixtures)
+    results = {}
+    for fixture in fixtures:
+        reference_path = fixture.with_suffix('.txt')
+        reference = reference_path.read_text() if reference_path.exists() else None
+        stream = streams.get(fixture.stem, {})
+        results[fixture.stem] = {
+            'audio_seconds': round(fixture_seconds(fixture), 3),
+            'chunks': stream.get('chunks', 0),
+            'dropped_chunks': stream.get('dropped_chunks', 0),
+            'inference_rtf': stream.get('real_time_factor', 0.0),
+            'wer': round(word_error_rate(reference, captions[fixture.stem]), 4) if reference is not None else None,
+            'transcript': captions[fixture.stem],
+        }
+    scored = [r['wer'] for r in results.values() if r['wer'] is not None]
+    return {
+        'fixtures': results,
+        'audio_seconds': round(audio_seconds, 3),
+        'wall_seconds': round(wall_seconds, 3),
+        # Wall time per audio second for the whole replay; only meaningful for unpaced runs
+        'real_time_factor': round(wall_seconds / audio_seconds, 4) if audio_seconds > 0 else 0.0,
+        'latency_p50': round(percentile(latencies, 0.5), 4),
+        'latency_p90': round(percentile(latencies, 0.9), 4),
+        'latency_p99': round(percentile(latencies, 0.99), 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        # Each fixture counts equally, so one long recording does not hide regressions on short ones
+        'wer': round(sum(scored) / len(scored), 4) if scored else None,
+    }
+
+
+def check_thresholds(summary: dict, args) -> list[str]:
+    failures = []
+    limits = [('real_time_factor', args.max_rtf), ('latency_p90', args.max_latency_p90),
+              ('peak_rss_mb', args.max_rss_mb), ('wer', args.max_wer)]
+    for key, limit in limits:
+        if limit is not None and summary[key] is not None and summary[key] > limit:
+            failures.append(f"{key} {summary[key]} exceeds {limit}")
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay local audio fixtures through the captions pipeline and measure it")
+    parser.add_argument('fixtures', nargs='+', help="Fixture files or directories (16 kHz mono 16-bit .wav or raw s16le .pcm, reference in .txt)")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="0 replays as fast as the pipeline accepts audio; 1 paces at real time (latency as on a live stream)")
+    parser.add_argument('--concurrent', action='store_true', help="Replay all fixtures at once as separate streams sharing the model")
+    parser.add_argument('--engine', choices=list(ENGINES), default='whisper')
+    parser.add_argument('--model', default='base', help="Model size or a local model path; nothing is downloaded")
+    parser.add_argument('--compute-type', default='int8', help="faster-whisper weight type")
+    parser.add_argument('--threads', type=int, default=0, help="Intra-op CPU threads per inference (0 = library default)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each with its own model replica")
+    parser.add_argument('--chunk-duration', type=int, default=15)
+    parser.add_argument('--overlap', type=float, default=0.1)
+    parser.add_argument('--vad', action='store_true')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--step', type=float, default=1.0)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--batch-wait-ms', type=int, default=200)
+    parser.add_argument('--max-queue', type=int, default=3, help="Max chunks waiting per stream (paced replay only)")
+    parser.add_argument('--overload', choices=OVERLOAD_POLICIES, default='drop-oldest')
+    parser.add_argument('--no-feature-cache', action='store_true',
+                        help="Let the engine compute log-mel features per window instead of reusing incremental ones")
+    parser.add_argument('--json', help="Write the full report to this file")
+    parser.add_argument('--max-rtf', type=float, help="Fail if the replay real-time factor exceeds this")
+    parser.add_argument('--max-latency-p90', type=float, help="Fail if p90 caption latency (seconds) exceeds this")
+    parser.add_argument('--max-rss-mb', type=float, help="Fail if peak RSS exceeds this")
+    parser.add_argument('--max-wer', type=float, help="Fail if the mean word error rate exceeds this")
+    args = parser.parse_args()
+    if args.streaming and args.vad:
+        parser.error("--streaming and --vad cannot be combined")
+    if args.workers > 1 and (args.streaming or args.batch_size > 1):
+        parser.error("--workers cannot be combined with --streaming or --batch-size")
+    if args.workers > 1 and args.overload == 'degrade':
+        parser.error("--overload degrade needs the in-process model")
+    return args
+
+
+def main():
+    args = parse_args()
+    fixtures = find_fixtures(args.fixtures)
+    if not fixtures:
+        print("Error: no .wav or .pcm fixtures found.", file=sys.stderr)
+        sys.exit(2)
+
+    model = None
+    pool = None
+    try:
+        if args.workers > 1:
+            pool = TranscriptionPool(args.engine, args.model, processes=args.workers, threads_per_worker=args.threads,
+                                     compute_type=args.compute_type)
+        else:
+            model = load_engine(args.engine, args.model, compute_type=args.compute_type, threads=args.threads)
+            if args.overload == 'degrade':
+                model = AdaptiveEngine(model, lambda size: load_engine(args.engine, size, compute_type=args.compute_type,
+                                                                       threads=args.threads))
+    except Exception as e:
+        print(f"Error loading {args.engine} model: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.concurrent or pool:
+        # A session shuts its pool down when it ends, so pool runs replay everything in one session
+        runs = [run_session(model, fixtures, args, pool=pool)]
+    else:
+        runs = [run_session(model, [fixture], args) for fixture in fixtures]
+    summary = report(fixtures, runs)
+
+    for name, result in summary['fixtures'].items():
+        wer = f"{result['wer']:.1%}" if result['wer'] is not None else "n/a"
+        print(f"{name}: {result['audio_seconds']:.1f}s audio, {result['chunks']} chunks ({result['dropped_chunks']} dropped), "
+              f"inference RTF {result['inference_rtf']:.3f}, WER {wer}")
+    print(f"\nTotal: {summary['audio_seconds']:.1f}s audio in {summary['wall_seconds']:.1f}s "
+          f"(RTF {summary['real_time_factor']:.3f})")
+    print(f"Caption latency p50/p90/p99: {summary['latency_p50']:.2f}s / {summary['latency_p90']:.2f}s / {summary['latency_p99']:.2f}s")
+    print(f"Peak RSS: {summary['peak_rss_mb']:.0f} MiB")
+    if summary['wer'] is not None:
+        print(f"Mean WER: {summary['wer']:.1%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    failures = check_thresholds(summary, args)
+    for failure in failures:
+        print(f"[Error] Regression: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Thin client for the live captions daemon.
+Starts and stops captioning of stream URLs and prints captions as they arrive.
+Only the standard library is imported, so attaching takes a fraction of a second;
+the model and heavy modules live in the daemon (daemon.py).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+from typing import Optional
+
+
+def default_socket_path() -> str:
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(), 'live-captions.sock')
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a Unix domain socket."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def connect(args, timeout: Optional[float] = 10.0) -> http.client.HTTPConnection:
+    if args.port:
+        return http.client.HTTPConnection('127.0.0.1', args.port, timeout=timeout)
+    return UnixHTTPConnection(args.socket, timeout=timeout)
+
+
+def request(args, method: str, path: str, body: Optional[dict] = None) -> dict:
+    """Send one request and return the decoded JSON reply; exit with the daemon's error otherwise."""
+    conn = connect(args)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        reply = json.loads(response.read() or b'{}')
+    except (ConnectionError, FileNotFoundError, socket.timeout) as e:
+        print(f"Error: cannot reach the captions daemon ({e}). Start it with: python daemon.py", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+    if response.status >= 400:
+        print(f"Error: {reply.get('error', response.reason)}", file=sys.stderr)
+        sys.exit(1)
+    return reply
+
+
+def attach(args, stream_id: Optional[str]):
+    """Print caption events until the stream ends (or forever for all streams)."""
+    conn = connect(args, timeout=None)
+    path = f"/streams/{stream_id}/captions" if stream_id else "/captions"
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        if response.status >= 400:
+            print(f"Error: {json.loads(response.read() or b'{}').get('error', response.reason)}", file=sys.stderr)
+            sys.exit(1)
+        show_partials = sys.stdout.isatty()
+        for line in response:
+            if not line.strip():
+                continue  # Keep-alive
+            event = json.loads(line)
+            prefix = "" if stream_id else f"[{event['stream']}] "
+            if event['type'] == 'caption':
+                if show_partials:
+                    print("\r\033[K", end="")  # Replace the partial caption line
+                print(f"[{event['clock']}] {prefix}{event['text']}", flush=True)
+            elif event['type'] == 'update':
+                if show_partials:
+                    print("\r\033[K", end="")
+                print(f"[{event['clock']}] {prefix}* {event['text']}", flush=True)
+            elif event['type'] == 'partial' and show_partials:
+                print(f"\r\033[K{prefix}~ {event['text']}", end="", flush=True)
+            elif event['type'] == 'ended':
+                print(f"\n[Info] {prefix}Stream ended.")
+                if stream_id:
+                    break
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"Error: cannot reach the captions daemon ({e}).", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Control the live captions daemon")
+    parser.add_argument('--socket', default=default_socket_path(), help="Daemon Unix socket path")
+    parser.add_argument('--port', type=int, help="Talk to a daemon listening on http://127.0.0.1:PORT instead")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('start', help="Start captioning a URL")
+    start.add_argument('url')
+    start.add_argument('--id', help="Stream id (default: assigned by the daemon)")
+    start.add_argument('--vad', action='store_true', default=None, help="Only transcribe speech, cut at pauses")
+    start.add_argument('--streaming', action='store_true', default=None, help="Show partial captions from a growing window")
+    start.add_argument('--follow', '-f', action='store_true', help="Attach and print captions after starting")
+
+    stop = commands.add_parser('stop', help="Stop captioning a stream")
+    stop.add_argument('stream_id')
+
+    attach_cmd = commands.add_parser('attach', help="Print captions of one stream, or of every stream")
+    attach_cmd.add_argument('stream_id', nargs='?')
+
+    commands.add_parser('list', help="List streams")
+    commands.add_parser('status', help="Show daemon status")
+    commands.add_parser('shutdown', help="Stop the daemon")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.command == 'start':
+        body = {'url': args.url}
+        for key in ('id', 'vad', 'streaming'):
+            if getattr(args, key) is not None:
+                body[key] = getattr(args, key)
+        stream = request(args, 'POST', '/streams', body)
+        print(f"Started {stream['id']}: {stream['url']}")
+        if args.follow:
+            attach(args, stream['id'])
+    elif args.command == 'stop':
+        request(args, 'DELETE', f"/streams/{args.stream_id}")
+        print(f"Stopped {args.stream_id}")
+    elif args.command == 'attach':
+        attach(args, args.stream_id)
+    elif args.command == 'list':
+        streams = request(args, 'GET', '/streams')['streams']
+        if not streams:
+            print("No streams.")
+        for stream in streams:
+            state = 'running' if stream['running'] else 'ended'
+            print(f"{stream['id']}\t{state}\t{stream['url']}")
+    elif args.command == 'status':
+        print(json.dumps(request(args, 'GET', '/status'), indent=2))
+    elif args.command == 'shutdown':
+        request(args, 'POST', '/shutdown')
+        print("Daemon is shutting down.")
+
+
+if __name__ == "__main__":
+    main()
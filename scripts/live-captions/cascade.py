@@ -0,0 +1,95 @@
+"""
+Two-tier caption cascade for the live captions pipeline.
+A small draft model captions the stream right away; every committed draft
+segment is re-transcribed by a larger model in low-priority worker processes
+and, once ready, replaces the draft as an update. When the correction workers
+are saturated, drafts are simply left as they are.
+"""
+
+import sys
+import threading
+from typing import Callable
+
+from audio_buffer import SAMPLE_RATE, PcmRingBuffer
+from engines import TranscriptionResult
+from outputs import CaptionSegment
+from stitching import normalize_word
+from worker_pool import TranscriptionPool
+
+# Seconds of audio around a segment given to the correction model for context
+CONTEXT_SECONDS = 1.0
+
+UpdateCallback = Callable[[CaptionSegment, CaptionSegment], None]  # (draft, corrected)
+
+
+def words_in_span(result: TranscriptionResult, start: float, end: float) -> str:
+    """Text of the words whose midpoint lies in [start, end) (seconds into the transcribed audio).
+
+    Falls back to the whole text when the engine returned no word timings.
+    """
+    words = [word for segment in result.segments for word in segment.words]
+    if not words:
+        return result.text.strip()
+    return ''.join(word.text for word in words if start <= (word.start + word.end) / 2 < end).strip()
+
+
+def same_words(a: str, b: str) -> bool:
+    return [w for w in map(normalize_word, a.split()) if w] == [w for w in map(normalize_word, b.split()) if w]
+
+
+class CascadeCorrector:
+    """Re-transcribes draft caption segments with a larger model and reports the corrections.
+
+    The pool's workers should run at a lower priority (TranscriptionPool(nice=...)) so the
+    draft path keeps its latency. A segment is corrected only if a worker slot is free when
+    it is committed; otherwise it is skipped and its draft stays final.
+    """
+
+    def __init__(self, pool: TranscriptionPool, on_update: UpdateCallback, context: float = CONTEXT_SECONDS):
+        self.pool = pool
+        self.on_update = on_update
+        self.context = context
+        self.submitted = 0
+        self.corrected = 0  # Corrections that changed the text
+        self.skipped = 0  # Drafts left as they were because the workers were busy
+        self.no_audio = 0  # Drafts without an audio span left in the ring to re-transcribe
+        self._lock = threading.Lock()
+
+    def submit(self, segment: CaptionSegment, ring: PcmRingBuffer) -> bool:
+        """Queue a committed draft for correction; False if it was skipped."""
+        first = max(ring.oldest, int((segment.start - self.context) * SAMPLE_RATE))
+        last = min(ring.total, int((segment.end + self.context) * SAMPLE_RATE))
+        audio = ring.view(first, last) if segment.end > segment.start else None
+        if audio is None:
+            with self._lock:
+                self.no_audio += 1
+            return False
+        future = self.pool.submit(audio, word_timestamps=True, block=False)
+        with self._lock:
+            if future is None:
+                self.skipped += 1
+                return False
+            self.submitted += 1
+        offset = first / SAMPLE_RATE
+        future.add_done_callback(lambda f: self._on_result(f, segment, segment.start - offset, segment.end - offset))
+        return True
+
+    def _on_result(self, future, draft: CaptionSegment, start: float, end: float):
+        try:
+            text = words_in_span(future.result(), start, end)
+        except Exception as e:
+            print(f"[Warning] Correction of {draft.stream_id} caption failed: {e}", file=sys.stderr)
+            return
+        if not text or same_words(text, draft.text):
+            return
+        with self._lock:
+            self.corrected += 1
+        self.on_update(draft, CaptionSegment(draft.stream_id, text, draft.start, draft.end))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'submitted': self.submitted, 'corrected': self.corrected, 'skipped': self.skipped,
+                    'no_audio': self.no_audio}
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait)
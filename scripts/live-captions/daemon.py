@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Persistent captions daemon for the live captions pipeline.
+Loads and warms up the speech model once, then starts and stops captioning of
+stream URLs on request over a local Unix socket (or 127.0.0.1 HTTP) and
+streams caption events to attached clients (see captionctl.py).
+
+API (JSON):
+  POST   /streams                 {"url": ..., "id"?, "vad"?, "streaming"?} -> stream
+  GET    /streams                 -> {"streams": [...]}
+  DELETE /streams/<id>            stop captioning a stream
+  GET    /streams/<id>/captions   newline-delimited caption events until the stream ends
+  GET    /captions                caption events of every stream
+Caption events carry the stream time they cover ("start"/"end", seconds since the
+stream started). With --correction-model, captions are drafts and "update" events
+carry the corrected text for the same start/end. With --broadcast-port, viewers can
+also follow them over SSE and WebSocket (see outputs.BroadcastServer).
+  GET    /status, GET /metrics, POST /shutdown
+  GET    /debug/memory            RSS and the fastest-growing allocation sites (--soak)
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from captionctl import default_socket_path
+from memory import MemoryMonitor, rss_mb
+from outputs import BroadcastServer, CaptionBroadcaster, CaptionSegment
+
+# Seconds between keep-alive lines on idle caption connections
+KEEPALIVE_INTERVAL = 15.0
+
+_STREAM_ID = re.compile(r'^[\w.-]{1,64}$')
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer on a Unix domain socket."""
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class CaptionDaemon:
+    """One loaded model and caption session shared by every stream the clients start."""
+
+    def __init__(self, args):
+        self.args = args
+        self.started = time.time()
+        self.streams: dict[str, dict] = {}
+        # Each client gets a bounded buffer, so one that stopped reading cannot stall captioning
+        self.broadcaster = CaptionBroadcaster(buffer_size=256)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.stopping = threading.Event()
+        self.session = None
+        self.url_cache = None
+        self.memory = None
+        self.model_name = f"{args.engine}/{args.model}"
+
+    def load(self):
+        """Import the heavy modules, load the model and run a warm-up inference."""
+        from backpressure import AdaptiveEngine
+        from cascade import CascadeCorrector
+        from engines import load_engine
+        from metrics import PipelineMetrics
+        from resolver import StreamUrlCache
+        from session import CaptionSession
+        from worker_pool import TranscriptionPool
+
+        args = self.args
+        model = None
+        pool = None
+        started = time.perf_counter()
+        if args.workers > 1:
+            pool = TranscriptionPool(args.engine, args.model, processes=args.workers, threads_per_worker=args.threads,
+                                     compute_type=args.compute_type, num_workers=args.engine_workers)
+        else:
+            model = load_engine(args.engine, args.model, compute_type=args.compute_type,
+                                threads=args.threads, num_workers=args.engine_workers)
+            model.warm_up()
+            if args.overload == 'degrade':
+                model = AdaptiveEngine(model, lambda size: load_engine(args.engine, size, compute_type=args.compute_type,
+                                                                       threads=args.threads, num_workers=args.engine_workers),
+                                       min_model=args.min_model)
+        print(f"[Info] Model {self.model_name} ready in {time.perf_counter() - started:.1f}s")
+
+        corrector = None
+        if args.correction_model:
+            correction_pool = TranscriptionPool(args.engine, args.correction_model, processes=args.correction_workers,
+                                                threads_per_worker=args.correction_threads, nice=args.correction_nice,
+                                                compute_type=args.compute_type, num_workers=args.engine_workers)
+            corrector = CascadeCorrector(correction_pool, self._on_update)
+            self.model_name += f" (corrected by {args.correction_model})"
+
+        # Captions are published from on_segment, which also carries their stream time
+        self.session = CaptionSession(model, lambda stream_id, text: None, on_partial=self._on_partial,
+                                      batch_size=args.batch_size, batch_wait=args.batch_wait_ms / 1000,
+                                      pool=pool, metrics=PipelineMetrics(), max_queue=args.max_queue or None,
+                                      overload=args.overload, on_segment=self._on_segment, corrector=corrector)
+        self.session.start()
+        self.url_cache = StreamUrlCache()
+        threading.Thread(target=self._watch, name="stream-watch", daemon=True).start()
+        if args.soak:
+            self.memory = MemoryMonitor(interval=args.memory_interval, jsonl_path=args.memory_log)
+            self.memory.start()
+
+    def start_stream(self, url: str, stream_id: Optional[str] = None, vad: Optional[bool] = None,
+                     streaming: Optional[bool] = None) -> dict:
+        from pipeline import UrlSourceOpener
+
+        args = self.args
+        vad = args.vad if vad is None else vad
+        streaming = args.streaming if streaming is None else streaming
+        if vad and streaming:
+            raise ValueError("vad and streaming cannot be combined")
+        if streaming and self.session.pool:
+            raise ValueError("streaming needs the in-process model; the daemon runs with --workers")
+        with self._lock:
+            if stream_id is None:
+                while f"stream{self._next_id}" in self.streams:
+                    self._next_id += 1
+                stream_id = f"stream{self._next_id}"
+            elif not _STREAM_ID.match(stream_id):
+                raise ValueError(f"invalid stream id '{stream_id}'")
+            elif stream_id in self.streams:
+                raise ValueError(f"stream '{stream_id}' already exists")
+            info = {'id': stream_id, 'url': url, 'vad': vad, 'streaming': streaming, 'started': time.time()}
+            self.streams[stream_id] = info
+        self.session.add_stream(stream_id, UrlSourceOpener(url, self.url_cache.get, self.url_cache.invalidate,
+                                                           decoder=args.decoder, hot_swap=args.hot_swap),
+                                chunk_duration=args.chunk_duration, overlap=args.overlap, vad=vad,
+                                streaming=streaming, step=args.step)
+        print(f"[Info] Started {stream_id}: {url}")
+        return info
+
+    def stop_stream(self, stream_id: str):
+        with self._lock:
+            info = self.streams.pop(stream_id, None)
+            if info is None:
+                raise KeyError(stream_id)
+        self.session.remove_stream(stream_id)
+        self._release_url(info['url'])
+        self._publish(stream_id, 'ended', '')
+        print(f"[Info] Stopped {stream_id}")
+
+    def _release_url(self, url: str):
+        """Stop refreshing a URL once no running stream reads it."""
+        if not any(info['url'] == url and info['running'] for info in self.list_streams()):
+            self.url_cache.forget(url)
+
+    def list_streams(self) -> list[dict]:
+        with self._lock:
+            streams = [dict(info) for info in self.streams.values()]
+        for info in streams:
+            pipeline = self.session.pipelines.get(info['id'])
+            info['running'] = bool(pipeline and pipeline.is_alive())
+        return streams
+
+    def status(self) -> dict:
+        viewers = self.broadcaster.stats()
+        return {
+            'model': self.model_name,
+            'workers': self.args.workers,
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'streams': len(self.streams),
+            'clients': viewers['subscribers'],
+            'dropped_events': viewers['dropped_events'],
+            'rss_mb': round(rss_mb(), 1),
+            'corrections': self.session.corrector.stats() if self.session.corrector else None,
+            'metrics': self.session.metrics.snapshot()['streams'],
+        }
+
+    def shutdown(self):
+        self.stopping.set()
+        if self.session:
+            self.session.stop()
+        if self.url_cache:
+            self.url_cache.close()
+        if self.memory:
+            self.memory.stop()
+
+    def _on_segment(self, segment: CaptionSegment):
+        self._publish(segment.stream_id, 'caption', segment.text, start=segment.start, end=segment.end)
+
+    def _on_update(self, draft: CaptionSegment, corrected: CaptionSegment):
+        self._publish(corrected.stream_id, 'update', corrected.text, start=corrected.start, end=corrected.end,
+                      draft=draft.text)
+
+    def _on_partial(self, stream_id: str, text: str):
+        self._publish(stream_id, 'partial', text)
+
+    def _publish(self, stream_id: str, kind: str, text: str, **fields):
+        now = datetime.now()
+        self.broadcaster.publish({'stream': stream_id, 'type': kind, 'text': text, **fields,
+                                  'time': now.timestamp(), 'clock': now.strftime("%H:%M:%S")})
+
+    def _watch(self):
+        """Announce streams whose ingest ended on its own (e.g. the broadcast finished) and release their URLs."""
+        announced = set()
+        while not self.stopping.wait(1.0):
+            streams = self.list_streams()
+            for info in streams:
+                if not info['running'] and info['id'] not in announced:
+                    announced.add(info['id'])
+                    self._release_url(info['url'])
+                    self._publish(info['id'], 'ended', '')
+            announced &= {info['id'] for info in streams}  # Removed streams need no memory of it
+
+
+def make_handler(daemon: CaptionDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+            if not isinstance(body, dict):
+                raise ValueError("request body must be a JSON object")
+            return body
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if parts == ['streams']:
+                self._reply(200, {'streams': daemon.list_streams()})
+            elif parts == ['status']:
+                self._reply(200, daemon.status())
+            elif parts == ['metrics']:
+                data = daemon.session.metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif parts == ['captions']:
+                self._stream_captions(None)
+            elif parts == ['debug', 'memory']:
+                if daemon.memory is None:
+                    self._reply(404, {'error': "memory snapshots need --soak"})
+                else:
+                    self._reply(200, {'snapshot': daemon.memory.snapshot(), 'history': list(daemon.memory.history)})
+            elif len(parts) == 3 and parts[0] == 'streams' and parts[2] == 'captions':
+                if parts[1] not in daemon.streams:
+                    self._reply(404, {'error': f"no stream '{parts[1]}'"})
+                else:
+                    self._stream_captions(parts[1])
+            else:
+                self._reply(404, {'error': f"unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                if self.path == '/streams':
+                    body = self._body()
+                    if not isinstance(body.get('url'), str):
+                        raise ValueError("'url' is required")
+                    info = daemon.start_stream(body['url'], body.get('id'), body.get('vad'), body.get('streaming'))
+                    self._reply(201, info)
+                elif self.path == '/shutdown':
+                    self._reply(200, {})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                else:
+                    self._reply(404, {'error': f"unknown path {self.path}"})
+            except ValueError as e:
+                self._reply(400, {'error': str(e)})
+
+        def do_DELETE(self):
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'streams':
+                self._reply(404, {'error': f"unknown path {self.path}"})
+                return
+            try:
+                daemon.stop_stream(parts[1])
+                self._reply(200, {'id': parts[1]})
+            except KeyError:
+                self._reply(404, {'error': f"no stream '{parts[1]}'"})
+
+        def _stream_captions(self, stream_id: Optional[str]):
+            """Write caption events as JSON lines until the stream ends or the client goes away."""
+            events = daemon.broadcaster.subscribe(stream_id)
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                while not daemon.stopping.is_set() and not events.closed:
+                    event = events.get(timeout=KEEPALIVE_INTERVAL)
+                    if event is None:
+                        self.wfile.write(b'\n')  # Also notices clients that disconnected
+                        self.wfile.flush()
+                        continue
+                    self.wfile.write(json.dumps(event).encode() + b'\n')
+                    self.wfile.flush()
+                    if stream_id is not None and event['type'] == 'ended':
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                daemon.broadcaster.unsubscribe(events)
+
+        def log_message(self, format, *args):
+            pass  # Keep requests out of the daemon log
+
+    return Handler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Live captions daemon: load the model once, caption URLs on request")
+    parser.add_argument('--socket', default=default_socket_path(), help="Unix socket to listen on")
+    parser.add_argument('--port', type=int, help="Listen on http://127.0.0.1:PORT instead of the Unix socket")
+    parser.add_argument('--engine', default='whisper', help="Speech recognition runtime (whisper, faster-whisper)")
+    parser.add_argument('--model', default='base', help="Whisper model size (tiny, base, small, medium, large)")
+    parser.add_argument('--compute-type', default='int8', help="faster-whisper weight type (int8, int8_float32, float32)")
+    parser.add_argument('--threads', type=int, default=0, help="Intra-op CPU threads per inference (0 = library default)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each with its own model replica")
+    parser.add_argument('--engine-workers', type=int, default=1, help="Concurrent transcribe calls allowed by faster-whisper")
+    parser.add_argument('--decoder', choices=('ffmpeg', 'pyav'), default='ffmpeg',
+                        help="Decode streams in an ffmpeg subprocess or in-process with PyAV")
+    parser.add_argument('--hot-swap', action='store_true',
+                        help="Replace stalled ffmpeg readers without a gap in the audio (ffmpeg decoder)")
+    parser.add_argument('--chunk-duration', type=int, default=15, help="Seconds of audio per transcription window")
+    parser.add_argument('--overlap', type=float, default=0.1, help="Fraction of each window re-transcribed by the next one")
+    parser.add_argument('--vad', action='store_true', help="Default for new streams: only transcribe speech")
+    parser.add_argument('--streaming', action='store_true', help="Default for new streams: partial captions from a growing window")
+    parser.add_argument('--step', type=float, default=1.0, help="Seconds of new audio between incremental decodes (streaming)")
+    parser.add_argument('--batch-size', type=int, default=1, help="Max chunks decoded together, across streams")
+    parser.add_argument('--batch-wait-ms', type=int, default=200)
+    parser.add_argument('--max-queue', type=int, default=3, help="Max chunks waiting per stream (0 = unbounded)")
+    parser.add_argument('--overload', choices=('drop-oldest', 'merge', 'degrade'), default='drop-oldest')
+    parser.add_argument('--min-model', default='tiny', help="Smallest model --overload degrade may switch to")
+    parser.add_argument('--broadcast-port', type=int,
+                        help="Also serve caption events to viewers on http://127.0.0.1:PORT/events (SSE) and /ws (WebSocket)")
+    parser.add_argument('--correction-model',
+                        help="Cascade: captions from --model are drafts, re-transcribed by this larger model in "
+                             "low-priority background workers and sent again as 'update' events")
+    parser.add_argument('--correction-workers', type=int, default=1, help="Correction worker processes")
+    parser.add_argument('--correction-threads', type=int, default=0, help="Intra-op CPU threads per correction worker")
+    parser.add_argument('--correction-nice', type=int, default=10, help="Scheduling priority offset of the correction workers")
+    parser.add_argument('--soak', action='store_true',
+                        help="Long-run mode: require bounded queues and snapshot memory (tracemalloc + RSS) periodically, "
+                             "served on GET /debug/memory")
+    parser.add_argument('--memory-interval', type=float, default=300.0, help="Seconds between memory snapshots (--soak)")
+    parser.add_argument('--memory-log', help="Append memory snapshots to this JSON-lines file (--soak)")
+    args = parser.parse_args()
+    if args.soak and args.max_queue <= 0:
+        parser.error("--soak needs a bounded --max-queue")
+    if args.streaming and args.vad:
+        parser.error("--streaming and --vad cannot be combined")
+    if args.decoder == 'pyav' and importlib.util.find_spec('av') is None:
+        parser.error("--decoder pyav needs PyAV: pip install av")
+    if args.hot_swap and args.decoder != 'ffmpeg':
+        parser.error("--hot-swap supervises ffmpeg readers; use it with --decoder ffmpeg")
+    if args.workers > 1 and (args.streaming or args.batch_size > 1 or args.overload == 'degrade'):
+        parser.error("--workers cannot be combined with --streaming, --batch-size or --overload degrade")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.port:
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), None)
+        address = f"http://127.0.0.1:{args.port}"
+    else:
+        if os.path.exists(args.socket):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(args.socket)
+                print(f"Error: a daemon is already listening on {args.socket}", file=sys.stderr)
+                sys.exit(1)
+            except OSError:
+                os.unlink(args.socket)  # Left behind by a daemon that did not exit cleanly
+            finally:
+                probe.close()
+        server = UnixHTTPServer(args.socket, None)
+        os.chmod(args.socket, 0o600)
+        address = args.socket
+    server.daemon_threads = True
+
+    daemon = CaptionDaemon(args)
+    print(f"Loading {args.engine} model '{args.model}'...")
+    try:
+        daemon.load()
+    except Exception as e:
+        print(f"Error loading {args.engine} model: {e}", file=sys.stderr)
+        server.server_close()
+        if not args.port:
+            os.unlink(args.socket)
+        sys.exit(1)
+
+    server.RequestHandlerClass = make_handler(daemon)
+    viewers = None
+    if args.broadcast_port:
+        viewers = BroadcastServer(daemon.broadcaster, args.broadcast_port)
+        viewers.start()
+        print(f"Serving captions to viewers on http://127.0.0.1:{args.broadcast_port}/events and /ws")
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"Listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nStopping...")
+        daemon.shutdown()
+        if viewers:
+            viewers.stop()
+        server.server_close()
+        if not args.port and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
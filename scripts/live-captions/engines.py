@@ -0,0 +1,359 @@
+"""
+Speech recognition engines for the live captions pipeline.
+Wraps openai-whisper and faster-whisper (CTranslate2) behind one interface that
+returns the same text/segment result shape, so the runtime can be picked at startup.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+import numpy as np
+
+from features import HOP_LENGTH, whisper_features
+
+SAMPLE_RATE = 16000
+
+# Whisper decodes fixed 30 s windows; longer audio cannot be batched as a single item
+MAX_BATCH_ITEM_SECONDS = 30.0
+
+# Same thresholds whisper.transcribe uses to discard windows without speech
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+AudioInput = Union[str, np.ndarray]
+
+# Raw log-mel frames handed to the transcribe call running on this thread (see MelFeatureRing)
+_precomputed = threading.local()
+# Held while whisper.transcribe's spectrogram function is swapped (see _whisper_mel_from)
+_whisper_patch_lock = threading.Lock()
+
+
+@contextmanager
+def precomputed_features(features: Optional[np.ndarray]):
+    _precomputed.features = features
+    try:
+        yield
+    finally:
+        _precomputed.features = None
+
+
+def _features_for(n_mels: int, samples: int, padding: int) -> Optional[np.ndarray]:
+    """Whisper input for the current call from precomputed frames, if there are any for this model."""
+    raw = getattr(_precomputed, 'features', None)
+    if raw is None or raw.shape[0] != n_mels:
+        return None
+    return whisper_features(raw, (samples + padding) // HOP_LENGTH)
+
+
+@dataclass
+class Word:
+    start: float
+    end: float
+    text: str
+    probability: float = 0.0
+
+
+@dataclass
+class Segment:
+    start: float
+    end: float
+    text: str
+    words: list[Word] = field(default_factory=list)
+
+
+@dataclass
+class TranscriptionResult:
+    text: str
+    segments: list[Segment]
+    language: Optional[str] = None
+    audio_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def real_time_factor(self) -> float:
+        """Inference time divided by audio duration (below 1 keeps up with live audio)."""
+        return self.elapsed_seconds / self.audio_seconds if self.audio_seconds > 0 else 0.0
+
+
+def audio_duration(audio: AudioInput, segments: list[Segment]) -> float:
+    if isinstance(audio, np.ndarray):
+        return len(audio) / SAMPLE_RATE
+    return segments[-1].end if segments else 0.0
+
+
+class AsrEngine:
+    """Common interface for speech recognition backends.
+
+    Engines that set n_mels accept `features`: raw log-mel frames of the audio from
+    features.MelFeatureRing.frames, used instead of computing them again.
+    """
+    name = 'engine'
+    n_mels: Optional[int] = None
+
+    def transcribe(self, audio: AudioInput, language: Optional[str] = 'en',
+                   initial_prompt: Optional[str] = None, word_timestamps: bool = False,
+                   features: Optional[np.ndarray] = None) -> TranscriptionResult:
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios: list[np.ndarray], language: Optional[str] = 'en',
+                         word_timestamps: bool = False,
+                         features: Optional[list[Optional[np.ndarray]]] = None) -> list[TranscriptionResult]:
+        """Transcribe several independent windows; backends override this with a single batched decode.
+
+        Batched decodes carry no word timings, so word_timestamps only applies to the per-item path.
+        """
+        features = features or [None] * len(audios)
+        return [self.transcribe(audio, language=language, word_timestamps=word_timestamps, features=item_features)
+                for audio, item_features in zip(audios, features)]
+
+    def warm_up(self):
+        """Run one throwaway inference so lazy initialization is not paid by the first caption."""
+        self.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language='en', word_timestamps=True)
+
+    @staticmethod
+    def _batchable(audios: list[np.ndarray]) -> bool:
+        return len(audios) > 1 and all(len(a) <= MAX_BATCH_ITEM_SECONDS * SAMPLE_RATE for a in audios)
+
+
+class OpenAIWhisperEngine(AsrEngine):
+    """Reference PyTorch implementation of Whisper."""
+    name = 'whisper'
+
+    def __init__(self, model_size: str = 'base', threads: int = 0, beam_size: Optional[int] = None, **_options):
+        try:
+            import torch
+            import whisper
+        except ImportError as e:
+            raise RuntimeError(f"openai-whisper is not installed ({e}). Install it with: pip install openai-whisper")
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model_size = model_size
+        self.beam_size = beam_size  # None decodes greedily, like whisper.transcribe
+        self.model = whisper.load_model(model_size, device='cpu')
+        self.n_mels = self.model.dims.n_mels
+
+    def transcribe(self, audio: AudioInput, language: Optional[str] = 'en',
+                   initial_prompt: Optional[str] = None, word_timestamps: bool = False,
+                   features: Optional[np.ndarray] = None) -> TranscriptionResult:
+        started = time.perf_counter()
+        with _whisper_mel_from(features):
+            result = self.model.transcribe(audio, language=language, fp16=False, beam_size=self.beam_size,
+                                           initial_prompt=initial_prompt, word_timestamps=word_timestamps)
+        elapsed = time.perf_counter() - started
+        segments = [
+            Segment(
+                start=seg['start'],
+                end=seg['end'],
+                text=seg['text'].strip(),
+                words=[Word(w['start'], w['end'], w['word'], w.get('probability', 0.0)) for w in seg.get('words', [])]
+            )
+            for seg in result.get('segments', [])
+        ]
+        return TranscriptionResult(
+            text=result['text'].strip(),
+            segments=segments,
+            language=result.get('language'),
+            audio_seconds=audio_duration(audio, segments),
+            elapsed_seconds=elapsed
+        )
+
+    def transcribe_batch(self, audios: list[np.ndarray], language: Optional[str] = 'en',
+                         word_timestamps: bool = False,
+                         features: Optional[list[Optional[np.ndarray]]] = None) -> list[TranscriptionResult]:
+        """Decode up to 30 s windows as one batch: one log-mel tensor, one batched decoder pass."""
+        if not self._batchable(audios):
+            return super().transcribe_batch(audios, language=language, word_timestamps=word_timestamps,
+                                            features=features)
+        import torch
+        import whisper
+        from whisper.audio import N_SAMPLES
+
+        started = time.perf_counter()
+        if features and all(f is not None and f.shape[0] == self.n_mels for f in features):
+            # Every window is padded to 30 s, so each gets exactly N_FRAMES columns
+            mel = torch.from_numpy(np.stack([whisper_features(f, N_SAMPLES // HOP_LENGTH) for f in features]))
+        else:
+            mel = self._batched_log_mel(audios)
+        options = whisper.DecodingOptions(language=language, fp16=False, beam_size=self.beam_size, without_timestamps=True)
+        decoded = whisper.decode(self.model, mel, options)
+        per_item = (time.perf_counter() - started) / len(audios)
+
+        results = []
+        for audio, item in zip(audios, decoded):
+            duration = len(audio) / SAMPLE_RATE
+            silent = item.no_speech_prob > NO_SPEECH_THRESHOLD and item.avg_logprob < LOGPROB_THRESHOLD
+            text = '' if silent else item.text.strip()
+            results.append(TranscriptionResult(
+                text=text,
+                segments=[Segment(0.0, duration, text)] if text else [],
+                language=item.language,
+                audio_seconds=duration,
+                elapsed_seconds=per_item
+            ))
+        return results
+
+    def _batched_log_mel(self, audios: list[np.ndarray]):
+        """whisper.log_mel_spectrogram over a (batch, samples) tensor, normalized per item."""
+        import torch
+        from whisper.audio import HOP_LENGTH, N_FFT, mel_filters, pad_or_trim
+
+        batch = torch.from_numpy(np.stack([pad_or_trim(audio) for audio in audios])).to(self.model.device)
+        window = torch.hann_window(N_FFT, device=batch.device)
+        stft = torch.stft(batch, N_FFT, HOP_LENGTH, window=window, return_complex=True)
+        magnitudes = stft[..., :-1].abs() ** 2
+        mel = mel_filters(batch.device, self.model.dims.n_mels) @ magnitudes
+        log_spec = torch.clamp(mel, min=1e-10).log10()
+        # whisper clamps the dynamic range per spectrogram, so take the max per item, not over the batch
+        log_spec = torch.maximum(log_spec, log_spec.amax(dim=(1, 2), keepdim=True) - 8.0)
+        return (log_spec + 4.0) / 4.0
+
+
+@contextmanager
+def _whisper_mel_from(features: Optional[np.ndarray]):
+    """Make the whisper.transcribe call inside this block use precomputed features.
+
+    whisper.transcribe only takes audio and computes the spectrogram itself through its module
+    global log_mel_spectrogram, so that global is swapped for the call and always restored. The
+    lock keeps two such calls from overlapping (and restoring each other's swap); other threads
+    calling whisper meanwhile get the original function's result, as the replacement only
+    answers for the thread whose features are set. If whisper stops looking the function up
+    there, the features are ignored and the spectrogram is computed as usual.
+    """
+    import importlib
+
+    # `import whisper.transcribe` would give the function of that name re-exported by the package
+    module = importlib.import_module('whisper.transcribe')
+    original = getattr(module, 'log_mel_spectrogram', None)
+    if features is None or original is None:
+        yield
+        return
+    import torch
+
+    def log_mel_spectrogram(audio, n_mels=80, padding=0, device=None):
+        mel = _features_for(n_mels, len(audio), padding) if not isinstance(audio, str) else None
+        return torch.from_numpy(mel) if mel is not None else original(audio, n_mels, padding, device)
+
+    with _whisper_patch_lock, precomputed_features(features):
+        module.log_mel_spectrogram = log_mel_spectrogram
+        try:
+            yield
+        finally:
+            module.log_mel_spectrogram = original
+
+
+class _PrecomputedFeatureExtractor:
+    """faster-whisper feature extractor that returns the precomputed features of the call in progress."""
+
+    def __init__(self, extractor, n_mels: int):
+        self.extractor = extractor
+        self.n_mels = n_mels
+
+    def __call__(self, waveform: np.ndarray, padding: int = 160, chunk_length: Optional[int] = None):
+        mel = _features_for(self.n_mels, len(waveform), padding) if chunk_length is None else None
+        return mel if mel is not None else self.extractor(waveform, padding=padding, chunk_length=chunk_length)
+
+    def __getattr__(self, name):
+        return getattr(self.extractor, name)
+
+
+class FasterWhisperEngine(AsrEngine):
+    """CTranslate2 implementation of Whisper with int8 weights, much faster on CPU."""
+    name = 'faster-whisper'
+
+    def __init__(self, model_size: str = 'base', compute_type: str = 'int8', threads: int = 0,
+                 num_workers: int = 1, beam_size: int = 5, **_options):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError(f"faster-whisper is not installed ({e}). Install it with: pip install faster-whisper")
+        self.model_size = model_size
+        self.beam_size = beam_size
+        # cpu_threads is the intra-op thread count per call; num_workers allows concurrent transcribe() calls
+        self.model = WhisperModel(model_size, device='cpu', compute_type=compute_type,
+                                  cpu_threads=threads, num_workers=num_workers)
+        self.n_mels = self.model.feature_extractor.mel_filters.shape[0]
+        self.model.feature_extractor = _PrecomputedFeatureExtractor(self.model.feature_extractor, self.n_mels)
+
+    def transcribe(self, audio: AudioInput, language: Optional[str] = 'en',
+                   initial_prompt: Optional[str] = None, word_timestamps: bool = False,
+                   features: Optional[np.ndarray] = None) -> TranscriptionResult:
+        started = time.perf_counter()
+        # Segments are generated lazily; decoding happens while we consume them
+        with precomputed_features(features):
+            raw_segments, info = self.model.transcribe(audio, language=language, beam_size=self.beam_size,
+                                                       initial_prompt=initial_prompt, word_timestamps=word_timestamps)
+        segments = [
+            Segment(
+                start=seg.start,
+                end=seg.end,
+                text=seg.text.strip(),
+                words=[Word(w.start, w.end, w.word, w.probability) for w in (seg.words or [])]
+            )
+            for seg in raw_segments
+        ]
+        elapsed = time.perf_counter() - started
+        return TranscriptionResult(
+            text=' '.join(seg.text for seg in segments if seg.text).strip(),
+            segments=segments,
+            language=info.language,
+            audio_seconds=info.duration,
+            elapsed_seconds=elapsed
+        )
+
+    def transcribe_batch(self, audios: list[np.ndarray], language: Optional[str] = 'en',
+                         word_timestamps: bool = False,
+                         features: Optional[list[Optional[np.ndarray]]] = None) -> list[TranscriptionResult]:
+        """Encode and decode up to 30 s windows as one CTranslate2 batch."""
+        if not self._batchable(audios):
+            return super().transcribe_batch(audios, language=language, word_timestamps=word_timestamps,
+                                            features=features)
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+
+        started = time.perf_counter()
+        extractor = self.model.feature_extractor
+        items = []
+        for audio, item_features in zip(audios, features or [None] * len(audios)):
+            with precomputed_features(item_features):
+                items.append(pad_or_trim(extractor(audio)[:, :extractor.nb_max_frames]))
+        features = np.stack(items)
+        tokenizer = Tokenizer(self.model.hf_tokenizer, self.model.model.is_multilingual,
+                              task='transcribe', language=language or 'en')
+        prompt = list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
+        encoder_output = self.model.encode(features)
+        decoded = self.model.model.generate(encoder_output, [prompt] * len(audios), beam_size=self.beam_size,
+                                            return_scores=True, return_no_speech_prob=True)
+        per_item = (time.perf_counter() - started) / len(audios)
+
+        results = []
+        for audio, item in zip(audios, decoded):
+            duration = len(audio) / SAMPLE_RATE
+            tokens = item.sequences_ids[0]
+            # scores are summed log-probabilities; normalize by length like faster-whisper does
+            avg_logprob = item.scores[0] / (len(tokens) + 1)
+            silent = item.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOGPROB_THRESHOLD
+            text = '' if silent else tokenizer.decode(tokens).strip()
+            results.append(TranscriptionResult(
+                text=text,
+                segments=[Segment(0.0, duration, text)] if text else [],
+                language=language,
+                audio_seconds=duration,
+                elapsed_seconds=per_item
+            ))
+        return results
+
+
+ENGINES = {
+    OpenAIWhisperEngine.name: OpenAIWhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def load_engine(name: str = 'whisper', model_size: str = 'base', **options) -> AsrEngine:
+    """Instantiate a speech recognition engine by name."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'. Available: {', '.join(ENGINES)}")
+    return ENGINES[name](model_size=model_size, **options)
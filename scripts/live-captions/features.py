@@ -0,0 +1,151 @@
+"""
+Incremental log-mel features for the live captions pipeline.
+Whisper's input features (80 or 128 log-mel bands, 10 ms hop) are computed as
+samples arrive and kept in a ring aligned to the audio ring, so overlapping and
+growing windows reuse them instead of running the STFT again for every decode.
+"""
+
+import threading
+from typing import Optional
+
+import numpy as np
+
+from audio_buffer import SAMPLE_RATE, PcmRingBuffer
+
+N_FFT = 400
+HOP_LENGTH = 160
+# Frames past the end of a window whose STFT still reaches into it (the rest is pure padding)
+BOUNDARY_FRAMES = N_FFT // 2 // HOP_LENGTH + 1
+# log10 of the clamp floor; what a frame of silence padding becomes
+SILENCE_LOG_MEL = -10.0
+
+_WINDOW = np.hanning(N_FFT + 1)[:-1].astype(np.float32)  # Periodic Hann, as torch.hann_window
+
+
+def mel_filters(n_mels: int, sample_rate: int = SAMPLE_RATE, n_fft: int = N_FFT) -> np.ndarray:
+    """Slaney-style mel filterbank (librosa.filters.mel defaults), shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        hz = np.asarray(hz, dtype=np.float64)
+        linear = hz / (200.0 / 3)
+        log = 15.0 + np.log(np.maximum(hz, 1e-10) / 1000.0) / (np.log(6.4) / 27.0)
+        return np.where(hz >= 1000.0, log, linear)
+
+    def mel_to_hz(mel):
+        linear = mel * (200.0 / 3)
+        log = 1000.0 * np.exp((np.log(6.4) / 27.0) * (mel - 15.0))
+        return np.where(mel >= 15.0, log, linear)
+
+    fft_freqs = np.linspace(0, sample_rate / 2, n_fft // 2 + 1)
+    mel_points = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2), n_mels + 2))
+    widths = np.diff(mel_points)
+    ramps = mel_points[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / widths[:-1, None]
+    upper = ramps[2:] / widths[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_points[2:] - mel_points[:-2]))[:, None]  # Slaney area normalization
+    return weights.astype(np.float32)
+
+
+def log_mel_frames(samples: np.ndarray, filters: np.ndarray) -> np.ndarray:
+    """log10 mel energies of consecutive N_FFT-sample frames HOP_LENGTH apart, shape (frames, n_mels)."""
+    frames = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP_LENGTH]
+    power = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+    return np.log10(np.maximum(power.astype(np.float32) @ filters.T, 1e-10))
+
+
+def whisper_features(raw: np.ndarray, frames: int) -> np.ndarray:
+    """Whisper's normalized input from raw log-mel frames (n_mels, k): padded with silence to `frames` columns.
+
+    The dynamic range is clamped to 8 below the loudest value of this window, then scaled, as
+    whisper.log_mel_spectrogram does for the window on its own.
+    """
+    if raw.shape[1] < frames:
+        raw = np.concatenate([raw, np.full((raw.shape[0], frames - raw.shape[1]), SILENCE_LOG_MEL, np.float32)], axis=1)
+    log_spec = raw[:, :frames]
+    log_spec = np.maximum(log_spec, log_spec.max() - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
+class MelFeatureRing:
+    """Raw log-mel frames of a stream, computed once per sample and addressed like the audio ring.
+
+    Frame f is centered on absolute sample f * HOP_LENGTH and is computed once the audio ring
+    holds the N_FFT / 2 samples after it. Storage is mirrored like PcmRingBuffer so windows
+    come back as views.
+    """
+
+    def __init__(self, ring: PcmRingBuffer, n_mels: int = 80):
+        self.ring = ring
+        self.n_mels = n_mels
+        self.filters = mel_filters(n_mels, ring.sample_rate)
+        self.capacity = ring.capacity // HOP_LENGTH
+        self._data = np.zeros((self.capacity * 2, n_mels), dtype=np.float32)
+        self.computed = 0  # Frames computed since the stream started
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Compute every frame the audio written so far allows; call after each ring write."""
+        with self._lock:
+            ready = max(0, (self.ring.total - N_FFT // 2) // HOP_LENGTH + 1)
+            first = self.computed
+            if self.ring.oldest > 0:
+                # Frames whose audio was already overwritten can no longer be computed
+                first = max(first, -(-(self.ring.oldest + N_FFT // 2) // HOP_LENGTH))
+            first = max(first, ready - self.capacity)  # Only the newest frames fit anyway
+            if ready <= first:
+                return
+            frames = self._compute(first, ready, self.ring.total)
+            if frames is not None:
+                self._store(first, frames)
+            self.computed = ready
+
+    def frames(self, start: int, end: int) -> Optional[np.ndarray]:
+        """Raw log-mel frames (n_mels, frames) for the window of samples [start, end).
+
+        Covers the (end - start) // HOP_LENGTH frames Whisper computes for the window plus
+        BOUNDARY_FRAMES, all from audio that stops at `end` as if the window stood alone.
+        The first frame is the one nearest to `start`, and the first few see the real audio
+        before the window rather than a reflection of it. Returns None if the audio is gone.
+        """
+        first = int(round(start / HOP_LENGTH))
+        count = (end - start) // HOP_LENGTH + BOUNDARY_FRAMES
+        # Frames reaching past `end` must see zeros there, not the audio that followed
+        cached_end = min(first + count, (end - N_FFT // 2) // HOP_LENGTH + 1)
+        with self._lock:
+            oldest = max(0, self.computed - self.capacity)
+            if first < oldest or end > self.ring.total:
+                return None
+            cached_end = max(first, min(cached_end, self.computed))
+            cached = self._view(first, cached_end)
+            tail = self._compute(cached_end, first + count, end)
+        if tail is None:
+            return None
+        return np.concatenate([cached, tail]).T
+
+    def _compute(self, first: int, last: int, audio_end: int) -> Optional[np.ndarray]:
+        """Frames [first, last) from the audio ring, with samples before 0 or from audio_end on as zeros."""
+        if last <= first:
+            return np.empty((0, self.n_mels), dtype=np.float32)
+        begin = first * HOP_LENGTH - N_FFT // 2
+        stop = (last - 1) * HOP_LENGTH + N_FFT // 2
+        available = self.ring.view(max(0, begin), min(stop, audio_end))
+        if available is None and min(stop, audio_end) > max(0, begin):
+            return None
+        samples = np.zeros(stop - begin, dtype=np.float32)
+        if available is not None:
+            samples[max(0, begin) - begin:max(0, begin) - begin + len(available)] = available
+        return log_mel_frames(samples, self.filters)
+
+    def _store(self, first: int, frames: np.ndarray):
+        pos = first % self.capacity
+        n = len(frames)
+        head = min(n, self.capacity - pos)
+        self._data[pos:pos + head] = frames[:head]
+        self._data[pos + self.capacity:pos + self.capacity + head] = frames[:head]
+        if head < n:
+            self._data[:n - head] = frames[head:]
+            self._data[self.capacity:self.capacity + n - head] = frames[head:]
+
+    def _view(self, first: int, last: int) -> np.ndarray:
+        pos = first % self.capacity
+        return self._data[pos:pos + (last - first)]
@@ -0,0 +1,340 @@
+"""
+Audio ingest for the live captions pipeline.
+Runs ffmpeg with raw s16le output on stdout (or decodes in-process with PyAV)
+and copies it straight into a PcmRingBuffer, cutting fixed overlapping windows
+for transcription. Local recordings can be replayed into the same ring for
+offline runs.
+"""
+
+import subprocess
+import sys
+import threading
+import time
+import wave
+from typing import Callable, Optional
+
+from audio_buffer import AudioChunk, BYTES_PER_SAMPLE, PcmRingBuffer, SAMPLE_RATE
+
+READ_BLOCK_SECONDS = 0.1
+
+# HTTP statuses meaning the stream URL itself was rejected; a freshly resolved URL may work
+REJECTED_URL_STATUSES = (401, 403, 404, 410)
+
+
+class IngestError(Exception):
+    """An audio source failed. `retryable` says whether reconnecting can help."""
+
+    def __init__(self, message: str, http_status: Optional[int] = None, retryable: bool = True):
+        super().__init__(message)
+        self.http_status = http_status
+        self.retryable = retryable
+
+
+class StreamOpenError(IngestError):
+    """The stream could not be opened (HTTP error, timeout, no audio track)."""
+
+
+class StreamReadError(IngestError):
+    """The stream broke off or could not be decoded after it was opened."""
+
+
+def ffmpeg_pcm_command(audio_url: str) -> list[str]:
+    """Build the ffmpeg command that decodes a stream to 16 kHz mono s16le on stdout."""
+    return [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-reconnect', '1',
+        '-reconnect_streamed', '1',
+        '-reconnect_delay_max', '5',
+        '-i', audio_url,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(SAMPLE_RATE),
+        '-ac', '1',
+        '-'
+    ]
+
+
+class FixedWindowChunker:
+    """Cuts fixed-length windows with a configurable overlap out of a growing ring."""
+
+    def __init__(self, ring: PcmRingBuffer, chunk_duration: float = 15.0, overlap: float = 0.1):
+        self.ring = ring
+        self.window = int(chunk_duration * ring.sample_rate)
+        self.hop = max(1, int(self.window * (1 - overlap)))
+        self.next_start = 0
+        self.emitted_end = 0
+        self.seq = 0
+
+    def poll(self) -> list[AudioChunk]:
+        """Return every complete window that became available since the last call."""
+        chunks = []
+        while self.next_start + self.window <= self.ring.total:
+            chunks.append(AudioChunk(self.ring, self.next_start, self.next_start + self.window, self.seq,
+                                     next_start=self.next_start + self.hop))
+            self.seq += 1
+            self.emitted_end = self.next_start + self.window
+            self.next_start += self.hop
+        return chunks
+
+    def flush(self) -> Optional[AudioChunk]:
+        """Return the trailing partial window once the stream has ended."""
+        if self.ring.total <= self.emitted_end:
+            return None
+        chunk = AudioChunk(self.ring, max(self.next_start, self.ring.oldest), self.ring.total, self.seq)
+        self.seq += 1
+        self.next_start = self.emitted_end = self.ring.total
+        return chunk
+
+
+class FfmpegPcmSource:
+    """Reads decoded PCM from an ffmpeg subprocess into a ring buffer on a background thread."""
+
+    def __init__(self, audio_url: str, ring: PcmRingBuffer, on_samples: Callable[[], None]):
+        self.audio_url = audio_url
+        self.ring = ring
+        self.on_samples = on_samples
+        self.process: Optional[subprocess.Popen] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[IngestError] = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            ffmpeg_pcm_command(self.audio_url),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self.thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.thread.start()
+
+    def _read_loop(self):
+        block_bytes = int(SAMPLE_RATE * READ_BLOCK_SECONDS) * BYTES_PER_SAMPLE
+        block = bytearray(block_bytes)
+        view = memoryview(block)
+        filled = 0
+        stdout = self.process.stdout
+        try:
+            while True:
+                n = stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+                # Only hand over whole samples; keep an odd trailing byte for the next read
+                usable = filled - (filled % BYTES_PER_SAMPLE)
+                if usable:
+                    self.ring.write_pcm16(view[:usable])
+                    if usable < filled:
+                        view[0] = view[usable]
+                    filled -= usable
+                    self.on_samples()
+        except Exception as e:
+            print(f"Error reading audio stream: {e}", file=sys.stderr)
+        finally:
+            self.on_samples()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> Optional[int]:
+        """Block until ffmpeg has exited and all of its output was read; return its status."""
+        self.join()
+        status = self.process.wait() if self.process else None
+        if status:
+            self.error = StreamReadError(f"ffmpeg exited with status {status}")
+        return status
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.join(timeout=2)
+
+
+class PyAvPcmSource:
+    """Decodes a stream in-process with PyAV straight into a ring buffer.
+
+    Saves the ffmpeg subprocess, the pipe copies and log scraping: libav* demuxes and
+    resamples to 16 kHz mono float32, and failures are raised as IngestError subclasses
+    (kept in `error`) instead of being read back from ffmpeg's stderr.
+    """
+
+    # Same reconnect behaviour as the ffmpeg command line; ignored by non-HTTP inputs
+    HTTP_OPTIONS = {'reconnect': '1', 'reconnect_streamed': '1', 'reconnect_delay_max': '5'}
+
+    def __init__(self, audio_url: str, ring: PcmRingBuffer, on_samples: Callable[[], None],
+                 open_timeout: float = 10.0, read_timeout: float = 10.0):
+        try:
+            import av
+        except ImportError as e:
+            raise RuntimeError(f"PyAV is not installed ({e}). Install it with: pip install av")
+        self._av = av
+        self.audio_url = audio_url
+        self.ring = ring
+        self.on_samples = on_samples
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.error: Optional[IngestError] = None
+        self._stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.thread.start()
+
+    def _decode_loop(self):
+        try:
+            self._decode()
+        except IngestError as e:
+            self.error = e
+        except Exception as e:
+            self.error = StreamReadError(f"{type(e).__name__}: {e}")
+        finally:
+            self.on_samples()
+
+    def _decode(self):
+        av = self._av
+        try:
+            container = av.open(self.audio_url, options=self.HTTP_OPTIONS,
+                                timeout=(self.open_timeout, self.read_timeout))
+        except av.error.FFmpegError as e:
+            raise self._structured(e, StreamOpenError)
+        with container:
+            if not container.streams.audio:
+                raise StreamOpenError("no audio track in stream", retryable=False)
+            stream = container.streams.audio[0]
+            resampler = av.AudioResampler(format='flt', layout='mono', rate=SAMPLE_RATE)
+            try:
+                for frame in container.decode(stream):
+                    if self._stopping.is_set():
+                        return
+                    self._write(resampler.resample(frame))
+                self._write(resampler.resample(None))  # Samples still buffered in the resampler
+            except av.error.FFmpegError as e:
+                raise self._structured(e, StreamReadError)
+
+    def _write(self, frames):
+        for frame in frames:
+            # Packed float32 mono: a (1, n) array that goes into the ring without conversion
+            self.ring.write(frame.to_ndarray().reshape(-1))
+        if frames:
+            self.on_samples()
+
+    def _structured(self, e, kind: type) -> IngestError:
+        errors = self._av.error
+        status = None
+        for cls, code in ((getattr(errors, 'HTTPBadRequestError', None), 400),
+                          (getattr(errors, 'HTTPUnauthorizedError', None), 401),
+                          (getattr(errors, 'HTTPForbiddenError', None), 403),
+                          (getattr(errors, 'HTTPNotFoundError', None), 404),
+                          (getattr(errors, 'HTTPTooManyRequestsError', None), 429),
+                          (getattr(errors, 'HTTPServerError', None), 500)):
+            if cls and isinstance(e, cls):
+                status = code
+                break
+        message = getattr(e, 'strerror', None) or str(e)
+        if status:
+            message = f"HTTP {status if status != 500 else '5xx'}: {message}"
+        # Plain 4xx other than a rejected URL will not get better by asking again
+        retryable = status is None or status >= 429 or status in REJECTED_URL_STATUSES
+        return kind(message, http_status=status, retryable=retryable)
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> int:
+        """Block until the stream has ended; return 0, or 1 if it failed (see `error`)."""
+        self.join()
+        return 1 if self.error else 0
+
+    def stop(self):
+        # A blocked network read returns within read_timeout
+        self._stopping.set()
+        self.join(timeout=self.read_timeout + 1)
+
+
+class ReplaySource:
+    """Feeds a local 16 kHz mono 16-bit WAV or raw s16le file into a ring, for offline runs.
+
+    speed=0 writes as fast as the pipeline accepts it; speed=1 paces writes at real time.
+    """
+
+    def __init__(self, path: str, ring: PcmRingBuffer, on_samples: Callable[[], None], speed: float = 0.0):
+        self.path = path
+        self.ring = ring
+        self.on_samples = on_samples
+        self.speed = speed
+        self.error: Optional[IngestError] = None
+        self._stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._replay, daemon=True)
+        self.thread.start()
+
+    def _open_wav(self) -> wave.Wave_read:
+        wav = wave.open(self.path, 'rb')
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != BYTES_PER_SAMPLE:
+            wav.close()
+            raise ValueError(f"{self.path}: expected 16 kHz mono 16-bit WAV "
+                             f"(convert with: ffmpeg -i in.wav -ar 16000 -ac 1 -c:a pcm_s16le out.wav)")
+        return wav
+
+    def _replay(self):
+        block_samples = int(SAMPLE_RATE * READ_BLOCK_SECONDS)
+        started = time.monotonic()
+        written = 0
+        try:
+            if self.path.lower().endswith('.wav'):
+                reader = self._open_wav()
+                read = reader.readframes
+            else:
+                reader = open(self.path, 'rb')
+                read = lambda n: reader.read(n * BYTES_PER_SAMPLE)
+            with reader:
+                while not self._stopping.is_set():
+                    data = read(block_samples)
+                    usable = len(data) - len(data) % BYTES_PER_SAMPLE
+                    if not usable:
+                        break
+                    self.ring.write_pcm16(memoryview(data)[:usable])
+                    written += usable // BYTES_PER_SAMPLE
+                    self.on_samples()
+                    if self.speed > 0:
+                        ahead = written / SAMPLE_RATE / self.speed - (time.monotonic() - started)
+                        if ahead > 0:
+                            self._stopping.wait(ahead)
+        except Exception as e:
+            self.error = StreamOpenError(str(e), retryable=False)
+        finally:
+            self.on_samples()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> int:
+        self.join()
+        return 1 if self.error else 0
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=2)
+
+
+PCM_SOURCES = {
+    'ffmpeg': FfmpegPcmSource,
+    'pyav': PyAvPcmSource,
+}
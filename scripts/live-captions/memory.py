@@ -0,0 +1,124 @@
+"""
+Memory monitoring for long-running captioners.
+Takes periodic tracemalloc and RSS snapshots so growth over days of captioning
+can be spotted and traced back to the allocating lines. Snapshots go to a
+callback (the debug hook), a JSON-lines file, or whoever asks for the latest.
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Optional
+
+# Stack frames kept per traced allocation; more frames cost more memory and time
+TRACE_FRAMES = 1
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+MemorySnapshotHook = Callable[[dict], None]
+
+
+class MemoryMonitor:
+    """Snapshots RSS and traced Python allocations every `interval` seconds.
+
+    Starts tracemalloc if it is not running yet. Each snapshot reports the `top` source
+    lines whose allocations grew most since the first snapshot (the baseline), so a leak
+    shows up as the same line growing snapshot after snapshot. The last `history`
+    snapshots are kept.
+    """
+
+    def __init__(self, interval: float = 60.0, top: int = 10, history: int = 60,
+                 on_snapshot: Optional[MemorySnapshotHook] = None, jsonl_path: Optional[str] = None):
+        self.interval = interval
+        self.top = top
+        self.history: deque[dict] = deque(maxlen=history)
+        self.on_snapshot = on_snapshot
+        self.jsonl_path = jsonl_path
+        self.started = time.time()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracing = False
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._owns_tracing = True
+        self.snapshot()  # Baseline
+        self.thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=5)
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def latest(self) -> Optional[dict]:
+        with self._lock:
+            return self.history[-1] if self.history else None
+
+    def snapshot(self) -> dict:
+        """Take a snapshot now, record it and pass it to the hooks."""
+        traced = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            if self._baseline is None:
+                self._baseline = traced
+            growth = traced.compare_to(self._baseline, 'lineno')[:self.top]
+            result = {
+                'time': round(time.time(), 3),
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'rss_mb': round(rss_mb(), 2),
+                'traced_mb': round(current / (1024 * 1024), 2),
+                'traced_peak_mb': round(peak / (1024 * 1024), 2),
+                'top_growth': [{'where': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                'size_kb': round(stat.size / 1024, 1),
+                                'growth_kb': round(stat.size_diff / 1024, 1),
+                                'blocks': stat.count}
+                               for stat in growth if stat.size_diff > 0],
+            }
+            self.history.append(result)
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(result) + "\n")
+        if self.on_snapshot:
+            self.on_snapshot(result)
+        return result
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"[Warning] Memory snapshot failed: {e}", file=sys.stderr)
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """One summary line plus the top growing allocation sites, for logs."""
+    lines = [f"[Info] Memory: RSS {snapshot['rss_mb']:.1f} MiB, traced {snapshot['traced_mb']:.1f} MiB "
+             f"(peak {snapshot['traced_peak_mb']:.1f} MiB) after {snapshot['uptime_seconds']:.0f}s"]
+    for site in snapshot['top_growth']:
+        lines.append(f"    +{site['growth_kb']:.1f} KiB ({site['size_kb']:.1f} KiB, {site['blocks']} blocks) {site['where']}")
+    return "\n".join(lines)
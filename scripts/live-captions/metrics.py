@@ -0,0 +1,198 @@
+"""
+Latency and throughput instrumentation for the live captions pipeline.
+Records per-chunk stage timestamps, keeps rolling real-time-factor, latency
+and queue-depth figures per stream, and exports them as JSON lines or a
+Prometheus text endpoint on localhost.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from audio_buffer import AudioChunk
+
+
+def mark(chunk: AudioChunk, stage: str):
+    """Timestamp a pipeline stage (queued, dequeued, transcribed, emitted) on a chunk."""
+    chunk.marks[stage] = time.monotonic()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StreamMetrics:
+    """Rolling per-stream figures over the last `window` chunks."""
+
+    def __init__(self, window: int):
+        self.queue_depth: Callable[[], int] = lambda: 0
+        self.ingested_seconds: Callable[[], float] = lambda: 0.0
+        self.chunks = 0
+        self.audio_seconds = 0.0
+        self.queue_wait = deque(maxlen=window)
+        self.inference = deque(maxlen=window)
+        self.latency = deque(maxlen=window)  # Chunk ready -> caption emitted
+        self.rtf = deque(maxlen=window)
+        self.last_lag = 0.0
+        self.dropped = 0  # Chunks shed or merged away by the overload policy
+
+
+class PipelineMetrics:
+    """Collects stage timings for every transcribed chunk and exposes snapshots."""
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self.started = time.monotonic()
+        self._streams: dict[str, StreamMetrics] = {}
+        self._lock = threading.Lock()
+
+    def register_stream(self, stream_id: str, queue_depth: Callable[[], int], ingested_seconds: Callable[[], float]):
+        """Register the gauges sampled for a stream at snapshot time."""
+        with self._lock:
+            stream = self._streams.setdefault(stream_id, StreamMetrics(self.window))
+            stream.queue_depth = queue_depth
+            stream.ingested_seconds = ingested_seconds
+
+    def unregister_stream(self, stream_id: str):
+        with self._lock:
+            self._streams.pop(stream_id, None)
+
+    def observe(self, stream_id: str, chunk: AudioChunk):
+        """Record a chunk whose caption was just emitted."""
+        mark(chunk, 'emitted')
+        marks = chunk.marks
+        with self._lock:
+            stream = self._streams.setdefault(stream_id, StreamMetrics(self.window))
+            stream.chunks += 1
+            stream.audio_seconds += chunk.duration
+            if 'queued' in marks and 'dequeued' in marks:
+                stream.queue_wait.append(marks['dequeued'] - marks['queued'])
+            if 'dequeued' in marks and 'transcribed' in marks:
+                inference = marks['transcribed'] - marks['dequeued']
+                stream.inference.append(inference)
+                if chunk.duration > 0:
+                    stream.rtf.append(inference / chunk.duration)
+            if 'queued' in marks:
+                stream.latency.append(marks['emitted'] - marks['queued'])
+                # The chunk was queued the moment its last sample arrived, so this is how far behind live we are
+                stream.last_lag = marks['emitted'] - marks['queued']
+
+    def record_drop(self, stream_id: str):
+        """Count a chunk that was dropped or merged into another one instead of transcribed."""
+        with self._lock:
+            self._streams.setdefault(stream_id, StreamMetrics(self.window)).dropped += 1
+
+    def latencies(self) -> list[float]:
+        """Chunk-ready to caption-emitted latencies still in the window, across every stream."""
+        with self._lock:
+            return [value for stream in self._streams.values() for value in stream.latency]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            streams = {}
+            uptime = time.monotonic() - self.started
+            for stream_id, stream in self._streams.items():
+                ingested = stream.ingested_seconds()
+                streams[stream_id] = {
+                    'chunks': stream.chunks,
+                    'dropped_chunks': stream.dropped,
+                    'audio_seconds': round(stream.audio_seconds, 3),
+                    'ingested_seconds': round(ingested, 3),
+                    # Audio seconds arriving per wall second; well below 1 means ffmpeg ingest is the bottleneck
+                    'ingest_rate': round(ingested / uptime, 4) if uptime > 0 else 0.0,
+                    'queue_depth': stream.queue_depth(),
+                    'queue_wait_p50': round(percentile(list(stream.queue_wait), 0.5), 4),
+                    'queue_wait_p95': round(percentile(list(stream.queue_wait), 0.95), 4),
+                    'inference_p50': round(percentile(list(stream.inference), 0.5), 4),
+                    'inference_p95': round(percentile(list(stream.inference), 0.95), 4),
+                    'latency_p50': round(percentile(list(stream.latency), 0.5), 4),
+                    'latency_p95': round(percentile(list(stream.latency), 0.95), 4),
+                    'real_time_factor': round(sum(stream.rtf) / len(stream.rtf), 4) if stream.rtf else 0.0,
+                    'lag_seconds': round(stream.last_lag, 4),
+                }
+        return {'time': time.time(), 'uptime_seconds': round(uptime, 3), 'streams': streams}
+
+    def prometheus_text(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for key in ('chunks', 'dropped_chunks', 'audio_seconds', 'ingested_seconds', 'ingest_rate', 'queue_depth',
+                    'queue_wait_p50', 'queue_wait_p95', 'inference_p50', 'inference_p95',
+                    'latency_p50', 'latency_p95', 'real_time_factor', 'lag_seconds'):
+            name = f"captions_{key}"
+            kind = 'counter' if key in ('chunks', 'dropped_chunks', 'audio_seconds', 'ingested_seconds') else 'gauge'
+            lines.append(f"# TYPE {name} {kind}")
+            for stream_id, values in snapshot['streams'].items():
+                lines.append(f'{name}{{stream="{stream_id}"}} {values[key]}')
+        lines.append("# TYPE captions_uptime_seconds gauge")
+        lines.append(f"captions_uptime_seconds {snapshot['uptime_seconds']}")
+        return '\n'.join(lines) + '\n'
+
+
+class JsonLinesExporter:
+    """Appends a metrics snapshot to a file every `interval` seconds."""
+
+    def __init__(self, metrics: PipelineMetrics, path: str, interval: float = 10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-jsonl", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join(timeout=2)
+        self._write()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(self.metrics.snapshot()) + '\n')
+        except OSError as e:
+            print(f"Error writing metrics: {e}", file=sys.stderr)
+
+
+class PrometheusExporter:
+    """Serves metrics in Prometheus text format on http://127.0.0.1:<port>/metrics."""
+
+    def __init__(self, metrics: PipelineMetrics, port: int = 9464):
+        self.metrics = metrics
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the caption output
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,391 @@
+"""
+Caption outputs for the live captions pipeline.
+Caption segments carry stream-time timestamps derived from ring sample offsets.
+They are written to rolling WebVTT/SRT files and fanned out to local WebSocket
+and Server-Sent Events viewers, each with a bounded buffer so a slow viewer
+never blocks transcription or grows memory.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Seconds between keep-alives on idle viewer connections
+KEEPALIVE_INTERVAL = 15.0
+# Most recent cues per stream that a correction can still replace in an appended subtitle file
+UPDATABLE_CUES = 32
+
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# Largest frame a viewer may send; viewers only send control frames, so anything bigger ends the connection
+MAX_CLIENT_FRAME = 1 << 16
+
+
+@dataclass
+class CaptionSegment:
+    """Committed caption text and the stream time it covers."""
+    stream_id: str
+    text: str
+    start: float  # Seconds since the start of the stream
+    end: float
+
+    def to_event(self) -> dict:
+        event = asdict(self)
+        event['stream'] = event.pop('stream_id')
+        event['type'] = 'caption'
+        return event
+
+
+def format_timestamp(seconds: float, decimal: str = '.') -> str:
+    """HH:MM:SS.mmm (WebVTT) or HH:MM:SS,mmm (SRT)."""
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal}{millis:03d}"
+
+
+class SubtitleWriter:
+    """Writes caption segments as WebVTT (.vtt) or SRT (.srt) files, one per stream.
+
+    The path may contain '{stream}' to separate streams. Without a window, cues are
+    appended as they arrive; with one, the file is rewritten atomically to hold only the
+    cues of the last `window` seconds of stream time, for players that poll a live file.
+    Recent cues can be replaced by corrected text (see update).
+    """
+
+    def __init__(self, path: str, window: Optional[float] = None):
+        suffix = os.path.splitext(path)[1].lower()
+        if suffix not in ('.vtt', '.srt'):
+            raise ValueError(f"subtitle path must end in .vtt or .srt: {path}")
+        self.path = path
+        self.vtt = suffix == '.vtt'
+        self.window = window
+        # (cue number, segment, byte offset in an appended file) of the cues that can still change
+        self._cues: dict[str, deque[tuple[int, CaptionSegment, int]]] = {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, segment: CaptionSegment):
+        with self._lock:
+            path = self.path.replace('{stream}', segment.stream_id)
+            index = self._counts.get(segment.stream_id, 0) + 1
+            self._counts[segment.stream_id] = index
+            if self.window is None:
+                cues = self._cues.setdefault(segment.stream_id, deque(maxlen=UPDATABLE_CUES))
+                with open(path, 'ab' if index > 1 else 'wb') as f:
+                    if index == 1 and self.vtt:
+                        f.write(b"WEBVTT\n\n")
+                    cues.append((index, segment, f.tell()))
+                    f.write(self._cue(index, segment).encode('utf-8'))
+                return
+            cues = self._cues.setdefault(segment.stream_id, deque())
+            cues.append((index, segment, 0))
+            while cues and cues[0][1].end < segment.end - self.window:
+                cues.popleft()
+            self._rewrite(path, cues)
+
+    def update(self, draft: CaptionSegment, corrected: CaptionSegment) -> bool:
+        """Replace the cue written for `draft`; False if it is no longer among the recent cues."""
+        with self._lock:
+            path = self.path.replace('{stream}', draft.stream_id)
+            cues = self._cues.get(draft.stream_id, ())
+            for position, (index, segment, offset) in enumerate(cues):
+                if segment.start == draft.start and segment.end == draft.end:
+                    break
+            else:
+                return False
+            cues[position] = (index, corrected, offset)
+            if self.window is not None:
+                self._rewrite(path, cues)
+                return True
+            # Cut the file at the replaced cue and write it and the cues after it again
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+                f.seek(offset)
+                for i in range(position, len(cues)):
+                    index, segment, _ = cues[i]
+                    cues[i] = (index, segment, f.tell())
+                    f.write(self._cue(index, segment).encode('utf-8'))
+            return True
+
+    def _rewrite(self, path: str, cues):
+        body = ''.join(self._cue(i, s) for i, s, _ in cues)
+        temp = f"{path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(("WEBVTT\n\n" if self.vtt else "") + body)
+        os.replace(temp, path)  # Readers never see a half-written file
+
+    def _cue(self, index: int, segment: CaptionSegment) -> str:
+        decimal = '.' if self.vtt else ','
+        # Zero-length spans (text without word timings at the end of a stream) still need a visible cue
+        end = max(segment.end, segment.start + 0.5)
+        timing = f"{format_timestamp(segment.start, decimal)} --> {format_timestamp(end, decimal)}"
+        return f"{timing}\n{segment.text}\n\n" if self.vtt else f"{index}\n{timing}\n{segment.text}\n\n"
+
+
+class Subscriber:
+    """A viewer's event buffer: holds at most `size` events and drops the oldest when full."""
+
+    def __init__(self, stream_id: Optional[str], size: int = 64):
+        self.stream_id = stream_id  # None receives every stream
+        self.events: deque[dict] = deque(maxlen=size)
+        self.dropped = 0
+        self.closed = False
+        self._ready = threading.Condition()
+
+    def put(self, event: dict):
+        """Never blocks; the publisher only ever waits for this short lock."""
+        with self._ready:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None on timeout or once closed."""
+        with self._ready:
+            if not self.events and not self.closed:
+                self._ready.wait(timeout)
+            return self.events.popleft() if self.events else None
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class CaptionBroadcaster:
+    """Fans caption events out to any number of subscribers with bounded buffers."""
+
+    def __init__(self, buffer_size: int = 64):
+        self.buffer_size = buffer_size
+        self._subscribers: list[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, stream_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(stream_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+        subscriber.close()
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.stream_id is None or subscriber.stream_id == event['stream']:
+                subscriber.put(event)
+
+    def publish_segment(self, segment: CaptionSegment):
+        self.publish(segment.to_event())
+
+    def publish_update(self, draft: CaptionSegment, corrected: CaptionSegment):
+        """Corrected text for a caption already sent; viewers match it by stream, start and end."""
+        event = corrected.to_event()
+        event['type'] = 'update'
+        event['draft'] = draft.text
+        self.publish(event)
+
+    def publish_partial(self, stream_id: str, text: str):
+        self.publish({'stream': stream_id, 'type': 'partial', 'text': text})
+
+    def close(self):
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {'subscribers': len(subscribers), 'dropped_events': sum(s.dropped for s in subscribers)}
+
+
+def websocket_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """One unmasked, final server-to-client WebSocket frame."""
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([126]) + struct.pack('!H', len(payload))
+    else:
+        header += bytes([127]) + struct.pack('!Q', len(payload))
+    return header + payload
+
+
+def _read_exact(rfile, size: int) -> Optional[bytes]:
+    data = rfile.read(size) if size else b''
+    return data if len(data) == size else None
+
+
+def read_websocket_frame(rfile) -> Optional[tuple[int, bytes]]:
+    """(opcode, unmasked payload) of the next client-to-server frame, or None once the client went away.
+
+    Raises ValueError for a frame larger than MAX_CLIENT_FRAME.
+    """
+    header = _read_exact(rfile, 2)
+    if header is None:
+        return None
+    opcode, length = header[0] & 0x0F, header[1] & 0x7F
+    if length >= 126:
+        extended = _read_exact(rfile, 2 if length == 126 else 8)
+        if extended is None:
+            return None
+        length = struct.unpack('!H' if length == 126 else '!Q', extended)[0]
+    if length > MAX_CLIENT_FRAME:
+        raise ValueError(f"client frame of {length} bytes")
+    mask = _read_exact(rfile, 4) if header[1] & 0x80 else b''
+    payload = _read_exact(rfile, length)
+    if mask is None or payload is None:
+        return None
+    if mask:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+class BroadcastServer:
+    """Serves a broadcaster's events on http://host:port.
+
+    GET /events  Server-Sent Events (one 'caption', 'update' or 'partial' event per message)
+    GET /ws      WebSocket, one JSON text message per event
+    Both take ?stream=<id> to follow a single stream. WebSocket viewers' pings are answered
+    and their close handshake completed; anything else they send is ignored.
+    """
+
+    def __init__(self, broadcaster: CaptionBroadcaster, port: int, host: str = '127.0.0.1'):
+        self.broadcaster = broadcaster
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="broadcast", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.broadcaster.close()  # Wakes up every viewer connection
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self):
+        broadcaster = self.broadcaster
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                stream_id = parse_qs(url.query).get('stream', [None])[0]
+                if url.path == '/events':
+                    self._serve(stream_id, self._start_sse, self._send_sse)
+                elif url.path == '/ws' and self.headers.get('Upgrade', '').lower() == 'websocket':
+                    self._serve(stream_id, self._start_websocket, self._send_websocket, self._receive_websocket)
+                else:
+                    self.send_error(404)
+
+            def _serve(self, stream_id, start, send, receive=None):
+                subscriber = broadcaster.subscribe(stream_id)
+                try:
+                    if not start():
+                        return
+                    if receive:
+                        threading.Thread(target=receive, args=(subscriber,), name="broadcast-reader",
+                                         daemon=True).start()
+                    last_sent = time.monotonic()
+                    while not subscriber.closed:
+                        event = subscriber.get(timeout=1.0)
+                        if event is not None:
+                            send(event)
+                            last_sent = time.monotonic()
+                        elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                            send(None)  # Also notices viewers that went away
+                            last_sent = time.monotonic()
+                except (BrokenPipeError, ConnectionResetError, socket.timeout):
+                    pass
+                finally:
+                    broadcaster.unsubscribe(subscriber)
+                    if receive:
+                        try:
+                            self.connection.shutdown(socket.SHUT_RD)  # Wakes up the reader
+                        except OSError:
+                            pass
+
+            def _start_sse(self) -> bool:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return True
+
+            def _send_sse(self, event: Optional[dict]):
+                if event is None:
+                    self.wfile.write(b': keep-alive\n\n')
+                else:
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+
+            def _start_websocket(self) -> bool:
+                key = self.headers.get('Sec-WebSocket-Key')
+                if not key:
+                    self.send_error(400, "missing Sec-WebSocket-Key")
+                    return False
+                accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+                self.send_response(101)
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept)
+                self.end_headers()
+                self.wfile.flush()
+                self._write_lock = threading.Lock()  # Events and control replies come from two threads
+                self._closing = False
+                return True
+
+            def _send_frame(self, payload: bytes, opcode: int = 0x1):
+                with self._write_lock:
+                    if self._closing:
+                        return  # Nothing may follow a close frame
+                    self._closing = opcode == 0x8
+                    self.wfile.write(websocket_frame(payload, opcode))
+                    self.wfile.flush()
+
+            def _send_websocket(self, event: Optional[dict]):
+                if event is None:
+                    self._send_frame(b'', opcode=0x9)  # Ping
+                else:
+                    self._send_frame(json.dumps(event).encode())
+
+            def _receive_websocket(self, subscriber: Subscriber):
+                """Read the viewer's frames until it closes or goes away, then end its subscription."""
+                try:
+                    while not subscriber.closed:
+                        frame = read_websocket_frame(self.rfile)
+                        if frame is None:
+                            break
+                        opcode, payload = frame
+                        if opcode == 0x8:
+                            self._send_frame(payload[:2], opcode=0x8)  # Echo the status code
+                            break
+                        if opcode == 0x9:
+                            self._send_frame(payload, opcode=0xA)
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    broadcaster.unsubscribe(subscriber)  # Also ends the writer loop in _serve
+
+            def log_message(self, format, *args):
+                pass  # Keep viewers out of the caption output
+
+        return Handler
+
@@ -0,0 +1,173 @@
+"""
+Per-stream ingest pipelines for the live captions pipeline.
+Each StreamPipeline supervises an audio source (ffmpeg on a resolved stream
+URL, or a local replay) and pushes finished audio chunks to a shared scheduler.
+"""
+
+import sys
+import threading
+from typing import Callable, Optional
+
+from audio_buffer import PcmRingBuffer
+from features import MelFeatureRing
+from metrics import mark
+from recorder import AudioRecorder
+from ingest import PCM_SOURCES, REJECTED_URL_STATUSES, FfmpegPcmSource, FixedWindowChunker
+from scheduler import FairScheduler
+from streaming import GrowingWindowChunker
+from supervisor import IngestSupervisor
+from vad import EnergyVad, SpeechSegmenter
+
+
+# Opens a source writing into the ring and calling back after each write; None if it cannot be opened
+SourceOpener = Callable[[PcmRingBuffer, Callable[[], None]], Optional[FfmpegPcmSource]]
+
+
+class UrlSourceOpener:
+    """Opens ffmpeg PCM sources for a video URL, resolving the stream URL on every attempt.
+
+    With a caching resolver, reconnects reuse the cached URL; if the previous source was
+    refused by the server or produced no audio at all, invalidate_url is called first.
+    decoder picks the source class from ingest.PCM_SOURCES (ffmpeg subprocess or in-process PyAV).
+    With hot_swap, the source is an IngestSupervisor that replaces stalled ffmpeg readers
+    itself without a gap, so pipeline restarts are only a last resort.
+    """
+
+    def __init__(self, video_url: str, resolve_url: Callable[[str], Optional[str]],
+                 invalidate_url: Optional[Callable[[str], None]] = None, decoder: str = 'ffmpeg',
+                 hot_swap: bool = False):
+        self.video_url = video_url
+        self.resolve_url = resolve_url
+        self.invalidate_url = invalidate_url
+        self.source_class = PCM_SOURCES[decoder]
+        self.hot_swap = hot_swap
+        self.audio_url: Optional[str] = None
+        self.source = None
+        self._opened_at: Optional[int] = None  # Ring position when the last source was opened
+
+    def __call__(self, ring: PcmRingBuffer, on_samples: Callable[[], None]) -> Optional[FfmpegPcmSource]:
+        error = getattr(self.source, 'error', None)
+        rejected = error is not None and error.http_status in REJECTED_URL_STATUSES
+        if self.invalidate_url and (rejected or self._opened_at == ring.total):
+            self.invalidate_url(self.video_url)
+        # Re-resolve in case the previous stream URL expired; fall back to it if resolution fails
+        self.audio_url = self.resolve_url(self.video_url) or self.audio_url
+        if not self.audio_url:
+            return None
+        self._opened_at = ring.total
+        if self.hot_swap:
+            self.source = IngestSupervisor(self._resolve, ring, on_samples,
+                                           invalidate_url=self._invalidate if self.invalidate_url else None)
+            return self.source
+        self.source = self.source_class(self.audio_url, ring, on_samples)
+        return self.source
+
+    def _resolve(self) -> Optional[str]:
+        self.audio_url = self.resolve_url(self.video_url) or self.audio_url
+        return self.audio_url
+
+    def _invalidate(self):
+        self.invalidate_url(self.video_url)
+
+
+class StreamPipeline:
+    """Ingest for one stream: a source with restarts, its ring and its chunker.
+
+    With n_mels, log-mel features are computed as audio arrives (see MelFeatureRing), so
+    overlapping windows do not run the STFT again. With a recorder, every ingested sample is
+    also appended to disk (see recorder.AudioRecorder).
+    """
+
+    def __init__(self, stream_id: str, open_source: SourceOpener, scheduler: FairScheduler,
+                 chunk_duration: int = 15, overlap: float = 0.1, vad: bool = False,
+                 streaming: bool = False, step: float = 1.0, max_restarts: int = 5,
+                 max_pending: Optional[int] = None, n_mels: Optional[int] = None,
+                 recorder: Optional[AudioRecorder] = None):
+        self.stream_id = stream_id
+        self.open_source = open_source
+        self.scheduler = scheduler
+        self.max_restarts = max_restarts
+        # For non-live sources: block the source once this many chunks wait, instead of lapping the ring
+        self.max_pending = max_pending
+        # Enough history that queued windows are still valid when the shared worker reaches them
+        self.ring = PcmRingBuffer(capacity_seconds=max(60, chunk_duration * 4))
+        self.features = MelFeatureRing(self.ring, n_mels) if n_mels else None
+        self.recorder = recorder
+        if streaming:
+            self.chunker = GrowingWindowChunker(self.ring, step=step, max_window=chunk_duration)
+        elif vad:
+            self.chunker = SpeechSegmenter(self.ring, EnergyVad(sample_rate=self.ring.sample_rate), max_chunk=chunk_duration)
+        else:
+            self.chunker = FixedWindowChunker(self.ring, chunk_duration, overlap)
+        self._chunker_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.source: Optional[FfmpegPcmSource] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"ingest-{self.stream_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self.source:
+            self.source.stop()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def _emit(self, chunk):
+        chunk.stream_id = self.stream_id
+        mark(chunk, 'queued')
+        self.scheduler.put(self.stream_id, chunk)
+
+    def _on_samples(self):
+        if self.recorder:
+            self.recorder.capture(self.ring)
+        if self.features:
+            self.features.update()
+        with self._chunker_lock:
+            for chunk in self.chunker.poll():
+                self._emit(chunk)
+        if self.max_pending is not None:
+            while not self._stopping.is_set() and (
+                    self.scheduler.pending(self.stream_id) >= self.max_pending
+                    or getattr(self.chunker, 'in_flight', False)):
+                self._stopping.wait(0.01)
+
+    def _run(self):
+        restarts = 0
+        while not self._stopping.is_set() and restarts < self.max_restarts:
+            # New sources keep writing into the same ring, so offsets stay continuous across reconnects
+            self.source = self.open_source(self.ring, self._on_samples)
+            if not self.source:
+                print(f"[{self.stream_id}] Error: Could not open audio stream.", file=sys.stderr)
+                restarts += 1
+                self._stopping.wait(2)
+                continue
+
+            print(f"[{self.stream_id}] Starting stream (attempt {restarts + 1}/{self.max_restarts})...")
+            self.source.start()
+            status = self.source.wait()
+            if status == 0 or self._stopping.is_set():
+                break
+            error = getattr(self.source, 'error', None)
+            detail = f": {error}" if error else ""
+            print(f"\n[{self.stream_id}] [Warning] Audio source ended with status {status}{detail}")
+            if error and not error.retryable:
+                break
+            restarts += 1
+
+        if restarts >= self.max_restarts:
+            print(f"\n[{self.stream_id}] [Error] Maximum restart attempts reached. Stream may be unavailable.")
+
+        if self.recorder:
+            self.recorder.close()
+        with self._chunker_lock:
+            tail = self.chunker.flush()
+        if tail and not self._stopping.is_set():
+            self._emit(tail)
@@ -6,62 +6,48 @@ Streams audio from YouTube and transcribes it in real-time using Whisper.
 
 video_url = "https://www.youtube.com/watch?v=j8ags57BAPI"
 
-try:
-    import yt_dlp
-except ImportError:
+import importlib.util
+
+# yt-dlp is imported on first use (see resolver.py); only check that it is installed
+if importlib.util.find_spec('yt_dlp') is None:
     print("Error: yt-dlp is not installed. Please install it with:")
     print("  pip install yt-dlp")
     import sys
     sys.exit(1)
 
-try:
-    import whisper
-except ImportError as e:
-    print("Error: openai-whisper is not installed or not accessible.")
-    print(f"Import error: {e}")
-    print("\nPlease install it with:")
-    print("  python3 -m pip install openai-whisper")
-    print("or")
-    print("  pip3 install openai-whisper")
-    print("\nNote: Make sure you're using the same Python version that has whisper installed.")
-    print(f"Current Python: {sys.executable}")
-    print("\nFor faster real-time transcription, you can also use:")
-    print("  pip install faster-whisper")
-    import sys
-    sys.exit(1)
-
 import subprocess
 import sys
 import time
 import os
 import tempfile
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 import threading
 import queue
+import argparse
+import signal
+from collections import deque
+from dataclasses import dataclass
 
+import numpy as np
 
-def get_audio_stream_url(video_url: str) -> Optional[str]:
-    """Get the direct audio stream URL from YouTube."""
-    try:
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'no_warnings': True,
-            'extractor_args': {'youtube': {'player_client': ['default']}},
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            if 'url' in info:
-                return info['url']
-            # Try to get from formats
-            if 'formats' in info:
-                for fmt in info['formats']:
-                    if fmt.get('acodec') != 'none' and fmt.get('vcodec') == 'none':
-                        return fmt.get('url')
-    except Exception as e:
-        print(f"Error getting audio stream URL: {e}", file=sys.stderr)
-    return None
+from audio_buffer import SAMPLE_RATE
+from backpressure import AdaptiveEngine, OVERLOAD_POLICIES
+from cascade import CascadeCorrector
+from engines import AsrEngine, ENGINES, load_engine
+from ingest import PCM_SOURCES
+from pipeline import UrlSourceOpener
+from recorder import AudioRecorder, RecordingIndex, RecordingSource
+from resolver import StreamUrlCache
+from session import CaptionSession
+from stitching import TranscriptStitcher
+from worker_pool import TranscriptionPool
+from memory import MemoryMonitor, format_snapshot
+from metrics import JsonLinesExporter, PipelineMetrics, PrometheusExporter
+from outputs import BroadcastServer, CaptionBroadcaster, CaptionSegment, SubtitleWriter
+
+# ffmpeg stderr lines kept for error checks in segments mode
+STDERR_TAIL_LINES = 200
 
 
 def stream_audio_to_file(audio_url: str, output_file: str, chunk_duration: int = 30):
@@ -90,134 +76,25 @@ def stream_audio_to_file(audio_url: str, output_file: str, chunk_duration: int =
         return None
 
 
-def transcribe_audio_chunk(model, audio_file: str) -> Optional[str]:
-    """Transcribe an audio file chunk using Whisper."""
+def transcribe_audio_chunk(engine: AsrEngine, audio: Union[str, np.ndarray]) -> Optional[str]:
+    """Transcribe an audio file chunk or a 16 kHz float32 sample array with the selected engine."""
     try:
-        if not os.path.exists(audio_file) or os.path.getsize(audio_file) == 0:
+        if isinstance(audio, str):
+            if not os.path.exists(audio) or os.path.getsize(audio) == 0:
+                return None
+        elif len(audio) == 0:
             return None
         
-        result = model.transcribe(audio_file, language='en', fp16=False)
-        text = result['text'].strip()
+        result = engine.transcribe(audio, language='en')
+        text = result.text
         return text if text else None
     except Exception as e:
         print(f"Error transcribing audio: {e}", file=sys.stderr)
         return None
 
 
-def process_audio_stream_realtime(model, audio_url: str, chunk_duration: int = 10):
-    """Process audio stream in real-time chunks and transcribe."""
-    import wave
-    import numpy as np
-    
-    print("\n" + "="*60)
-    print("REAL-TIME TRANSCRIPTION")
-    print("="*60)
-    print("Processing audio in chunks and transcribing...\n")
-    
-    seen_texts = set()
-    
-    try:
-        # Use ffmpeg to stream audio and pipe to stdout
-        cmd = [
-            'ffmpeg',
-            '-i', audio_url,
-            '-f', 'wav',
-            '-ar', '16000',
-            '-ac', '1',
-            '-'  # Output to stdout
-        ]
-        
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            bufsize=0
-        )
-        
-        # Read audio data in chunks
-        sample_rate = 16000
-        chunk_size = sample_rate * chunk_duration  # 10 seconds of audio
-        bytes_per_sample = 2  # 16-bit audio
-        bytes_per_chunk = chunk_size * bytes_per_sample
-        
-        # Skip WAV header (44 bytes)
-        wav_header = process.stdout.read(44)
-        
-        chunk_num = 0
-        buffer = b''
-        
-        while True:
-            # Read audio data
-            data = process.stdout.read(bytes_per_chunk)
-            if not data:
-                break
-            
-            buffer += data
-            
-            # When we have enough data for a chunk, transcribe it
-            if len(buffer) >= bytes_per_chunk:
-                chunk_num += 1
-                
-                # Save chunk to temporary file
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                    tmp_path = tmp_file.name
-                    
-                    # Write WAV header + audio data
-                    import struct
-                    num_samples = len(buffer) // bytes_per_sample
-                    file_size = 36 + num_samples * bytes_per_sample
-                    
-                    wav_header_new = struct.pack('<4sI4s4sIHHIIHH4sI',
-                        b'RIFF',
-                        file_size,
-                        b'WAVE',
-                        b'fmt ',
-                        16,  # fmt chunk size
-                        1,   # audio format (PCM)
-                        1,   # num channels
-                        sample_rate,
-                        sample_rate * bytes_per_sample,  # byte rate
-                        bytes_per_sample,  # block align
-                        16,  # bits per sample
-                        b'data',
-                        num_samples * bytes_per_sample
-                    )
-                    
-                    with open(tmp_path, 'wb') as f:
-                        f.write(wav_header_new)
-                        f.write(buffer[:bytes_per_chunk])
-                    
-                    # Transcribe
-                    text = transcribe_audio_chunk(model, tmp_path)
-                    
-                    if text and text not in seen_texts:
-                        timestamp = datetime.now().strftime("%H:%M:%S")
-                        print(f"[{timestamp}] {text}") # important
-                        seen_texts.add(text)
-                    
-                    # Clean up
-                    os.unlink(tmp_path)
-                    
-                    # Keep some overlap in buffer for better continuity
-                    overlap = bytes_per_chunk // 4
-                    buffer = buffer[-overlap:]
-                
-                # Small delay to prevent overwhelming the system
-                time.sleep(0.1)
-        
-        process.terminate()
-        
-    except KeyboardInterrupt:
-        print("\n\nStopped by user.")
-        if 'process' in locals():
-            process.terminate()
-    except Exception as e:
-        print(f"Error processing stream: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc()
-
-
-def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_duration: int = 15, max_inactivity_seconds: int = 60):
+def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_duration: int = 15, max_inactivity_seconds: int = 60,
+                                max_queue: int = 3, url_cache: Optional[StreamUrlCache] = None):
     """Stream audio continuously and transcribe in overlapping chunks."""
     print("\n" + "="*60)
     print("REAL-TIME TRANSCRIPTION")
@@ -225,9 +102,12 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
     print("Streaming audio and transcribing in real-time...\n")
     print("Note: There will be a delay of ~10-15 seconds for processing.\n")
     
-    seen_texts = set()
-    transcription_queue = queue.Queue()
-    ffmpeg_stderr_lines = []
+    url_cache = url_cache or StreamUrlCache()
+    stitcher = TranscriptStitcher()
+    # Bounded so a model slower than real time sheds old chunk files instead of falling further behind
+    transcription_queue = queue.Queue(maxsize=max_queue)
+    # Only the recent lines matter for error checks; a days-long stream must not keep them all
+    ffmpeg_stderr_lines = deque(maxlen=STDERR_TAIL_LINES)
     stderr_monitor_active = threading.Event()
     stderr_monitor_active.set()
     
@@ -240,10 +120,10 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
             
             try:
                 text = transcribe_audio_chunk(model, chunk_file)
-                if text and text not in seen_texts:
+                text = stitcher.add_text(text) if text else None
+                if text:
                     timestamp = datetime.now().strftime("%H:%M:%S")
                     print(f"[{timestamp}] {text}")
-                    seen_texts.add(text)
             except Exception as e:
                 print(f"Transcription error: {e}", file=sys.stderr)
             finally:
@@ -252,6 +132,33 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
                     os.unlink(chunk_file)
                 transcription_queue.task_done()
     
+    def enqueue_chunk(chunk_file: str):
+        """Queue a chunk file, deleting the oldest waiting one while the queue is full."""
+        while True:
+            try:
+                transcription_queue.put_nowait(chunk_file)
+                return
+            except queue.Full:
+                try:
+                    oldest = transcription_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                print(f"[Warning] Dropped {os.path.basename(oldest)}: transcription queue is full.", file=sys.stderr)
+                if os.path.exists(oldest):
+                    os.unlink(oldest)
+                transcription_queue.task_done()
+    
+    def discard_pending():
+        """Delete the chunk files still waiting for transcription, emptying the queue."""
+        while True:
+            try:
+                chunk_file = transcription_queue.get_nowait()
+            except queue.Empty:
+                return
+            if chunk_file and os.path.exists(chunk_file):
+                os.unlink(chunk_file)
+            transcription_queue.task_done()
+    
     def monitor_ffmpeg_stderr(stderr_pipe):
         """Monitor ffmpeg stderr for errors."""
         # Non-critical warnings to filter out
@@ -342,7 +249,7 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
                 
                 # Monitor for new chunk files
                 chunk_num = 0
-                processed_chunks = set()
+                processed_chunks = set()  # Indices of queued chunk files
                 last_chunk_time = time.time()
                 process_status = None
                 
@@ -353,15 +260,17 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
                     # Check current and next chunks
                     for i in range(max(0, chunk_num - 2), chunk_num + 15):
                         chunk_file = os.path.join(tmpdir, f'chunk_{i:03d}.wav')
-                        if os.path.exists(chunk_file) and chunk_file not in processed_chunks:
+                        if os.path.exists(chunk_file) and i not in processed_chunks:
                             # Wait a bit to ensure file is fully written
                             time.sleep(0.5)
                             if os.path.getsize(chunk_file) > 0:
-                                processed_chunks.add(chunk_file)
-                                transcription_queue.put(chunk_file)
+                                processed_chunks.add(i)
+                                enqueue_chunk(chunk_file)
                                 chunk_num = max(chunk_num, i + 1)
                                 last_chunk_time = time.time()
                                 found_new_chunk = True
+                    # Chunks before the scan window are never looked at again
+                    processed_chunks = {c for c in processed_chunks if c >= chunk_num - 2}
                     
                     # Check if process is still running
                     process_status = process.poll()
@@ -386,22 +295,23 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
                         time.sleep(2)
                         for i in range(max(0, chunk_num - 2), chunk_num + 10):
                             chunk_file = os.path.join(tmpdir, f'chunk_{i:03d}.wav')
-                            if os.path.exists(chunk_file) and chunk_file not in processed_chunks:
+                            if os.path.exists(chunk_file) and i not in processed_chunks:
                                 if os.path.getsize(chunk_file) > 0:
-                                    processed_chunks.add(chunk_file)
-                                    transcription_queue.put(chunk_file)
+                                    processed_chunks.add(i)
+                                    enqueue_chunk(chunk_file)
                         
                         # If process ended unexpectedly, try to restart
                         if process_status != 0:
                             print(f"\n[Info] Attempting to reconnect to stream...")
                             stream_restart_count += 1
-                            # Refresh audio URL in case it expired
+                            # The cache keeps the URL fresh ahead of expiry; only a rejected URL needs a new extraction
                             if stream_restart_count < max_restarts:
-                                print("Refreshing stream URL...")
-                                new_audio_url = get_audio_stream_url(video_url)
+                                if any('403' in line for line in ffmpeg_stderr_lines):
+                                    print("Refreshing stream URL...")
+                                    url_cache.invalidate(video_url)
+                                new_audio_url = url_cache.get(video_url)
                                 if new_audio_url:
                                     audio_url = new_audio_url
-                                    print("Stream URL refreshed successfully.")
                                 else:
                                     print("Warning: Could not refresh stream URL, using previous URL.")
                             time.sleep(2)  # Brief pause before restart
@@ -427,8 +337,8 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
                             stderr_monitor_active.clear()
                             stream_restart_count += 1
                             if stream_restart_count < max_restarts:
-                                # Refresh audio URL
-                                new_audio_url = get_audio_stream_url(video_url)
+                                # Reuse the cached URL, which is refreshed before it expires
+                                new_audio_url = url_cache.get(video_url)
                                 if new_audio_url:
                                     audio_url = new_audio_url
                                 time.sleep(2)
@@ -467,7 +377,9 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
     except KeyboardInterrupt:
         print("\n\nStopping...")
         stderr_monitor_active.clear()
-        transcription_queue.put(None)
+        # A blocking put could wait forever on a full queue; the waiting chunks are not wanted anyway
+        discard_pending()
+        transcription_queue.put_nowait(None)
         if 'process' in locals() and process.poll() is None:
             process.terminate()
             time.sleep(1)
@@ -482,37 +394,369 @@ def process_audio_stream_simple(model, audio_url: str, video_url: str, chunk_dur
             process.terminate()
 
 
-def main():
+@dataclass
+class IngestOptions:
+    """How stream URLs are resolved and decoded (pcm mode)."""
+    url_cache: Optional[StreamUrlCache] = None
+    decoder: str = 'ffmpeg'
+    hot_swap: bool = False
+    max_restarts: int = 5
+
+
+@dataclass
+class OverloadOptions:
+    """Chunks allowed to wait per stream (None = unbounded) and what happens to the rest."""
+    max_queue: Optional[int] = 3
+    policy: str = 'drop-oldest'
+
+
+@dataclass
+class OutputOptions:
+    """Where captions and metrics go besides the console."""
+    subtitles: Optional[str] = None
+    subtitle_window: Optional[float] = None
+    broadcast_port: Optional[int] = None
+    viewer_buffer: int = 64
+    metrics_jsonl: Optional[str] = None
+    metrics_port: Optional[int] = None
+
+
+@dataclass
+class RecordingOptions:
+    """Record the ingested audio, or replay earlier recordings instead of URLs."""
+    record: Optional[str] = None
+    replay: Optional[list[str]] = None
+    replay_speed: float = 0.0
+
+
+def process_audio_stream_pcm(model, video_urls: list[str], chunk_duration: int = 15, overlap: float = 0.1, vad: bool = False,
+                             batch_size: int = 1, batch_wait: float = 0.2, streaming: bool = False, step: float = 1.0,
+                             pool: Optional[TranscriptionPool] = None, correction_pool: Optional[TranscriptionPool] = None,
+                             ingest: Optional[IngestOptions] = None, overload: Optional[OverloadOptions] = None,
+                             outputs: Optional[OutputOptions] = None, recording: Optional[RecordingOptions] = None):
+    """Stream raw PCM from ffmpeg into in-memory rings and transcribe overlapping windows.
+
+    Every URL gets its own ingest pipeline; all of them share one loaded model through a
+    round-robin scheduler (see CaptionSession). With vad=True, only speech is transcribed, in
+    chunks cut at pauses. With batch_size > 1, chunks from any stream are decoded together.
+    With streaming=True, a growing window is re-decoded every `step` seconds and partial
+    captions are shown until they stabilize. With a pool, chunks are transcribed by several
+    worker processes (model is then unused). ingest.decoder='pyav' decodes in-process instead
+    of through an ffmpeg subprocess; ingest.hot_swap=True replaces stalled ffmpeg readers without
+    a gap in the audio (see supervisor.IngestSupervisor). At most overload.max_queue chunks wait
+    per stream; overload.policy decides whether older ones are dropped or merged. Per-stage
+    timings, real-time factor and queue depth can be exported as JSON lines
+    (outputs.metrics_jsonl) or on http://127.0.0.1:<outputs.metrics_port>/metrics. Captions timed
+    in stream time can be written to a WebVTT/SRT file (outputs.subtitles, rolling over
+    subtitle_window seconds) and served to viewers over SSE (/events) and WebSocket (/ws) on
+    outputs.broadcast_port, each with viewer_buffer events of slack. The ingested audio can be
+    recorded to an indexed raw file (recording.record), and recordings are transcribed again with
+    recording.replay instead of URLs, at replay_speed (0 = as fast as the model keeps up), with
+    captions stamped with the wall-clock time they were recorded. With a
+    correction_pool, model captions are drafts: a larger model re-transcribes each one in the
+    background and its corrections are printed (marked '*'), rewritten in the subtitle file and
+    sent to viewers as 'update' events.
+    """
+    print("\n" + "="*60)
+    print("REAL-TIME TRANSCRIPTION")
+    print("="*60)
+    print("Streaming audio into memory and transcribing in real-time...\n")
     
-    print(f"Connecting to live stream: {video_url}")
-    print("Getting audio stream URL...")
+    ingest = ingest or IngestOptions()
+    overload = overload or OverloadOptions()
+    outputs = outputs or OutputOptions()
+    recording = recording or RecordingOptions()
+    replay = recording.replay
+    sources = replay or video_urls
+    multi_stream = len(sources) > 1
+    show_partials = sys.stdout.isatty()
+    url_cache = ingest.url_cache or StreamUrlCache()
     
-    # Get audio stream URL
-    audio_url = get_audio_stream_url(video_url)
+    indexes = {}  # Recording index per stream when replaying
+
+    def emit(stream_id: str, text: str, wall: Optional[float] = None):
+        timestamp = datetime.fromtimestamp(wall).strftime("%H:%M:%S") if wall else datetime.now().strftime("%H:%M:%S")
+        prefix = f"[{timestamp}] [{stream_id}]" if multi_stream else f"[{timestamp}]"
+        if show_partials:
+            print("\r\033[K", end="")  # Replace the partial caption line
+        print(f"{prefix} {text}")
     
-    if not audio_url:
-        print("Error: Could not get audio stream URL.")
-        sys.exit(1)
+    def emit_partial(stream_id: str, text: str):
+        """Show the unstable tail of the caption on a line that is overwritten as it changes."""
+        if not show_partials:
+            return
+        prefix = f"[{stream_id}] ~ " if multi_stream else "~ "
+        print(f"\r\033[K{prefix}{text}", end="", flush=True)
     
-    print(f"Audio stream URL obtained.")
-    print("Loading Whisper model (this may take a moment on first run)...")
+    writer = SubtitleWriter(outputs.subtitles, window=outputs.subtitle_window) if outputs.subtitles else None
+    broadcaster = CaptionBroadcaster(buffer_size=outputs.viewer_buffer) if outputs.broadcast_port else None
+
+    def emit_segment(segment: CaptionSegment):
+        if replay:
+            index = indexes[segment.stream_id]
+            emit(segment.stream_id, segment.text, index.wall_time(int(segment.start * SAMPLE_RATE)))
+        if writer:
+            writer.add(segment)
+        if broadcaster:
+            broadcaster.publish_segment(segment)
+
+    def emit_partial_all(stream_id: str, text: str):
+        emit_partial(stream_id, text)
+        if broadcaster:
+            broadcaster.publish_partial(stream_id, text)
+
+    def emit_update(draft: CaptionSegment, corrected: CaptionSegment):
+        wall = indexes[draft.stream_id].wall_time(int(draft.start * SAMPLE_RATE)) if replay else None
+        emit(corrected.stream_id, f"* {corrected.text}", wall)
+        if writer:
+            writer.update(draft, corrected)
+        if broadcaster:
+            broadcaster.publish_update(draft, corrected)
+
+    corrector = CascadeCorrector(correction_pool, emit_update) if correction_pool else None
+
+    metrics = PipelineMetrics()
+    # Replayed captions are printed from their segments, which carry the recorded time
+    session = CaptionSession(model, (lambda stream_id, text: None) if replay else emit, on_partial=emit_partial_all,
+                             batch_size=batch_size, batch_wait=batch_wait,
+                             pool=pool, metrics=metrics, max_queue=overload.max_queue, overload=overload.policy,
+                             on_segment=emit_segment if writer or broadcaster or replay else None,
+                             corrector=corrector)
+    for i, source in enumerate(sources):
+        stream_id = f"stream{i + 1}" if multi_stream else "stream"
+        if multi_stream:
+            print(f"[{stream_id}] {source}")
+        options = {}
+        if replay:
+            indexes[stream_id] = RecordingIndex(source)
+            opener = lambda ring, on_samples, path=source: RecordingSource(path, ring, on_samples,
+                                                                           speed=recording.replay_speed)
+            if recording.replay_speed <= 0:
+                options['max_pending'] = 1  # Unpaced: read no further ahead than the model transcribes
+        else:
+            opener = UrlSourceOpener(source, url_cache.get, url_cache.invalidate, decoder=ingest.decoder,
+                                     hot_swap=ingest.hot_swap)
+        if recording.record:
+            options['recorder'] = AudioRecorder(recording.record.replace('{stream}', stream_id))
+        session.add_stream(stream_id, opener, chunk_duration=chunk_duration, overlap=overlap, vad=vad,
+                           streaming=streaming, step=step, max_restarts=ingest.max_restarts, **options)
+    exporters = []
+    if outputs.metrics_jsonl:
+        exporters.append(JsonLinesExporter(metrics, outputs.metrics_jsonl))
+    if outputs.metrics_port:
+        exporters.append(PrometheusExporter(metrics, outputs.metrics_port))
+        print(f"Serving metrics on http://127.0.0.1:{outputs.metrics_port}/metrics")
+    if broadcaster:
+        port = outputs.broadcast_port
+        exporters.append(BroadcastServer(broadcaster, port))
+        print(f"Serving captions on http://127.0.0.1:{port}/events (SSE) and ws://127.0.0.1:{port}/ws")
+    for exporter in exporters:
+        exporter.start()
+    
+    try:
+        session.start()
+        for pipeline in session.pipelines.values():
+            pipeline.join()
+        print("\n[Info] Waiting for remaining transcriptions to complete...")
+        session.wait()
+    except KeyboardInterrupt:
+        print("\n\nStopping...")
+        session.stop()
+    
+    for exporter in exporters:
+        exporter.stop()
+    
+    if vad:
+        for pipeline in session.pipelines.values():
+            summary = pipeline.chunker.stats.summary(fixed_chunk_seconds=chunk_duration * (1 - overlap))
+            print(f"\n[Info] [{pipeline.stream_id}] {summary}")
+    if corrector:
+        stats = corrector.stats()
+        print(f"\n[Info] Corrections: {stats['corrected']} of {stats['submitted']} re-transcribed captions changed, "
+              f"{stats['skipped']} left as drafts (correction workers busy), "
+              f"{stats['no_audio']} without audio to re-transcribe")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time YouTube live stream transcription")
+    parser.add_argument('--url', nargs='+', default=[video_url],
+                        help="YouTube video/live stream URL(s); several URLs share one loaded model (pcm mode)")
+    parser.add_argument('--mode', choices=['pcm', 'segments'], default='pcm',
+                        help="pcm: stream raw audio into memory (default); segments: legacy ffmpeg segment files")
+    parser.add_argument('--chunk-duration', type=int, default=15, help="Seconds of audio per transcription window")
+    parser.add_argument('--decoder', choices=list(PCM_SOURCES), default='ffmpeg',
+                        help="ffmpeg: decode in an ffmpeg subprocess; pyav: decode in-process with PyAV (pcm mode)")
+    parser.add_argument('--hot-swap', action='store_true',
+                        help="Detect stalls within seconds and start a replacement ffmpeg before dropping the old one, "
+                             "stitching the audio without a gap (pcm mode, ffmpeg decoder)")
+    parser.add_argument('--overlap', type=float, default=0.1,
+                        help="Fraction of each window re-transcribed by the next one (pcm mode); boundary words are stitched, so this can stay small")
+    parser.add_argument('--engine', choices=list(ENGINES), default='whisper',
+                        help="Speech recognition runtime; faster-whisper is much faster on CPU")
+    parser.add_argument('--model', default='base', help="Whisper model size (tiny, base, small, medium, large)")
+    parser.add_argument('--compute-type', default='int8', help="faster-whisper weight type (int8, int8_float32, float32)")
+    parser.add_argument('--threads', type=int, default=0, help="Intra-op CPU threads per inference (0 = library default)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes, each with its own model replica and --threads intra-op threads (pcm mode)")
+    parser.add_argument('--engine-workers', type=int, default=1, help="Concurrent transcribe calls allowed by faster-whisper")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Max chunks decoded together in one batched call, across streams (pcm mode)")
+    parser.add_argument('--batch-wait-ms', type=int, default=200,
+                        help="Max time to wait for more chunks once the first one of a batch is ready")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Re-decode a growing window every --step seconds and show partial captions until they stabilize (pcm mode)")
+    parser.add_argument('--step', type=float, default=1.0, help="Seconds of new audio between incremental decodes (--streaming)")
+    parser.add_argument('--metrics-jsonl', help="Append per-stream latency/RTF/queue-depth snapshots to this file every 10 s (pcm mode)")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (pcm mode)")
+    parser.add_argument('--vad', action='store_true', help="Skip non-speech audio and cut chunks at pauses (pcm mode)")
+    parser.add_argument('--max-queue', type=int, default=3,
+                        help="Max chunks waiting per stream before the overload policy applies (0 = unbounded)")
+    parser.add_argument('--overload', choices=OVERLOAD_POLICIES, default='drop-oldest',
+                        help="When the queue is full: drop the oldest chunk, merge the two oldest into one window, "
+                             "or degrade (greedy decoding, then smaller models, while the real-time factor is too high)")
+    parser.add_argument('--min-model', default='tiny', help="Smallest model --overload degrade may switch to")
+    parser.add_argument('--subtitles', help="Write captions timed in stream time to this .vtt or .srt file "
+                                            "('{stream}' in the name separates several URLs) (pcm mode)")
+    parser.add_argument('--subtitle-window', type=float,
+                        help="Keep only the last N seconds of cues in --subtitles, rewriting it atomically (live players)")
+    parser.add_argument('--broadcast-port', type=int,
+                        help="Serve captions to viewers on http://127.0.0.1:PORT/events (SSE) and /ws (WebSocket) (pcm mode)")
+    parser.add_argument('--viewer-buffer', type=int, default=64,
+                        help="Events buffered per viewer before the oldest are dropped")
+    parser.add_argument('--record', help="Append the ingested 16 kHz audio to this raw s16le file with a .idx "
+                                         "index of wall-clock times ('{stream}' separates several URLs) (pcm mode)")
+    parser.add_argument('--replay', nargs='+', metavar='FILE',
+                        help="Transcribe --record recordings instead of --url (pcm mode)")
+    parser.add_argument('--replay-speed', type=float, default=0.0,
+                        help="Replay pace as a multiple of real time (0 = as fast as the model keeps up)")
+    parser.add_argument('--correction-model',
+                        help="Cascade: captions from --model are drafts, re-transcribed by this larger model in "
+                             "low-priority background workers and replaced when the correction is ready (pcm mode)")
+    parser.add_argument('--correction-workers', type=int, default=1, help="Correction worker processes (--correction-model)")
+    parser.add_argument('--correction-threads', type=int, default=0,
+                        help="Intra-op CPU threads per correction worker (0 = share the cores)")
+    parser.add_argument('--correction-nice', type=int, default=10,
+                        help="Scheduling priority offset of the correction workers, so drafts keep their latency")
+    parser.add_argument('--soak', action='store_true',
+                        help="Long-run mode for 24/7 streams: require bounded queues and log tracemalloc/RSS snapshots")
+    parser.add_argument('--memory-interval', type=float, default=300.0, help="Seconds between memory snapshots (--soak)")
+    parser.add_argument('--memory-log', help="Append memory snapshots to this JSON-lines file (--soak)")
+    args = parser.parse_args()
+    if args.streaming and args.vad:
+        parser.error("--streaming and --vad cannot be combined")
+    if args.decoder == 'pyav' and importlib.util.find_spec('av') is None:
+        parser.error("--decoder pyav needs PyAV: pip install av")
+    if args.subtitles and not args.subtitles.lower().endswith(('.vtt', '.srt')):
+        parser.error("--subtitles must end in .vtt or .srt")
+    if args.subtitles and len(args.replay or args.url) > 1 and '{stream}' not in args.subtitles:
+        parser.error("--subtitles needs '{stream}' in the name when captioning several URLs")
+    if args.record and len(args.replay or args.url) > 1 and '{stream}' not in args.record:
+        parser.error("--record needs '{stream}' in the name when recording several streams")
+    if args.replay and args.mode != 'pcm':
+        parser.error("--replay only applies to pcm mode")
+    if args.replay:
+        missing = [path for path in args.replay if not os.path.exists(path)]
+        if missing:
+            parser.error(f"recording not found: {', '.join(missing)}")
+    if args.correction_model and args.mode != 'pcm':
+        parser.error("--correction-model only applies to pcm mode")
+    if args.soak and args.max_queue <= 0:
+        parser.error("--soak needs a bounded --max-queue")
+    if args.hot_swap and args.decoder != 'ffmpeg':
+        parser.error("--hot-swap supervises ffmpeg readers; use it with --decoder ffmpeg")
+    if args.workers > 1 and (args.streaming or args.batch_size > 1 or args.mode != 'pcm'):
+        parser.error("--workers only applies to pcm mode without --streaming or --batch-size")
+    if args.workers > 1 and args.overload == 'degrade':
+        parser.error("--overload degrade needs the in-process model; use drop-oldest or merge with --workers")
+    return args
+
+
+def main():
+    args = parse_args()
+    # Resolved stream URLs are reused on reconnect and refreshed in the background before they expire
+    url_cache = StreamUrlCache()
+    
+    if args.mode == 'segments':
+        if len(args.url) > 1:
+            print("Error: segments mode handles a single stream; use --mode pcm for several URLs.")
+            sys.exit(1)
+        video_url = args.url[0]
+        print(f"Connecting to live stream: {video_url}")
+        print("Getting audio stream URL...")
+        
+        # Get audio stream URL
+        audio_url = url_cache.get(video_url)
+        
+        if not audio_url:
+            print("Error: Could not get audio stream URL.")
+            sys.exit(1)
+        
+        print(f"Audio stream URL obtained.")
     
-    # Load Whisper model (using base model for speed, can use 'small', 'medium', 'large' for better accuracy)
+    print(f"Loading {args.engine} model '{args.model}' (this may take a moment on first run)...")
+    
+    # Load the speech model (base for speed; small, medium, large for better accuracy)
+    model = None
+    pool = None
     try:
-        model = whisper.load_model("base")
-        print("Model loaded successfully!")
+        if args.workers > 1:
+            # Each worker process loads its own replica; the main process keeps none
+            pool = TranscriptionPool(args.engine, args.model, processes=args.workers, threads_per_worker=args.threads,
+                                     compute_type=args.compute_type, num_workers=args.engine_workers)
+            print(f"Started {pool.processes} transcription workers with {pool.threads_per_worker} threads each.")
+        else:
+            model = load_engine(args.engine, args.model, compute_type=args.compute_type,
+                                threads=args.threads, num_workers=args.engine_workers)
+            print("Model loaded successfully!")
+            if args.overload == 'degrade':
+                model = AdaptiveEngine(model, lambda size: load_engine(args.engine, size, compute_type=args.compute_type,
+                                                                       threads=args.threads, num_workers=args.engine_workers),
+                                       min_model=args.min_model)
     except Exception as e:
-        print(f"Error loading Whisper model: {e}")
-        print("Make sure you have openai-whisper installed: pip install openai-whisper")
+        print(f"Error loading {args.engine} model: {e}")
         sys.exit(1)
     
+    correction_pool = None
+    if args.correction_model:
+        # Loaded in the background workers, which run below the draft model's priority
+        correction_pool = TranscriptionPool(args.engine, args.correction_model, processes=args.correction_workers,
+                                            threads_per_worker=args.correction_threads, nice=args.correction_nice,
+                                            compute_type=args.compute_type, num_workers=args.engine_workers)
+        print(f"Cascade: '{args.model}' drafts, corrected by '{args.correction_model}' "
+              f"in {correction_pool.processes} background worker(s).")
+    
+    memory = None
+    if args.soak:
+        memory = MemoryMonitor(interval=args.memory_interval, jsonl_path=args.memory_log,
+                               on_snapshot=lambda snapshot: print(format_snapshot(snapshot), file=sys.stderr))
+        memory.start()
+        if hasattr(signal, 'SIGUSR1'):
+            # Debug hook: `kill -USR1 <pid>` logs a snapshot right away
+            signal.signal(signal.SIGUSR1, lambda *_: threading.Thread(target=memory.snapshot, daemon=True).start())
+        print(f"[Info] Soak mode: memory snapshots every {args.memory_interval:.0f}s (kill -USR1 {os.getpid()} for one now)")
+
     # Process audio stream
-    # Using simpler method for better compatibility
     try:
-        process_audio_stream_simple(model, audio_url, video_url, chunk_duration=15)
+        if args.mode == 'pcm':
+            process_audio_stream_pcm(
+                model, args.url, chunk_duration=args.chunk_duration, overlap=args.overlap, vad=args.vad,
+                batch_size=args.batch_size, batch_wait=args.batch_wait_ms / 1000, streaming=args.streaming,
+                step=args.step, pool=pool, correction_pool=correction_pool,
+                ingest=IngestOptions(url_cache=url_cache, decoder=args.decoder, hot_swap=args.hot_swap),
+                overload=OverloadOptions(max_queue=args.max_queue or None, policy=args.overload),
+                outputs=OutputOptions(subtitles=args.subtitles, subtitle_window=args.subtitle_window,
+                                      broadcast_port=args.broadcast_port, viewer_buffer=args.viewer_buffer,
+                                      metrics_jsonl=args.metrics_jsonl, metrics_port=args.metrics_port),
+                recording=RecordingOptions(record=args.record, replay=args.replay, replay_speed=args.replay_speed))
+        else:
+            process_audio_stream_simple(model, audio_url, video_url, chunk_duration=args.chunk_duration,
+                                        max_queue=args.max_queue, url_cache=url_cache)
     except KeyboardInterrupt:
         print("\n\nStopped by user.")
         sys.exit(0)
+    finally:
+        if memory:
+            memory.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""
+Raw audio recording for the live captions pipeline.
+Appends the ingested 16 kHz audio of a stream to a raw s16le file with a small
+binary index of sample offsets and wall-clock times, and replays recordings
+through a memory map so hours of a stream can be re-transcribed offline,
+faster than real time and with any model.
+"""
+
+import bisect
+import os
+import struct
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from audio_buffer import BYTES_PER_SAMPLE, SAMPLE_RATE, PcmRingBuffer
+from ingest import READ_BLOCK_SECONDS, IngestError, StreamOpenError
+
+INDEX_SUFFIX = '.idx'
+# One index record: sample offset in the recording, wall-clock time of that sample (Unix seconds)
+INDEX_RECORD = struct.Struct('<qd')
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+class AudioRecorder:
+    """Appends a stream's audio to `path` (raw s16le, 16 kHz mono) and indexes it in path + '.idx'.
+
+    An index record is written when recording starts, every index_interval seconds of audio,
+    and whenever the audio falls more than max_drift seconds out of step with the wall clock
+    (reconnects, gaps), so any sample can be mapped back to the time it was heard. Recording
+    into an existing file appends to it.
+    """
+
+    def __init__(self, path: str, index_interval: float = 10.0, max_drift: float = 2.0):
+        self.path = path
+        self.index_interval = index_interval
+        self.max_drift = max_drift
+        self._data = open(path, 'ab')
+        self._index = open(index_path(path), 'ab')
+        self.samples = self._data.tell() // BYTES_PER_SAMPLE  # Samples in the file, including earlier runs
+        self._ring_pos: Optional[int] = None
+        self._anchor: Optional[tuple[int, float]] = None  # Last index record
+        self._lock = threading.Lock()
+
+    def capture(self, ring: PcmRingBuffer):
+        """Append the samples written to the ring since the last call."""
+        with self._lock:
+            if self._data.closed:
+                return
+            # Audio the ring already overwrote is lost; the wall-clock check below indexes the jump
+            start = ring.oldest if self._ring_pos is None else max(self._ring_pos, ring.oldest)
+            audio = ring.view(start, ring.total)
+            self._ring_pos = ring.total
+            if audio is None:
+                return
+            # The newest sample was just written, so the block started len(audio) samples ago
+            wall = time.time() - len(audio) / SAMPLE_RATE
+            if self._anchor is None:
+                self._write_index(wall)
+            else:
+                anchor_sample, anchor_wall = self._anchor
+                expected = anchor_wall + (self.samples - anchor_sample) / SAMPLE_RATE
+                if abs(wall - expected) > self.max_drift:
+                    self._write_index(wall)
+                elif self.samples - anchor_sample >= self.index_interval * SAMPLE_RATE:
+                    self._write_index(expected)
+            pcm = np.clip(np.round(audio * 32768.0), -32768, 32767).astype('<i2')
+            self._data.write(pcm.tobytes())
+            self.samples += len(pcm)
+
+    def _write_index(self, wall: float):
+        self._index.write(INDEX_RECORD.pack(self.samples, wall))
+        self._anchor = (self.samples, wall)
+
+    def flush(self):
+        with self._lock:
+            if not self._data.closed:
+                self._data.flush()
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._data.closed:
+                self._data.close()
+                self._index.close()
+
+
+class RecordingIndex:
+    """Maps samples of a recording to wall-clock times and back."""
+
+    def __init__(self, path: str):
+        self.samples: list[int] = []
+        self.walls: list[float] = []
+        if os.path.exists(index_path(path)):
+            with open(index_path(path), 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size  # A torn last record is ignored
+            for sample, wall in INDEX_RECORD.iter_unpack(data[:usable]):
+                self.samples.append(sample)
+                self.walls.append(wall)
+
+    def wall_time(self, sample: int) -> Optional[float]:
+        """Wall-clock time the sample was recorded, or None without an index."""
+        if not self.samples:
+            return None
+        i = max(0, bisect.bisect_right(self.samples, sample) - 1)
+        return self.walls[i] + (sample - self.samples[i]) / SAMPLE_RATE
+
+    def sample_at(self, wall: float) -> int:
+        """First sample recorded at or after the wall-clock time (0 without an index)."""
+        if not self.samples:
+            return 0
+        # Walls only increase between records; after a gap the next record jumps ahead
+        i = max(0, bisect.bisect_right(self.walls, wall) - 1)
+        offset = int(round((wall - self.walls[i]) * SAMPLE_RATE))
+        next_sample = self.samples[i + 1] if i + 1 < len(self.samples) else None
+        sample = self.samples[i] + max(0, offset)
+        return min(sample, next_sample) if next_sample is not None else sample
+
+
+class RecordingSource:
+    """Replays a recording into a ring through a memory map.
+
+    Takes the same start/wait/stop interface as the live sources. speed=0 writes as fast as
+    the pipeline accepts audio; speed=1 paces at real time. start/end are sample offsets in
+    the recording (see RecordingIndex.sample_at to start from a wall-clock time).
+    """
+
+    def __init__(self, path: str, ring: PcmRingBuffer, on_samples: Callable[[], None], speed: float = 0.0,
+                 start: int = 0, end: Optional[int] = None):
+        self.path = path
+        self.ring = ring
+        self.on_samples = on_samples
+        self.speed = speed
+        self.start_sample = start
+        self.end_sample = end
+        self.error: Optional[IngestError] = None
+        self._stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._replay, daemon=True)
+        self.thread.start()
+
+    def _replay(self):
+        # Bigger blocks when unpaced: fewer wakeups of the chunker for the same audio
+        block = int(SAMPLE_RATE * (READ_BLOCK_SECONDS if self.speed > 0 else 1.0))
+        started = time.monotonic()
+        try:
+            audio = np.memmap(self.path, dtype='<i2', mode='r') if os.path.getsize(self.path) else np.zeros(0, '<i2')
+            end = len(audio) if self.end_sample is None else min(self.end_sample, len(audio))
+            position = self.start_sample
+            while position < end and not self._stopping.is_set():
+                count = min(block, end - position)
+                self.ring.write(audio[position:position + count])  # Converted to float32 straight from the page cache
+                position += count
+                self.on_samples()
+                if self.speed > 0:
+                    ahead = (position - self.start_sample) / SAMPLE_RATE / self.speed - (time.monotonic() - started)
+                    if ahead > 0:
+                        self._stopping.wait(ahead)
+        except (OSError, ValueError) as e:
+            self.error = StreamOpenError(f"{self.path}: {e}", retryable=False)
+        finally:
+            self.on_samples()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> int:
+        self.join()
+        return 1 if self.error else 0
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=2)
@@ -0,0 +1,169 @@
+"""
+Stream URL resolution for the live captions pipeline.
+Turns a YouTube video or live URL into a direct audio stream URL with yt-dlp,
+which is imported on first use so importing this module stays cheap, and
+caches resolved URLs, refreshing them in the background before they expire.
+"""
+
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+_PATH_EXPIRE = re.compile(r'/expire/(\d+)')
+
+
+def get_audio_stream_url(video_url: str) -> Optional[str]:
+    """Get the direct audio stream URL from YouTube."""
+    try:
+        import yt_dlp
+
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'quiet': True,
+            'no_warnings': True,
+            'extractor_args': {'youtube': {'player_client': ['default']}},
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+            if 'url' in info:
+                return info['url']
+            # Try to get from formats
+            if 'formats' in info:
+                for fmt in info['formats']:
+                    if fmt.get('acodec') != 'none' and fmt.get('vcodec') == 'none':
+                        return fmt.get('url')
+    except Exception as e:
+        print(f"Error getting audio stream URL: {e}", file=sys.stderr)
+    return None
+
+
+def url_expiry(audio_url: str) -> Optional[float]:
+    """Unix time at which a googlevideo URL expires, from its `expire` query or path parameter."""
+    parsed = urlparse(audio_url)
+    values = parse_qs(parsed.query).get('expire')
+    if not values:
+        # HLS manifest URLs carry their parameters as path segments: .../expire/1700000000/...
+        match = _PATH_EXPIRE.search(parsed.path)
+        values = [match.group(1)] if match else None
+    try:
+        return float(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class CachedUrl:
+    audio_url: Optional[str]
+    expires: float
+    refresh_at: float
+    failures: int = 0  # Extractions that failed in a row
+
+
+class StreamUrlCache:
+    """Resolved audio URLs keyed by video URL, refreshed in the background before they expire.
+
+    get() returns a cached URL immediately while it is valid, so reconnects do not wait for
+    an extraction. URLs without an expiry are assumed valid for default_ttl seconds. A failed
+    refresh is retried with a doubling interval, and after max_failures failures in a row the
+    URL is no longer refreshed in the background; the next get() tries again. The extractor
+    and clock are injectable, so the cache can be exercised without the network.
+    """
+
+    def __init__(self, extract: Callable[[str], Optional[str]] = get_audio_stream_url,
+                 refresh_margin: float = 300.0, default_ttl: float = 1800.0, retry_interval: float = 30.0,
+                 max_failures: int = 5, clock: Callable[[], float] = time.time):
+        self.extract = extract
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.retry_interval = retry_interval
+        self.max_failures = max_failures
+        self.clock = clock
+        self._entries: dict[str, CachedUrl] = {}
+        self._resolving: dict[str, threading.Lock] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, video_url: str) -> Optional[str]:
+        """Return a valid audio URL for video_url, extracting it now only if none is cached."""
+        with self._cond:
+            entry = self._entries.get(video_url)
+            if entry and entry.audio_url and self.clock() < entry.expires:
+                return entry.audio_url
+            lock = self._resolving.setdefault(video_url, threading.Lock())
+        with lock:  # Concurrent callers for one URL share a single extraction
+            with self._cond:
+                entry = self._entries.get(video_url)
+                if entry and entry.audio_url and self.clock() < entry.expires:
+                    return entry.audio_url
+            return self._resolve(video_url)
+
+    def invalidate(self, video_url: str):
+        """Drop the cached URL (e.g. the server rejected it); the next get() extracts a new one."""
+        with self._cond:
+            entry = self._entries.get(video_url)
+            if entry:
+                entry.audio_url = None
+
+    def forget(self, video_url: str):
+        """Stop caching and refreshing a video URL."""
+        with self._cond:
+            self._entries.pop(video_url, None)
+            self._resolving.pop(video_url, None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _resolve(self, video_url: str) -> Optional[str]:
+        audio_url = self.extract(video_url)
+        now = self.clock()
+        with self._cond:
+            entry = self._entries.get(video_url)
+            if audio_url:
+                expires = url_expiry(audio_url) or now + self.default_ttl
+                # Refresh a margin ahead of expiry, or halfway through a short-lived URL's lifetime
+                refresh_at = max(expires - self.refresh_margin, now + (expires - now) / 2)
+                self._entries[video_url] = CachedUrl(audio_url, expires, refresh_at)
+            else:
+                if entry is None:
+                    entry = self._entries[video_url] = CachedUrl(None, now, now)
+                # Keep a still-valid URL and try again later, backing off while extraction keeps failing
+                entry.failures += 1
+                if entry.failures >= self.max_failures:
+                    print(f"[Warning] Giving up refreshing {video_url} after {entry.failures} failed extractions",
+                          file=sys.stderr)
+                    if entry.audio_url and now < entry.expires:
+                        entry.refresh_at = float('inf')  # Served until it expires, then get() extracts again
+                    else:
+                        del self._entries[video_url]
+                        entry = None
+                else:
+                    entry.refresh_at = now + self.retry_interval * 2 ** (entry.failures - 1)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refresh_loop, name="url-refresh", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return audio_url or (entry.audio_url if entry and now < entry.expires else None)
+
+    def _refresh_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = self.clock()
+                due = [url for url, entry in self._entries.items() if entry.refresh_at <= now]
+                if not due:
+                    next_at = min((entry.refresh_at for entry in self._entries.values()), default=None)
+                    # Wake at least once a minute, since the injected clock may not be wall time
+                    self._cond.wait(timeout=min(60.0, next_at - now) if next_at is not None else 60.0)
+                    continue
+            for video_url in due:
+                with self._resolving.setdefault(video_url, threading.Lock()):
+                    if video_url in self._entries:
+                        self._resolve(video_url)
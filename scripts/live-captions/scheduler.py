@@ -0,0 +1,106 @@
+"""
+Scheduling of transcription work across live streams.
+Every stream gets its own queue; a single shared model pulls from them in
+round-robin order so a busy stream cannot starve the others. Queues can be
+bounded, so a model slower than real time sheds or merges old work instead
+of letting latency grow without limit.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+
+class FairScheduler:
+    """Round-robin scheduler over per-stream queues feeding one shared model."""
+
+    def __init__(self, max_pending: Optional[int] = None,
+                 merge: Optional[Callable[[Any, Any], Optional[Any]]] = None,
+                 on_drop: Optional[Callable[[str, Any, bool], None]] = None):
+        """max_pending bounds each stream's queue. When a put finds it full, the two oldest items
+        are combined with merge(older, newer) if given (None when they cannot be merged), otherwise
+        the oldest item is dropped. on_drop(stream_id, item, merged) is called outside the lock
+        for every item removed from a queue.
+        """
+        self.max_pending = max_pending
+        self.merge = merge
+        self.on_drop = on_drop
+        self._queues: dict[str, deque] = {}
+        self._ready: deque[str] = deque()  # Streams with pending work, in service order
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, stream_id: str, item: Any):
+        dropped = None
+        merged = None
+        with self._cond:
+            items = self._queues.setdefault(stream_id, deque())
+            if not items:
+                self._ready.append(stream_id)
+            if self.max_pending and len(items) >= self.max_pending:
+                dropped = items.popleft()
+                merged = self.merge(dropped, items[0]) if self.merge and items else None
+                if merged is not None:
+                    items[0] = merged
+            items.append(item)
+            self._cond.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(stream_id, dropped, merged is not None)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple[str, Any]]:
+        """Return the next (stream_id, item), or None once closed and drained (or on timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready or self._closed, timeout):
+                return None
+            if not self._ready:
+                return None
+            stream_id = self._ready.popleft()
+            items = self._queues[stream_id]
+            item = items.popleft()
+            if items:
+                self._ready.append(stream_id)
+            return stream_id, item
+
+    def get_batch(self, max_batch: int = 8, max_wait: float = 0.2) -> list[tuple[str, Any]]:
+        """Collect up to max_batch items, waiting at most max_wait after the first one is available.
+
+        Returns an empty list once closed and drained.
+        """
+        first = self.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            item = self.get(timeout=remaining)
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def pending(self, stream_id: Optional[str] = None) -> int:
+        with self._cond:
+            if stream_id is not None:
+                return len(self._queues.get(stream_id, ()))
+            return sum(len(items) for items in self._queues.values())
+
+    def discard(self, stream_id: str) -> int:
+        """Drop every queued item of a stream (it was removed); return how many were dropped."""
+        with self._cond:
+            items = self._queues.pop(stream_id, ())
+            if stream_id in self._ready:
+                self._ready.remove(stream_id)
+            return len(items)
+
+    def close(self, drain: bool = True):
+        """Stop accepting waits; with drain=False, queued work is discarded."""
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self._queues.clear()
+                self._ready.clear()
+            self._cond.notify_all()
@@ -0,0 +1,277 @@
+"""
+Caption sessions for the live captions pipeline.
+A CaptionSession owns the stream pipelines, the fair scheduler and the
+transcription worker (or process pool) and turns audio chunks into stitched
+captions delivered through callbacks, so the CLI and offline tools share it.
+"""
+
+import sys
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from backpressure import AdaptiveEngine, merge_chunks
+from cascade import CascadeCorrector
+from engines import AsrEngine, TranscriptionResult
+from metrics import PipelineMetrics, mark
+from outputs import CaptionSegment
+from pipeline import SourceOpener, StreamPipeline
+from scheduler import FairScheduler
+from stitching import TranscriptStitcher
+from streaming import GrowingWindowChunker
+from worker_pool import OrderedReassembler, TranscriptionPool
+
+CaptionCallback = Callable[[str, str], None]  # (stream_id, text)
+SegmentCallback = Callable[[CaptionSegment], None]
+
+
+def transcribe_audio_batch(engine: AsrEngine, audios: list[np.ndarray], word_timestamps: bool = False,
+                           features: Optional[list[Optional[np.ndarray]]] = None) -> list[Optional[TranscriptionResult]]:
+    """Transcribe several 16 kHz float32 windows in one batched engine call."""
+    try:
+        return engine.transcribe_batch(audios, language='en', word_timestamps=word_timestamps, features=features)
+    except Exception as e:
+        print(f"Error transcribing audio batch: {e}", file=sys.stderr)
+        return [None] * len(audios)
+
+
+class CaptionSession:
+    """Transcribes every stream pipeline with one shared model (or a process pool).
+
+    With batch_size > 1, chunks that become ready within batch_wait seconds of each other
+    (from any stream) are decoded together. With a pool, chunks go to worker processes
+    (model is then unused) and are put back into stream order before stitching.
+    At most max_queue chunks wait per stream; beyond that the oldest is dropped, or with
+    overload='merge' the two oldest are decoded as one window. An AdaptiveEngine model is
+    given the queue depth so it can step its quality down and back up. Streams can be added
+    and removed while the session runs. on_segment receives every caption with the stream
+    time it covers (from ring sample offsets), for subtitle files and viewers. With
+    feature_cache, pipelines compute log-mel features as audio arrives for engines that
+    accept them (not for the pool, whose workers compute their own). With a corrector, every
+    committed caption is also re-transcribed by a larger model (see cascade.CascadeCorrector).
+    """
+
+    def __init__(self, model: Optional[AsrEngine], on_caption: CaptionCallback,
+                 on_partial: Optional[CaptionCallback] = None, batch_size: int = 1, batch_wait: float = 0.2,
+                 pool: Optional[TranscriptionPool] = None, metrics: Optional[PipelineMetrics] = None,
+                 max_queue: Optional[int] = None, overload: str = 'drop-oldest',
+                 on_segment: Optional[SegmentCallback] = None, feature_cache: bool = True,
+                 corrector: Optional[CascadeCorrector] = None):
+        self.model = model
+        self.corrector = corrector
+        self.feature_cache = feature_cache
+        self.on_caption = on_caption
+        self.on_partial = on_partial
+        self.on_segment = on_segment
+        self._stream_time: dict[str, float] = {}  # End of the last caption per stream
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.pool = pool
+        self.metrics = metrics or PipelineMetrics()
+        self.scheduler = FairScheduler(max_pending=max_queue, merge=merge_chunks if overload == 'merge' else None,
+                                       on_drop=self._on_drop)
+        self.pipelines: dict[str, StreamPipeline] = {}
+        self.stitchers: dict[str, TranscriptStitcher] = {}
+        self.reassembler = OrderedReassembler(self._deliver)
+        self.worker_thread: Optional[threading.Thread] = None
+
+    def add_stream(self, stream_id: str, open_source: SourceOpener, **pipeline_options) -> StreamPipeline:
+        """Create the ingest pipeline for a stream (started right away if the session runs).
+
+        Options are passed to StreamPipeline.
+        """
+        if self.feature_cache and not self.pool and self.model is not None:
+            pipeline_options.setdefault('n_mels', self.model.n_mels)
+        pipeline = StreamPipeline(stream_id, open_source, self.scheduler, **pipeline_options)
+        self.stitchers[stream_id] = TranscriptStitcher()
+        self.pipelines[stream_id] = pipeline
+        self.reassembler.open(stream_id)
+        self.metrics.register_stream(stream_id,
+                                     queue_depth=lambda: self.scheduler.pending(stream_id),
+                                     ingested_seconds=lambda ring=pipeline.ring: ring.total / ring.sample_rate)
+        if self.worker_thread:
+            self._attach_model()
+            pipeline.start()
+        return pipeline
+
+    def remove_stream(self, stream_id: str):
+        """Stop a stream, discard its queued chunks and emit the text still pending for it."""
+        pipeline = self.pipelines.pop(stream_id, None)
+        if pipeline is None:
+            return
+        pipeline.stop()
+        pipeline.join(timeout=5)
+        self.scheduler.discard(stream_id)
+        self.metrics.unregister_stream(stream_id)
+        self.reassembler.forget(stream_id)
+        self._attach_model()
+        self._flush(stream_id, self.stitchers.pop(stream_id), pipeline)
+        self._stream_time.pop(stream_id, None)
+
+    def start(self):
+        self._attach_model()
+        target = self._dispatch_worker if self.pool else self._transcribe_worker
+        self.worker_thread = threading.Thread(target=target, name="transcribe", daemon=True)
+        self.worker_thread.start()
+        for pipeline in list(self.pipelines.values()):
+            pipeline.start()
+
+    def _attach_model(self):
+        if isinstance(self.model, AdaptiveEngine):
+            self.model.attach(self.scheduler.pending, len(self.pipelines))
+
+    def wait(self):
+        """Block until every stream has ended, then drain the queues and flush pending text."""
+        for pipeline in list(self.pipelines.values()):
+            pipeline.join()
+        self.scheduler.close()  # Worker stops once the queues are drained
+        self.worker_thread.join(timeout=30)
+        if self.pool:
+            self.pool.shutdown(wait=True)
+        for stream_id, pipeline in list(self.pipelines.items()):
+            self._flush(stream_id, self.stitchers[stream_id], pipeline)
+        if self.corrector:
+            self.corrector.shutdown(wait=True)  # Deliver the corrections still running
+
+    def run(self):
+        self.start()
+        self.wait()
+
+    def stop(self):
+        """Stop ingest immediately and discard queued work."""
+        for pipeline in list(self.pipelines.values()):
+            pipeline.stop()
+        self.scheduler.close(drain=False)
+        if self.pool:
+            self.pool.shutdown(wait=False)
+        if self.corrector:
+            self.corrector.shutdown(wait=False)
+
+    def _generation_of(self, stream_id: str, chunk) -> Optional[int]:
+        """Reassembly generation of the stream that produced the chunk (None if it was removed)."""
+        pipeline = self.pipelines.get(stream_id)
+        return self.reassembler.generation(stream_id) if pipeline and pipeline.ring is chunk.ring else None
+
+    def _on_drop(self, stream_id: str, chunk, merged: bool):
+        action = "Merged" if merged else "Dropped"
+        print(f"[Warning] {action} {stream_id} chunk {chunk.seq}: transcription queue is full.", file=sys.stderr)
+        self.metrics.record_drop(stream_id)
+        if self.pool:
+            self.reassembler.add(stream_id, chunk.seq, None, self._generation_of(stream_id, chunk))
+
+    def _flush(self, stream_id: str, stitcher: TranscriptStitcher, pipeline: StreamPipeline):
+        self._emit(stream_id, stitcher.flush(), stitcher)
+        if isinstance(pipeline.chunker, GrowingWindowChunker):
+            self._emit(stream_id, pipeline.chunker.stitcher.flush(), pipeline.chunker.stitcher)
+
+    def _emit(self, stream_id: str, text: str, stitcher: TranscriptStitcher, chunk=None):
+        span = stitcher.take_span()
+        if not text:
+            return
+        self.on_caption(stream_id, text)
+        if self.on_segment or self.corrector:
+            if span is None:
+                # Text without word timings covers the window it came from
+                last = self._stream_time.get(stream_id, 0.0)
+                span = (chunk.start_seconds, chunk.end_seconds) if chunk else (last, last)
+            self._stream_time[stream_id] = span[1]
+            segment = CaptionSegment(stream_id, text, *span)
+            if self.on_segment:
+                self.on_segment(segment)
+            pipeline = self.pipelines.get(stream_id)
+            if self.corrector and pipeline:
+                self.corrector.submit(segment, pipeline.ring)
+
+    def _transcribe_streaming(self, stream_id: str, chunker: GrowingWindowChunker, chunk, audio: Optional[np.ndarray],
+                              features: Optional[np.ndarray] = None):
+        """Decode one growing window with the finalized text as prompt and emit final/partial captions."""
+        result = None
+        if audio is not None:
+            try:
+                result = self.model.transcribe(audio, language='en', initial_prompt=chunker.initial_prompt(),
+                                               word_timestamps=True, features=features)
+            except Exception as e:
+                print(f"Error transcribing audio: {e}", file=sys.stderr)
+        mark(chunk, 'transcribed')
+        final, partial = chunker.update(result, chunk)
+        self._emit(stream_id, final, chunker.stitcher, chunk)
+        if self.on_partial and partial:
+            self.on_partial(stream_id, partial)
+        self.metrics.observe(stream_id, chunk)
+
+    def _transcribe_worker(self):
+        """Worker thread to transcribe batches of in-memory audio windows from every stream."""
+        while True:
+            batch = self.scheduler.get_batch(max_batch=self.batch_size, max_wait=self.batch_wait)
+            if not batch:  # Closed and drained
+                break
+
+            try:
+                ready = []
+                for stream_id, chunk in batch:
+                    mark(chunk, 'dequeued')
+                    pipeline = self.pipelines.get(stream_id)
+                    if pipeline is None:  # Removed while the chunk was queued
+                        continue
+                    audio = chunk.samples()
+                    features = pipeline.features.frames(chunk.start, chunk.end) if pipeline.features and audio is not None else None
+                    if isinstance(pipeline.chunker, GrowingWindowChunker):
+                        # Each window depends on what the previous one finalized, so these are not batched
+                        self._transcribe_streaming(stream_id, pipeline.chunker, chunk, audio, features)
+                        continue
+                    if audio is None:
+                        print(f"[Warning] Dropped {stream_id} chunk {chunk.seq}: transcription fell too far behind the stream.", file=sys.stderr)
+                        continue
+                    ready.append((stream_id, chunk, audio, features))
+                if not ready:
+                    continue
+
+                results = transcribe_audio_batch(self.model, [audio for _, _, audio, _ in ready], word_timestamps=True,
+                                                 features=[features for _, _, _, features in ready])
+                for (stream_id, chunk, _, _), result in zip(ready, results):
+                    mark(chunk, 'transcribed')
+                    if result:
+                        self._deliver(stream_id, (result, chunk))
+                    else:
+                        self.metrics.observe(stream_id, chunk)
+            except Exception as e:
+                print(f"Transcription error: {e}", file=sys.stderr)
+
+    def _deliver(self, stream_id: str, item):
+        result, chunk = item
+        stitcher = self.stitchers.get(stream_id)
+        if stitcher is None:  # Removed while the chunk was transcribed
+            return
+        # Overlapping windows are merged word by word; only stable text is emitted
+        self._emit(stream_id, stitcher.add(result, chunk.start_seconds, chunk.stable_until_seconds), stitcher, chunk)
+        self.metrics.observe(stream_id, chunk)
+
+    def _on_pool_result(self, future, stream_id: str, chunk, generation: Optional[int]):
+        mark(chunk, 'transcribed')
+        try:
+            self.reassembler.add(stream_id, chunk.seq, (future.result(), chunk), generation)
+        except Exception as e:
+            print(f"Transcription error: {e}", file=sys.stderr)
+            self.reassembler.add(stream_id, chunk.seq, None, generation)
+
+    def _dispatch_worker(self):
+        """Worker thread that hands chunks to the process pool in fair stream order."""
+        while True:
+            item = self.scheduler.get()
+            if item is None:  # Closed and drained
+                break
+
+            stream_id, chunk = item
+            mark(chunk, 'dequeued')
+            generation = self._generation_of(stream_id, chunk)
+            if generation is None:  # Removed while the chunk was queued
+                continue
+            audio = chunk.samples()
+            if audio is None:
+                print(f"[Warning] Dropped {stream_id} chunk {chunk.seq}: transcription fell too far behind the stream.", file=sys.stderr)
+                self.reassembler.add(stream_id, chunk.seq, None, generation)
+                continue
+            future = self.pool.submit(audio, word_timestamps=True)
+            future.add_done_callback(lambda f, stream_id=stream_id, chunk=chunk, generation=generation:
+                                     self._on_pool_result(f, stream_id, chunk, generation))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Soak benchmark for the live captions pipeline.
+Replays hours of synthetic audio through a caption session as fast as the
+pipeline accepts it, snapshots memory (RSS and tracemalloc) along the way and
+fails if it keeps growing after warm-up, so leaks that would only show after
+days on a 24/7 stream are caught in minutes. Runs without network access.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+# Never reach out to the model hub; models must already be cached or given as local paths
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+from audio_buffer import SAMPLE_RATE, PcmRingBuffer
+from engines import ENGINES, AsrEngine, Segment, TranscriptionResult, Word, load_engine
+from ingest import IngestError
+from memory import MemoryMonitor, format_snapshot
+from session import CaptionSession
+
+
+class SyntheticSource:
+    """Writes `seconds` of deterministic speech-like audio (noise bursts and pauses) into a ring, unpaced."""
+
+    def __init__(self, ring: PcmRingBuffer, on_samples: Callable[[], None], seconds: float, seed: int = 0):
+        self.ring = ring
+        self.on_samples = on_samples
+        self.seconds = seconds
+        self.seed = seed
+        self.error: Optional[IngestError] = None
+        self._stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._generate, daemon=True)
+        self.thread.start()
+
+    def _generate(self):
+        rng = np.random.default_rng(self.seed)
+        remaining = int(self.seconds * SAMPLE_RATE)
+        try:
+            while remaining > 0 and not self._stopping.is_set():
+                count = min(SAMPLE_RATE, remaining)
+                # Mostly "speech" seconds with an occasional pause, so VAD runs cut chunks too
+                level = 0.2 if rng.random() < 0.85 else 0.002
+                self.ring.write((rng.standard_normal(count) * level).astype(np.float32))
+                remaining -= count
+                self.on_samples()
+        finally:
+            self.on_samples()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> int:
+        self.join()
+        return 0
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=2)
+
+
+class NullEngine(AsrEngine):
+    """Returns a word per half second derived from the audio itself, without inference.
+
+    Overlapping windows see the same audio and so produce the same words, which keeps the
+    stitcher and every output doing their usual work while the model costs nothing.
+    """
+
+    def __init__(self, model_size: str = 'null', **_options):
+        self.model_size = model_size
+
+    def transcribe(self, audio, language: Optional[str] = 'en', initial_prompt: Optional[str] = None,
+                   word_timestamps: bool = False, features: Optional[np.ndarray] = None) -> TranscriptionResult:
+        step = SAMPLE_RATE // 2
+        words = [Word(i / 2, i / 2 + 0.5, f" w{int(np.abs(audio[start:start + step]).sum()) % 997}")
+                 for i, start in enumerate(range(0, len(audio) - step + 1, step))]
+        duration = len(audio) / SAMPLE_RATE
+        text = ''.join(w.text for w in words)
+        return TranscriptionResult(text.strip(), [Segment(0.0, duration, text, words)], language, duration, 0.0)
+
+
+def run_soak(model: AsrEngine, args) -> tuple[list[dict], float]:
+    """Replay the synthetic streams; return (memory samples, wall seconds)."""
+    captions = [0]
+    session = CaptionSession(model, lambda stream_id, text: captions.__setitem__(0, captions[0] + 1),
+                             max_queue=args.max_queue, on_segment=lambda segment: None)
+    seconds = args.hours * 3600
+    for i in range(args.streams):
+        session.add_stream(f"soak{i + 1}", lambda ring, on_samples, seed=i: SyntheticSource(ring, on_samples, seconds, seed),
+                           chunk_duration=args.chunk_duration, overlap=args.overlap, vad=args.vad,
+                           streaming=args.streaming, step=args.step, max_restarts=1,
+                           # Unpaced: read no further ahead than the model transcribes
+                           max_pending=1)
+    pipelines = list(session.pipelines.values())
+    monitor = MemoryMonitor(top=args.top)
+    samples = []
+
+    def sample():
+        gc.collect()
+        snapshot = monitor.snapshot()
+        snapshot['audio_seconds'] = round(sum(p.ring.total for p in pipelines) / SAMPLE_RATE / len(pipelines), 1)
+        snapshot['captions'] = captions[0]
+        samples.append(snapshot)
+        if not args.quiet:
+            print(f"[Info] {snapshot['audio_seconds'] / 3600:.2f}h audio: RSS {snapshot['rss_mb']:.1f} MiB, "
+                  f"traced {snapshot['traced_mb']:.2f} MiB, {snapshot['captions']} captions")
+
+    gc.collect()
+    monitor.start()
+    started = time.perf_counter()
+    runner = threading.Thread(target=session.run, daemon=True)
+    runner.start()
+    while runner.is_alive():
+        runner.join(args.sample_interval)
+        sample()
+    monitor.stop()
+    return samples, time.perf_counter() - started
+
+
+def growth(samples: list[dict], warmup_seconds: float) -> Optional[dict]:
+    """Memory growth from the first sample after warm-up to the last one."""
+    settled = [s for s in samples if s['audio_seconds'] >= warmup_seconds]
+    if len(settled) < 2:
+        return None
+    first, last = settled[0], settled[-1]
+    hours = (last['audio_seconds'] - first['audio_seconds']) / 3600
+    return {
+        'from_audio_seconds': first['audio_seconds'],
+        'to_audio_seconds': last['audio_seconds'],
+        'rss_mb': round(last['rss_mb'] - first['rss_mb'], 2),
+        'traced_mb': round(last['traced_mb'] - first['traced_mb'], 3),
+        'traced_mb_per_hour': round((last['traced_mb'] - first['traced_mb']) / hours, 3) if hours > 0 else 0.0,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay hours of synthetic audio through the captions pipeline "
+                                                 "and fail if memory keeps growing")
+    parser.add_argument('--hours', type=float, default=3.0, help="Hours of audio per stream")
+    parser.add_argument('--streams', type=int, default=1, help="Concurrent synthetic streams")
+    parser.add_argument('--engine', choices=['null'] + list(ENGINES), default='null',
+                        help="null answers without inference, so only the pipeline's own memory is measured")
+    parser.add_argument('--model', default='tiny', help="Model size or local path for a real engine; nothing is downloaded")
+    parser.add_argument('--chunk-duration', type=int, default=15)
+    parser.add_argument('--overlap', type=float, default=0.1)
+    parser.add_argument('--vad', action='store_true')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--step', type=float, default=1.0)
+    parser.add_argument('--max-queue', type=int, default=3)
+    parser.add_argument('--sample-interval', type=float, default=5.0, help="Wall seconds between memory samples")
+    parser.add_argument('--warmup-minutes', type=float, default=20.0,
+                        help="Minutes of audio before the baseline sample (rings and caches fill up first)")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=50.0, help="Fail if RSS grows more than this after warm-up")
+    parser.add_argument('--max-traced-growth-mb', type=float, default=5.0,
+                        help="Fail if traced Python allocations grow more than this after warm-up")
+    parser.add_argument('--top', type=int, default=10, help="Growing allocation sites to report")
+    parser.add_argument('--json', help="Write every memory sample and the verdict to this file")
+    parser.add_argument('--quiet', action='store_true', help="Only print the summary")
+    args = parser.parse_args()
+    if args.streaming and args.vad:
+        parser.error("--streaming and --vad cannot be combined")
+    if args.max_queue <= 0:
+        parser.error("--max-queue must be bounded for a soak run")
+    if args.warmup_minutes * 60 >= args.hours * 3600:
+        parser.error("--warmup-minutes must be shorter than --hours")
+    return args
+
+
+def main():
+    args = parse_args()
+    try:
+        model = NullEngine() if args.engine == 'null' else load_engine(args.engine, args.model)
+    except Exception as e:
+        print(f"Error loading {args.engine} model: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    samples, wall_seconds = run_soak(model, args)
+    result = growth(samples, args.warmup_minutes * 60)
+    audio_hours = samples[-1]['audio_seconds'] / 3600 if samples else 0.0
+    print(f"\n{args.streams} x {audio_hours:.2f}h of audio in {wall_seconds:.1f}s")
+    if samples:
+        print(format_snapshot(samples[-1]))
+
+    failures = []
+    if result is None:
+        failures.append("too few memory samples after warm-up; lower --sample-interval or raise --hours")
+    else:
+        print(f"Growth after warm-up ({result['from_audio_seconds'] / 60:.0f} to {result['to_audio_seconds'] / 60:.0f} "
+              f"min of audio): RSS {result['rss_mb']:+.1f} MiB, traced {result['traced_mb']:+.3f} MiB "
+              f"({result['traced_mb_per_hour']:+.3f} MiB per hour of audio)")
+        if result['rss_mb'] > args.max_rss_growth_mb:
+            failures.append(f"RSS grew {result['rss_mb']} MiB (limit {args.max_rss_growth_mb})")
+        if result['traced_mb'] > args.max_traced_growth_mb:
+            failures.append(f"traced allocations grew {result['traced_mb']} MiB (limit {args.max_traced_growth_mb})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'samples': samples, 'growth': result, 'wall_seconds': round(wall_seconds, 3),
+                       'failures': failures}, f, indent=2)
+
+    for failure in failures:
+        print(f"[Error] Soak: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Transcript stitching for overlapping transcription windows.
+Consecutive window hypotheses are aligned word by word and only text that is
+agreed or final is committed, keeping just a short tail of history.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from engines import TranscriptionResult
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+
+def normalize_word(word: str) -> str:
+    return _NON_WORD.sub('', word.lower())
+
+
+@dataclass
+class TimedWord:
+    start: float  # Seconds since the start of the stream
+    end: float
+    text: str
+
+
+class TranscriptStitcher:
+    """Commits text from overlapping windows once it is stable (LocalAgreement-style).
+
+    Words whose audio will be covered again by the next window stay pending until the
+    next hypothesis agrees with them; words before `stable_until` are final. Without word
+    timestamps, the new text is aligned against the tail of committed words instead.
+    """
+
+    def __init__(self, tail_words: int = 32, min_match: int = 2):
+        self.min_match = min_match
+        self.committed_until = 0.0
+        self.pending: list[TimedWord] = []
+        self.tail: deque[str] = deque(maxlen=tail_words)  # Normalized recently committed words
+        self._span: Optional[tuple[float, float]] = None  # Stream time of timed words committed since take_span()
+
+    def add(self, result: TranscriptionResult, window_start: float, stable_until: Optional[float] = None) -> str:
+        """Stitch one window's result in; return the newly committed text (may be empty)."""
+        words = [
+            TimedWord(window_start + w.start, window_start + w.end, w.text.strip())
+            for seg in result.segments for w in seg.words if w.text.strip()
+        ]
+        if not words:
+            return self.add_text(result.text)
+        if stable_until is None:
+            stable_until = window_start + result.audio_seconds
+
+        # Audio that was already committed is not re-emitted
+        words = [w for w in words if (w.start + w.end) / 2 > self.committed_until]
+
+        agreed = 0
+        while (agreed < min(len(words), len(self.pending))
+               and normalize_word(words[agreed].text) == normalize_word(self.pending[agreed].text)):
+            agreed += 1
+        commit, rest = words[:agreed], words[agreed:]
+        # No later window covers audio before stable_until, so this hypothesis is final there
+        while rest and rest[0].end <= stable_until:
+            commit.append(rest.pop(0))
+        self.pending = rest
+
+        if commit:
+            self.committed_until = commit[-1].end
+            self._extend_span(commit)
+        return self._commit([w.text for w in commit])
+
+    def add_text(self, text: str) -> str:
+        """Stitch in a window without word timings by aligning it to the committed tail."""
+        words = text.split()
+        # Timed hypotheses cannot be matched against plain text; keep what we had
+        head = self.flush()
+        skip = self._overlap_length([normalize_word(w) for w in words])
+        body = self._commit(words[skip:])
+        return f"{head} {body}".strip()
+
+    def partial_text(self) -> str:
+        """Text of the pending (not yet agreed) words."""
+        return ' '.join(w.text for w in self.pending)
+
+    def flush(self) -> str:
+        """Commit whatever is still pending once the stream has ended."""
+        pending, self.pending = self.pending, []
+        if pending:
+            self.committed_until = pending[-1].end
+            self._extend_span(pending)
+        return self._commit([w.text for w in pending])
+
+    def take_span(self) -> Optional[tuple[float, float]]:
+        """Stream-time (start, end) of the timed words committed since the last call, if any."""
+        span, self._span = self._span, None
+        return span
+
+    def _extend_span(self, words: list[TimedWord]):
+        start = words[0].start if self._span is None else self._span[0]
+        self._span = (start, words[-1].end)
+
+    def _overlap_length(self, words: list[str], max_offset: int = 3) -> int:
+        """Number of leading words that repeat the end of the committed tail."""
+        tail = list(self.tail)
+        for k in range(min(len(tail), len(words)), 0, -1):
+            if k < self.min_match and k != len(words):
+                break
+            # The first word or two of a window may be a cut-off fragment, so allow a small offset
+            for offset in range(min(max_offset, len(words) - k + 1)):
+                if words[offset:offset + k] == tail[-k:]:
+                    return offset + k
+        return 0
+
+    def _commit(self, words: list[str]) -> str:
+        self.tail.extend(normalize_word(w) for w in words)
+        return ' '.join(words)
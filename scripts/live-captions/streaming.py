@@ -0,0 +1,90 @@
+"""
+Incremental decoding for low-latency live captions.
+A growing window of uncommitted audio is re-decoded about once a second;
+words two consecutive hypotheses agree on are finalized, the rest is shown
+right away as an unstable partial caption.
+"""
+
+import threading
+from collections import deque
+from typing import Optional
+
+from audio_buffer import AudioChunk, PcmRingBuffer
+from engines import TranscriptionResult
+from stitching import TranscriptStitcher
+
+
+class GrowingWindowChunker:
+    """Emits one window of uncommitted audio at a time for incremental decoding.
+
+    Exposes the chunker poll()/flush() interface; a new window is only emitted once the
+    previous one was passed back through update(), so a slow model sees the freshest
+    audio instead of a backlog of stale windows.
+    """
+
+    def __init__(self, ring: PcmRingBuffer, step: float = 1.0, max_window: float = 10.0, prompt_words: int = 40):
+        self.ring = ring
+        self.step = int(step * ring.sample_rate)
+        self.max_window = int(max_window * ring.sample_rate)
+        self.stitcher = TranscriptStitcher()
+        self.window_start = 0
+        self.last_end = 0
+        self.seq = 0
+        self.in_flight = False
+        self._lock = threading.Lock()
+        # Finalized words still inside the window, and older ones used as the decoding prompt
+        self._committed_in_window: list[str] = []
+        self._prompt: deque[str] = deque(maxlen=prompt_words)
+
+    def poll(self) -> list[AudioChunk]:
+        with self._lock:
+            if self.in_flight or self.ring.total - self.last_end < self.step:
+                return []
+            return [self._next_window()]
+
+    def flush(self) -> Optional[AudioChunk]:
+        with self._lock:
+            if self.in_flight or self.ring.total <= self.last_end:
+                return None
+            return self._next_window()
+
+    def _next_window(self) -> AudioChunk:
+        self.window_start = max(self.window_start, self.ring.oldest)
+        self.last_end = self.ring.total
+        self.in_flight = True
+        chunk = AudioChunk(self.ring, self.window_start, self.last_end, self.seq)
+        self.seq += 1
+        return chunk
+
+    def initial_prompt(self) -> Optional[str]:
+        """Finalized text that precedes the current window, for decoding context."""
+        with self._lock:
+            return ' '.join(self._prompt) or None
+
+    def update(self, result: Optional[TranscriptionResult], chunk: AudioChunk) -> tuple[str, str]:
+        """Take the decoded window back; return (newly finalized text, current partial text)."""
+        with self._lock:
+            self.in_flight = False
+            if result is None:
+                return '', self.stitcher.partial_text()
+
+            # Nothing is final by position: every word needs a second, agreeing hypothesis
+            final = self.stitcher.add(result, chunk.start_seconds, stable_until=chunk.start_seconds)
+            self._committed_in_window.extend(final.split())
+
+            if self.ring.total - self.window_start > self.max_window:
+                committed_sample = int(self.stitcher.committed_until * self.ring.sample_rate)
+                if committed_sample > self.window_start:
+                    self.window_start = committed_sample
+                elif self.ring.total - self.window_start > self.max_window * 3 // 2:
+                    # Hypotheses keep disagreeing; finalize what we have rather than grow forever
+                    forced = self.stitcher.flush()
+                    self._committed_in_window.extend(forced.split())
+                    final = f"{final} {forced}".strip()
+                    self.window_start = chunk.end
+                else:
+                    return final, self.stitcher.partial_text()
+                # Everything finalized now lies before the window and becomes prompt context
+                self._prompt.extend(self._committed_in_window)
+                self._committed_in_window = []
+            return final, self.stitcher.partial_text()
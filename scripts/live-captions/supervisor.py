@@ -0,0 +1,315 @@
+"""
+Gapless ingest supervision for the live captions pipeline.
+An asyncio loop watches the byte flow of the active ffmpeg reader, detects
+stalls within seconds, starts a replacement reader before tearing down the old
+one and stitches the replacement's audio onto the ring so transcription sees a
+continuous sample stream without repeated or missing audio.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from audio_buffer import BYTES_PER_SAMPLE, SAMPLE_RATE, PcmRingBuffer
+from ingest import READ_BLOCK_SECONDS, IngestError, StreamReadError, ffmpeg_pcm_command
+
+# Seconds of replacement audio collected before it is aligned against the ring
+PROBE_SECONDS = 1.0
+# Seconds of ring history searched for the replacement's first audio
+STITCH_SEARCH_SECONDS = 20.0
+# Shortest repeated audio at a reader swap that is recognized (and not written twice)
+MIN_KEY_SECONDS = 0.02
+
+
+def find_match(haystack: np.ndarray, needle: np.ndarray, min_score: float = 0.8) -> Optional[int]:
+    """Offset in haystack where needle best matches by normalized cross-correlation (FFT), if it scores min_score."""
+    n = len(needle)
+    if n == 0 or len(haystack) < n:
+        return None
+    needle = needle.astype(np.float64)
+    needle_energy = float(np.dot(needle, needle))
+    if needle_energy < n * 1e-6:
+        return None  # Silence carries no alignment information
+    haystack = haystack.astype(np.float64)
+    n_fft = 1 << (len(haystack) + n - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(haystack, n_fft) * np.conj(np.fft.rfft(needle, n_fft)), n_fft)[:len(haystack) - n + 1]
+    energy = np.concatenate(([0.0], np.cumsum(haystack * haystack)))
+    windows = energy[n:] - energy[:-n]
+    score = corr / (np.sqrt(np.maximum(windows, 0.0) * needle_energy) + 1e-12)
+    best = int(np.argmax(score))
+    return best if score[best] >= min_score else None
+
+
+def overlap_length(tail: np.ndarray, head: np.ndarray, key_seconds: float = 0.25,
+                   min_key_seconds: float = MIN_KEY_SECONDS) -> int:
+    """Number of leading `head` samples that repeat the end of `tail` (0 if they do not line up).
+
+    Overlaps of at least key_seconds are found by locating the end of tail in head, or the
+    start of head in tail. Shorter ones lie within the first key_seconds of head and are found
+    with keys halving down to min_key_seconds, each match checked over the whole overlap;
+    overlaps shorter than min_key_seconds are not detected.
+    """
+    key = int(key_seconds * SAMPLE_RATE)
+    if len(tail) >= key and len(head) >= key:
+        found = find_match(head, tail[-key:])
+        if found is not None:
+            return found + key
+        found = find_match(tail, head[:key])
+        if found is not None:
+            return len(tail) - found
+    shortest = int(min_key_seconds * SAMPLE_RATE)
+    short = max(key // 2, shortest)
+    while True:
+        found = find_match(head[:key], tail[-short:]) if short <= len(tail) else None
+        overlap = found + short if found is not None else 0
+        # A short key can match by chance; the whole overlap must line up too
+        if overlap and overlap <= len(tail) and find_match(tail[-overlap:], head[:overlap]) == 0:
+            return overlap
+        if short <= shortest:
+            return 0
+        short = max(short // 2, shortest)
+
+
+class FfmpegReader:
+    """An ffmpeg subprocess decoding a stream URL to s16le, read through asyncio."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+
+    @classmethod
+    async def open(cls, audio_url: str) -> 'FfmpegReader':
+        process = await asyncio.create_subprocess_exec(*ffmpeg_pcm_command(audio_url),
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        return cls(process)
+
+    async def read(self, n: int) -> bytes:
+        return await self.process.stdout.read(n)
+
+    async def wait(self) -> int:
+        return await self.process.wait()
+
+    async def close(self):
+        if self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+
+ReaderFactory = Callable[[str], Awaitable[FfmpegReader]]
+
+
+class _Feed:
+    """Byte flow bookkeeping for one reader: sample assembly and stall detection."""
+
+    def __init__(self, reader: FfmpegReader):
+        self.reader = reader
+        self.remainder = b''
+        self.samples = 0
+        self.skip = 0  # Samples still to drop because the ring already holds them
+        self.first_byte: Optional[float] = None
+        self.last_byte = time.monotonic()
+
+    def decode(self, data: bytes) -> np.ndarray:
+        now = time.monotonic()
+        if self.first_byte is None:
+            self.first_byte = now
+        self.last_byte = now
+        data = self.remainder + data
+        usable = len(data) - len(data) % BYTES_PER_SAMPLE
+        self.remainder = data[usable:]
+        self.samples += usable // BYTES_PER_SAMPLE
+        samples = np.frombuffer(data[:usable], dtype='<i2')
+        if self.skip:
+            dropped = min(self.skip, len(samples))
+            self.skip -= dropped
+            samples = samples[dropped:]
+        return samples
+
+    def stalled(self, stall_timeout: float) -> bool:
+        """No bytes for stall_timeout beyond the audio this reader delivered ahead of the wall clock.
+
+        Live HLS arrives in segment-sized bursts, so quiet periods are normal while earlier
+        bursts still cover them; only a reader that has fallen behind real time is stalled.
+        """
+        now = time.monotonic()
+        ahead = 0.0
+        if self.first_byte is not None:
+            ahead = max(0.0, self.samples / SAMPLE_RATE - (now - self.first_byte))
+        return now - self.last_byte > stall_timeout + ahead
+
+
+class IngestSupervisor:
+    """Audio source that keeps a stream flowing across stalls and dropped connections.
+
+    Exposes the same start/wait/stop interface as FfmpegPcmSource. On a stall or a reader
+    failure a replacement is started while the old reader keeps being drained; once the
+    replacement has delivered PROBE_SECONDS of audio, the part the ring already holds is
+    skipped and the old reader is closed. Gives up after max_failures replacements in a
+    row that never delivered audio. A reader that ends with status 0 ends the stream.
+    """
+
+    def __init__(self, resolve_url: Callable[[], Optional[str]], ring: PcmRingBuffer, on_samples: Callable[[], None],
+                 invalidate_url: Optional[Callable[[], None]] = None, stall_timeout: float = 2.0,
+                 open_timeout: float = 15.0, max_failures: int = 5, open_reader: ReaderFactory = FfmpegReader.open):
+        self.resolve_url = resolve_url
+        self.invalidate_url = invalidate_url
+        self.ring = ring
+        self.on_samples = on_samples
+        self.stall_timeout = stall_timeout
+        self.open_timeout = open_timeout
+        self.max_failures = max_failures
+        self.open_reader = open_reader
+        self.error: Optional[IngestError] = None
+        self.swaps = 0
+        self.skipped_samples = 0  # Replacement audio dropped because the ring already had it
+        self._stopping = threading.Event()
+        self._status = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._supervise()), daemon=True)
+        self.thread.start()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def wait(self) -> int:
+        self.join()
+        return self._status
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=5)
+
+    async def _supervise(self):
+        feed = None
+        try:
+            feed = await self._replace(None)
+            while feed and not self._stopping.is_set():
+                try:
+                    data = await asyncio.wait_for(feed.reader.read(self._block_bytes()), timeout=READ_BLOCK_SECONDS * 5)
+                except asyncio.TimeoutError:
+                    if feed.stalled(self.stall_timeout):
+                        print(f"[Warning] No audio for {time.monotonic() - feed.last_byte:.1f}s; starting a replacement reader",
+                              file=sys.stderr)
+                        feed = await self._replace(feed)
+                    continue
+                if data:
+                    self._write(feed.decode(data))
+                    continue
+                status = await feed.reader.wait()
+                if status == 0:
+                    break  # The stream ended
+                print(f"[Warning] Audio reader exited with status {status}; starting a replacement reader", file=sys.stderr)
+                feed = await self._replace(feed)
+        except Exception as e:
+            self.error = StreamReadError(f"{type(e).__name__}: {e}")
+            self._status = 1
+        finally:
+            if feed:
+                await feed.reader.close()
+            self.on_samples()
+
+    async def _replace(self, old: Optional[_Feed]) -> Optional[_Feed]:
+        """Start readers until one delivers audio while the old one keeps draining; None if all fail."""
+        failures = 0
+        while not self._stopping.is_set():
+            drain = asyncio.create_task(self._drain(old)) if old else None
+            try:
+                new = await self._open_with_probe()
+            finally:
+                if drain:
+                    drain.cancel()
+                    await asyncio.gather(drain, return_exceptions=True)
+            if new:
+                feed, probe = new
+                if old:
+                    await old.reader.close()
+                    self.swaps += 1
+                self._stitch(feed, probe)
+                return feed
+
+            failures += 1
+            if self.invalidate_url:
+                self.invalidate_url()  # The URL produced no audio; resolve a fresh one next time
+            if failures >= self.max_failures:
+                if old:
+                    await old.reader.close()
+                self.error = StreamReadError(f"no audio from {failures} readers in a row")
+                self._status = 1
+                return None
+            await asyncio.get_running_loop().run_in_executor(None, self._stopping.wait, min(2 ** failures, 10))
+        if old:
+            await old.reader.close()
+        return None
+
+    async def _open_with_probe(self) -> Optional[tuple[_Feed, np.ndarray]]:
+        """Open a reader and collect its first PROBE_SECONDS of audio within open_timeout."""
+        loop = asyncio.get_running_loop()
+        audio_url = await loop.run_in_executor(None, self.resolve_url)
+        if not audio_url:
+            return None
+        reader = await self.open_reader(audio_url)
+        feed = _Feed(reader)
+        parts = []
+        collected = 0
+        deadline = loop.time() + self.open_timeout
+        try:
+            while collected < PROBE_SECONDS * SAMPLE_RATE:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._stopping.is_set():
+                    raise asyncio.TimeoutError
+                data = await asyncio.wait_for(reader.read(self._block_bytes()), timeout=remaining)
+                if not data:
+                    if collected:
+                        break  # A short stream; use what it had
+                    raise asyncio.TimeoutError
+                samples = feed.decode(data)
+                parts.append(samples)
+                collected += len(samples)
+        except asyncio.TimeoutError:
+            await reader.close()
+            return None
+        return feed, np.concatenate(parts)
+
+    async def _drain(self, old: _Feed):
+        """Keep writing the old reader's audio while its replacement starts up."""
+        while True:
+            data = await old.reader.read(self._block_bytes())
+            if not data:
+                return
+            self._write(old.decode(data))
+
+    def _stitch(self, feed: _Feed, probe: np.ndarray):
+        """Append the replacement's first audio, minus whatever the ring already holds.
+
+        The overlap can be longer than the probe (an HLS reader restarts a few segments back);
+        the rest is dropped from the reader's following blocks.
+        """
+        start = max(self.ring.oldest, self.ring.total - int(STITCH_SEARCH_SECONDS * SAMPLE_RATE))
+        tail = self.ring.view(start, self.ring.total)
+        skip = overlap_length(tail, probe.astype(np.float32) / 32768.0) if tail is not None else 0
+        self.skipped_samples += skip
+        feed.skip = max(0, skip - len(probe))
+        self._write(probe[skip:])
+
+    def _write(self, samples: np.ndarray):
+        if len(samples):
+            self.ring.write(samples)
+            self.on_samples()
+
+    @staticmethod
+    def _block_bytes() -> int:
+        return int(SAMPLE_RATE * READ_BLOCK_SECONDS) * BYTES_PER_SAMPLE
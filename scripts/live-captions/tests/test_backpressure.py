@@ -0,0 +1,99 @@
+"""
+AdaptiveEngine tests with fake engines: fallback models load in the background
+while the current level keeps transcribing, and a model that cannot be loaded
+is removed from the ladder instead of stalling captions.
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backpressure import AdaptiveEngine  # noqa: E402
+from engines import AsrEngine, TranscriptionResult  # noqa: E402
+
+
+class FakeEngine(AsrEngine):
+    """Takes rtf seconds of inference per second of audio, without doing any."""
+
+    def __init__(self, model_size: str, rtf: float, beam_size=None):
+        self.model_size = model_size
+        self.rtf = rtf
+        if beam_size is not None:
+            self.beam_size = beam_size
+
+    def transcribe(self, audio, language='en', initial_prompt=None, word_timestamps=False, features=None):
+        seconds = len(audio) / 16000
+        return TranscriptionResult(self.model_size, [], language, seconds, seconds * self.rtf)
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.01)
+
+
+class AdaptiveEngineTest(unittest.TestCase):
+    audio = np.zeros(16000, dtype=np.float32)
+
+    def test_fallback_loads_in_the_background(self):
+        release = threading.Event()
+        loaded = []
+
+        def load(size):
+            release.wait(5)
+            loaded.append(size)
+            return FakeEngine(size, rtf=0.1)
+
+        engine = AdaptiveEngine(FakeEngine('small', rtf=2.0), load)
+        self.assertEqual(engine.levels, [('small', None), ('base', 1), ('tiny', 1)])
+        started = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(engine.transcribe(self.audio).text, 'small')  # Still served while 'base' loads
+        self.assertLess(time.monotonic() - started, 1.0)
+        release.set()
+        wait_for(lambda: loaded == ['base'])
+        wait_for(lambda: 'base' in engine.engines)
+        engine.transcribe(self.audio)
+        engine.transcribe(self.audio)
+        self.assertEqual(engine.model_size, 'base')
+        self.assertEqual(loaded, ['base'])  # Loaded once, although several results asked for it
+
+    def test_model_that_fails_to_load_leaves_the_ladder(self):
+        def load(size):
+            if size == 'base':
+                raise OSError('not cached')
+            return FakeEngine(size, rtf=2.0)
+
+        engine = AdaptiveEngine(FakeEngine('small', rtf=2.0), load)
+        engine.transcribe(self.audio)
+        engine.transcribe(self.audio)
+        wait_for(lambda: ('base', 1) not in engine.levels)
+        self.assertEqual(engine.levels, [('small', None), ('tiny', 1)])
+        self.assertEqual(engine.model_size, 'small')
+        # Captions keep flowing, and the controller moves on to the next model that loads
+        wait_for(lambda: engine.transcribe(self.audio) and engine.model_size == 'tiny')
+
+    def test_steps_back_up_once_caught_up(self):
+        fast = FakeEngine('tiny', rtf=0.01)
+        engine = AdaptiveEngine(FakeEngine('base', rtf=2.0), lambda size: fast, patience=2)
+        engine.transcribe(self.audio)
+        engine.transcribe(self.audio)
+        wait_for(lambda: 'tiny' in engine.engines)
+        engine.transcribe(self.audio)
+        self.assertEqual(engine.model_size, 'tiny')
+        for _ in range(10):
+            engine.transcribe(self.audio)
+        self.assertEqual(engine.model_size, 'base')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+StreamUrlCache tests with a stub extractor and a fake clock: expiry parsing,
+refreshes ahead of expiry, backoff and giving up on failing extractions,
+invalidate() and forget().
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from resolver import StreamUrlCache, url_expiry  # noqa: E402
+
+VIDEO = 'https://www.youtube.com/watch?v=live'
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubExtractor:
+    """Returns googlevideo URLs that expire `ttl` seconds from the clock, or None while failing."""
+
+    def __init__(self, clock, ttl: float = 3600):
+        self.clock = clock
+        self.ttl = ttl
+        self.failing = False
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self, video_url: str):
+        self.calls += 1
+        self.called.set()
+        if self.failing:
+            return None
+        expire = int(self.clock() + self.ttl)
+        return f'https://rr1.googlevideo.com/videoplayback?expire={expire}&n={self.calls}'
+
+
+class UrlExpiryTest(unittest.TestCase):
+    def test_query_parameter(self):
+        self.assertEqual(url_expiry('https://rr1.googlevideo.com/videoplayback?expire=1700003600&ip=1'), 1700003600)
+
+    def test_path_segment(self):
+        url = 'https://manifest.googlevideo.com/api/manifest/hls_playlist/expire/1700003600/ei/abc/index.m3u8'
+        self.assertEqual(url_expiry(url), 1700003600)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(url_expiry('https://example.com/audio.m4a'))
+        self.assertIsNone(url_expiry('https://rr1.googlevideo.com/videoplayback?expire=soon'))
+
+
+class StreamUrlCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.extract = StubExtractor(self.clock)
+        self.cache = StreamUrlCache(self.extract, refresh_margin=300, retry_interval=30, max_failures=3,
+                                    clock=self.clock)
+        self.cache._thread = threading.current_thread()  # Refreshes are driven by refresh_due, not the thread
+
+    def tearDown(self):
+        self.cache.close()
+
+    def refresh_due(self):
+        """Run the refresh loop's pass over due entries, as its thread would."""
+        with self.cache._cond:
+            due = [url for url, entry in self.cache._entries.items() if entry.refresh_at <= self.clock()]
+        for video_url in due:
+            self.cache._resolve(video_url)
+
+    def test_valid_url_is_served_from_the_cache(self):
+        url = self.cache.get(VIDEO)
+        self.assertIn('n=1', url)
+        self.assertEqual(self.cache.get(VIDEO), url)
+        self.assertEqual(self.extract.calls, 1)
+        entry = self.cache._entries[VIDEO]
+        self.assertEqual(entry.expires, self.clock() + 3600)
+
+    def test_refresh_runs_before_expiry(self):
+        self.cache.get(VIDEO)
+        entry = self.cache._entries[VIDEO]
+        self.assertEqual(entry.refresh_at, entry.expires - 300)
+        self.clock.now = entry.refresh_at - 1
+        self.refresh_due()
+        self.assertEqual(self.extract.calls, 1)
+        self.clock.now = entry.refresh_at
+        self.refresh_due()
+        self.assertEqual(self.extract.calls, 2)
+        self.assertIn('n=2', self.cache.get(VIDEO))  # Replaced while the old URL was still valid
+
+    def test_short_lived_url_is_refreshed_halfway(self):
+        self.extract.ttl = 200  # Shorter than the refresh margin
+        self.cache.get(VIDEO)
+        entry = self.cache._entries[VIDEO]
+        self.assertEqual(entry.refresh_at, self.clock() + 100)
+
+    def test_failed_refresh_backs_off_and_stops(self):
+        self.cache.get(VIDEO)
+        entry = self.cache._entries[VIDEO]
+        valid_url = entry.audio_url
+        self.extract.failing = True
+        delays = []
+        for _ in range(3):
+            self.clock.now = entry.refresh_at
+            self.refresh_due()
+            delays.append(entry.refresh_at - self.clock())
+        self.assertEqual(delays[:2], [30, 60])  # Doubling retry interval
+        self.assertEqual(entry.failures, 3)
+        self.assertEqual(entry.refresh_at, float('inf'))  # Given up: no more background attempts
+        calls = self.extract.calls
+        self.clock.now += 100  # Still before the URL expires
+        self.refresh_due()
+        self.assertEqual(self.extract.calls, calls)
+        self.assertEqual(self.cache.get(VIDEO), valid_url)  # Still served until it expires
+
+    def test_url_that_never_resolved_is_dropped_after_max_failures(self):
+        self.extract.failing = True
+        self.assertIsNone(self.cache.get(VIDEO))
+        for _ in range(2):
+            self.clock.now = self.cache._entries[VIDEO].refresh_at
+            self.refresh_due()
+        self.assertNotIn(VIDEO, self.cache._entries)
+        self.extract.failing = False
+        self.assertIsNotNone(self.cache.get(VIDEO))  # A caller can still ask again
+
+    def test_success_resets_the_failure_count(self):
+        self.cache.get(VIDEO)
+        self.extract.failing = True
+        self.clock.now = self.cache._entries[VIDEO].refresh_at
+        self.refresh_due()
+        self.extract.failing = False
+        self.clock.now = self.cache._entries[VIDEO].refresh_at
+        self.refresh_due()
+        self.assertEqual(self.cache._entries[VIDEO].failures, 0)
+
+    def test_invalidate_forces_a_new_extraction(self):
+        first = self.cache.get(VIDEO)
+        self.cache.invalidate(VIDEO)
+        second = self.cache.get(VIDEO)
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.extract.calls, 2)
+
+    def test_forget_stops_refreshing(self):
+        self.cache.get(VIDEO)
+        self.cache.forget(VIDEO)
+        self.clock.now += 7200
+        self.refresh_due()
+        self.assertEqual(self.extract.calls, 1)
+        self.assertNotIn(VIDEO, self.cache._entries)
+
+    def test_background_thread_refreshes(self):
+        extract = StubExtractor(time.time, ttl=2)  # Wall clock: due for refresh after about a second
+        cache = StreamUrlCache(extract, refresh_margin=300, clock=time.time)
+        try:
+            cache.get(VIDEO)
+            extract.called.clear()
+            self.assertTrue(extract.called.wait(5))
+            self.assertEqual(extract.calls, 2)
+        finally:
+            cache.close()
+
+    def test_concurrent_gets_share_one_extraction(self):
+        release = threading.Event()
+
+        def slow(video_url):
+            release.wait(5)
+            return self.extract(video_url)
+
+        cache = StreamUrlCache(slow, clock=self.clock)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(VIDEO))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        cache.close()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.extract.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
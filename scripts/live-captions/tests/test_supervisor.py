@@ -0,0 +1,136 @@
+"""
+IngestSupervisor tests with fake readers that stall or drop mid-stream and
+restart a little earlier in the stream, as an HLS reader does; the ring must
+end up holding one continuous copy of the source audio.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from audio_buffer import BYTES_PER_SAMPLE, SAMPLE_RATE, PcmRingBuffer  # noqa: E402
+from supervisor import IngestSupervisor, overlap_length  # noqa: E402
+
+# Noise aligns unambiguously; 12 seconds of it is the whole stream
+SOURCE = (np.random.default_rng(7).standard_normal(12 * SAMPLE_RATE) * 4000).astype('<i2')
+
+
+class FakeReader:
+    """Serves SOURCE from `start` seconds, then stalls, drops or ends after `until` seconds."""
+
+    def __init__(self, start: float, until: float, then: str):
+        self.position = int(start * SAMPLE_RATE)
+        self.until = min(int(until * SAMPLE_RATE), len(SOURCE))
+        self.then = then  # 'stall', 'drop' (exit status 1) or 'end' (exit status 0)
+        self.closed = asyncio.Event()
+
+    async def read(self, n: int) -> bytes:
+        await asyncio.sleep(0)
+        if self.position >= self.until:
+            if self.then == 'stall':
+                await self.closed.wait()
+            return b''
+        end = min(self.position + n // BYTES_PER_SAMPLE, self.until)
+        data = SOURCE[self.position:end].tobytes()
+        self.position = end
+        return data
+
+    async def wait(self) -> int:
+        return 0 if self.then == 'end' else 1
+
+    async def close(self):
+        self.closed.set()
+
+
+class ScriptedReaders:
+    """open_reader for the supervisor: hands out the given readers in order."""
+
+    def __init__(self, *readers: FakeReader):
+        self.readers = list(readers)
+        self.opened = 0
+
+    async def __call__(self, audio_url: str) -> FakeReader:
+        self.opened += 1
+        return self.readers.pop(0)
+
+
+def run(readers: ScriptedReaders, **options) -> tuple[IngestSupervisor, PcmRingBuffer]:
+    ring = PcmRingBuffer(capacity_seconds=30)
+    supervisor = IngestSupervisor(lambda: 'http://stream.invalid/audio', ring, lambda: None,
+                                  open_reader=readers, **options)
+    supervisor.start()
+    supervisor.join(timeout=20)
+    if supervisor.is_running():
+        supervisor.stop()
+        raise AssertionError('supervisor did not finish')
+    return supervisor, ring
+
+
+class IngestSupervisorTest(unittest.TestCase):
+    def assertContinuous(self, ring: PcmRingBuffer, samples: int):
+        self.assertEqual(ring.total, samples)
+        expected = SOURCE[:samples].astype(np.float32) / 32768.0
+        np.testing.assert_array_equal(ring.view(0, ring.total), expected)
+
+    def test_dropped_reader_is_stitched_without_repeats(self):
+        # The replacement restarts 3 seconds before the point where the first reader dropped
+        readers = ScriptedReaders(FakeReader(0, 5, 'drop'), FakeReader(2, 12, 'end'))
+        supervisor, ring = run(readers)
+        self.assertIsNone(supervisor.error)
+        self.assertEqual(supervisor.swaps, 1)
+        self.assertEqual(supervisor.skipped_samples, 3 * SAMPLE_RATE)
+        self.assertContinuous(ring, len(SOURCE))
+
+    def test_stalled_reader_is_replaced(self):
+        readers = ScriptedReaders(FakeReader(0, 1.5, 'stall'), FakeReader(1.2, 12, 'end'))
+        supervisor, ring = run(readers, stall_timeout=0.2)
+        self.assertIsNone(supervisor.error)
+        self.assertEqual(supervisor.swaps, 1)
+        self.assertContinuous(ring, len(SOURCE))
+
+    def test_short_overlap_is_not_written_twice(self):
+        readers = ScriptedReaders(FakeReader(0, 4, 'drop'), FakeReader(3.9, 12, 'end'))
+        supervisor, ring = run(readers)
+        self.assertEqual(supervisor.skipped_samples, int(0.1 * SAMPLE_RATE))
+        self.assertContinuous(ring, len(SOURCE))
+
+    def test_several_drops_in_a_row(self):
+        readers = ScriptedReaders(FakeReader(0, 3, 'drop'), FakeReader(1, 6, 'drop'), FakeReader(5.5, 9, 'drop'),
+                                  FakeReader(8, 12, 'end'))
+        supervisor, ring = run(readers)
+        self.assertEqual(supervisor.swaps, 3)
+        self.assertContinuous(ring, len(SOURCE))
+
+    def test_gives_up_after_max_failures(self):
+        readers = ScriptedReaders(FakeReader(0, 3, 'drop'), *(FakeReader(0, 0, 'drop') for _ in range(2)))
+        supervisor, ring = run(readers, max_failures=2)
+        self.assertIsNotNone(supervisor.error)
+        self.assertEqual(supervisor.wait(), 1)
+        self.assertContinuous(ring, 3 * SAMPLE_RATE)
+
+
+class OverlapLengthTest(unittest.TestCase):
+    def test_overlaps_of_every_length(self):
+        audio = SOURCE.astype(np.float32) / 32768.0
+        cut = 6 * SAMPLE_RATE
+        tail = audio[:cut]
+        for seconds in (0.02, 0.05, 0.1, 0.2, 0.25, 0.5, 3.0):
+            overlap = int(seconds * SAMPLE_RATE)
+            head = audio[cut - overlap:cut - overlap + SAMPLE_RATE]
+            self.assertEqual(overlap_length(tail, head), overlap, seconds)
+
+    def test_contiguous_and_unrelated_audio(self):
+        audio = SOURCE.astype(np.float32) / 32768.0
+        self.assertEqual(overlap_length(audio[:SAMPLE_RATE * 6], audio[SAMPLE_RATE * 6:SAMPLE_RATE * 7]), 0)
+        noise = np.random.default_rng(1).standard_normal(SAMPLE_RATE).astype(np.float32)
+        self.assertEqual(overlap_length(audio[:SAMPLE_RATE * 6], noise), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
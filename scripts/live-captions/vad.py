@@ -0,0 +1,158 @@
+"""
+Voice-activity gating for the live captions pipeline.
+Classifies short frames by energy and zero-crossing rate and groups speech
+frames into chunks cut at pauses, so silence, music beds and applause never
+reach Whisper.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from audio_buffer import AudioChunk, PcmRingBuffer
+
+
+class EnergyVad:
+    """Frame classifier on RMS energy and zero-crossing rate with an adaptive noise floor."""
+
+    def __init__(self, frame_ms: int = 30, sample_rate: int = 16000, energy_ratio: float = 3.0,
+                 min_rms: float = 0.005, max_zcr: float = 0.35, floor_adapt: float = 0.05):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.energy_ratio = energy_ratio
+        self.min_rms = min_rms
+        self.max_zcr = max_zcr
+        self.floor_adapt = floor_adapt
+        self.noise_floor: Optional[float] = None
+
+    def classify(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Classify a (n_frames, frame_len) block; return (is_speech, rms) per frame."""
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        speech = np.zeros(len(frames), dtype=bool)
+        for i, energy in enumerate(rms):
+            if self.noise_floor is None:
+                self.noise_floor = max(float(energy), 1e-6)
+            threshold = max(self.min_rms, self.noise_floor * self.energy_ratio)
+            # Broadband noise (applause, hiss) is loud but crosses zero far more often than voiced speech
+            speech[i] = energy > threshold and zcr[i] < self.max_zcr
+            if not speech[i]:
+                self.noise_floor += self.floor_adapt * (max(float(energy), 1e-6) - self.noise_floor)
+        return speech, rms
+
+
+@dataclass
+class VadStats:
+    """Running totals of how much audio the VAD kept away from the model."""
+    ingested_seconds: float = 0.0
+    speech_seconds: float = 0.0
+    chunks_emitted: int = 0
+    chunks_dropped: int = 0
+
+    def saved_fraction(self) -> float:
+        if self.ingested_seconds <= 0:
+            return 0.0
+        return max(0.0, 1.0 - self.speech_seconds / self.ingested_seconds)
+
+    def summary(self, fixed_chunk_seconds: Optional[float] = None) -> str:
+        text = (f"VAD: sent {self.speech_seconds:.0f}s of {self.ingested_seconds:.0f}s to the model "
+                f"({self.saved_fraction():.0%} skipped), {self.chunks_emitted} chunks, "
+                f"{self.chunks_dropped} short blips dropped")
+        if fixed_chunk_seconds:
+            fixed_calls = int(self.ingested_seconds // fixed_chunk_seconds)
+            text += f"; fixed {fixed_chunk_seconds:.0f}s chunking would have made {fixed_calls} calls"
+        return text
+
+
+class SpeechSegmenter:
+    """Groups VAD frames from a ring into speech chunks cut at pauses.
+
+    Exposes the same poll()/flush() interface as FixedWindowChunker.
+    """
+
+    def __init__(self, ring: PcmRingBuffer, vad: EnergyVad, max_chunk: float = 15.0,
+                 min_silence: float = 0.5, min_speech: float = 0.3, padding: float = 0.2):
+        self.ring = ring
+        self.vad = vad
+        self.frame_len = vad.frame_len
+        rate = ring.sample_rate
+        self.max_chunk = int(max_chunk * rate)
+        self.min_silence = int(min_silence * rate)
+        self.min_speech = int(min_speech * rate)
+        self.padding = int(padding * rate)
+        self.stats = VadStats()
+        self.seq = 0
+
+        self.pos = 0  # Next unclassified sample
+        self.emitted_end = 0
+        self.speech_start: Optional[int] = None
+        self.last_speech_end = 0
+        self.frame_rms: list[tuple[int, float]] = []  # (frame end, rms) for the open chunk
+
+    def poll(self) -> list[AudioChunk]:
+        """Classify newly written frames and return every speech chunk that closed."""
+        n_frames = (self.ring.total - self.pos) // self.frame_len
+        if n_frames <= 0:
+            return []
+        if self.pos < self.ring.oldest:
+            # The ring lapped us; resume at the oldest sample still available
+            self.pos = self.ring.oldest
+            self.speech_start = None
+            self.frame_rms.clear()
+            n_frames = (self.ring.total - self.pos) // self.frame_len
+
+        block = self.ring.view(self.pos, self.pos + n_frames * self.frame_len)
+        speech, rms = self.vad.classify(block.reshape(n_frames, self.frame_len))
+        self.stats.ingested_seconds += n_frames * self.frame_len / self.ring.sample_rate
+
+        chunks = []
+        for is_speech, energy in zip(speech, rms):
+            frame_start = self.pos
+            self.pos += self.frame_len
+            if self.speech_start is None:
+                if is_speech:
+                    self.speech_start = max(frame_start - self.padding, self.emitted_end, self.ring.oldest)
+                    self.last_speech_end = self.pos
+                    self.frame_rms = [(self.pos, float(energy))]
+                continue
+
+            self.frame_rms.append((self.pos, float(energy)))
+            if is_speech:
+                self.last_speech_end = self.pos
+            if self.pos - self.last_speech_end >= self.min_silence:
+                self._close(min(self.last_speech_end + self.padding, self.pos), chunks)
+            elif self.pos - self.speech_start >= self.max_chunk:
+                self._split_at_quietest(chunks)
+        return chunks
+
+    def flush(self) -> Optional[AudioChunk]:
+        """Close the open speech chunk once the stream has ended."""
+        if self.speech_start is None:
+            return None
+        chunks = []
+        self._close(min(self.last_speech_end + self.padding, self.pos), chunks)
+        return chunks[0] if chunks else None
+
+    def _split_at_quietest(self, chunks: list[AudioChunk]):
+        """Cut an over-long chunk at the quietest frame in its last third and keep going."""
+        tail = self.frame_rms[len(self.frame_rms) * 2 // 3:]
+        cut = min(tail, key=lambda item: item[1])[0] if tail else self.pos
+        remaining = [item for item in self.frame_rms if item[0] > cut]
+        self._close(cut, chunks)
+        self.speech_start = cut
+        self.frame_rms = remaining
+
+    def _close(self, end: int, chunks: list[AudioChunk]):
+        start = self.speech_start
+        self.speech_start = None
+        self.frame_rms = []
+        if self.last_speech_end - start < self.min_speech:
+            self.stats.chunks_dropped += 1
+            return
+        chunks.append(AudioChunk(self.ring, start, end, self.seq))
+        self.seq += 1
+        self.emitted_end = end
+        self.stats.chunks_emitted += 1
+        self.stats.speech_seconds += (end - start) / self.ring.sample_rate
@@ -0,0 +1,129 @@
+"""
+Process-pool transcription for the live captions pipeline.
+Each worker process holds its own model replica with a pinned intra-op thread
+count, so inference scales across cores instead of contending for the GIL;
+results are put back into stream order before they are stitched and printed.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from engines import AsrEngine, TranscriptionResult, load_engine
+
+_engine: Optional[AsrEngine] = None
+
+
+def _init_worker(engine_name: str, model_size: str, threads: int, options: dict, nice: int = 0):
+    """Load this process's model replica with its thread count pinned."""
+    global _engine
+    if nice > 0 and hasattr(os, 'nice'):
+        os.nice(nice)  # Yield the CPU to the live path whenever it needs it
+    if threads > 0:
+        # Must be set before torch / CTranslate2 create their thread pools
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+            os.environ[var] = str(threads)
+    _engine = load_engine(engine_name, model_size, threads=threads, **options)
+
+
+def _transcribe(audio: np.ndarray, word_timestamps: bool) -> TranscriptionResult:
+    return _engine.transcribe(audio, language='en', word_timestamps=word_timestamps)
+
+
+class TranscriptionPool:
+    """A fixed set of worker processes, each with its own loaded model.
+
+    With nice > 0 the workers run at that lower scheduling priority (background work).
+    """
+
+    def __init__(self, engine_name: str, model_size: str, processes: int = 2, threads_per_worker: int = 0,
+                 nice: int = 0, **options):
+        if threads_per_worker <= 0:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // processes)
+        self.processes = processes
+        self.threads_per_worker = threads_per_worker
+        # Bound in-flight work so the fair scheduler, not the pool queue, decides what runs next
+        self._slots = threading.BoundedSemaphore(processes * 2)
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(engine_name, model_size, threads_per_worker, options, nice)
+        )
+
+    def submit(self, audio: np.ndarray, word_timestamps: bool = False, block: bool = True) -> Optional[Future]:
+        """Queue a window for transcription; blocks while every worker already has work lined up.
+
+        With block=False, returns None instead of waiting.
+        """
+        if not self._slots.acquire(blocking=block):
+            return None
+        # The ring slot may be overwritten while the task waits, so send a copy
+        future = self._executor.submit(_transcribe, np.array(audio, dtype=np.float32), word_timestamps)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class OrderedReassembler:
+    """Delivers per-stream results in sequence order even when workers finish out of order.
+
+    Each open() of a stream id starts a new generation. Results are added with the generation
+    they were produced for, so a result that arrives after forget() (or after the id was
+    reused for a new stream) is dropped instead of re-creating state or reaching the new stream.
+    """
+
+    def __init__(self, deliver: Callable[[str, Any], None]):
+        self.deliver = deliver
+        self._next: dict[str, int] = {}
+        self._held: dict[str, dict[int, Any]] = {}
+        self._generation: dict[str, int] = {}  # Open streams only
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def open(self, stream_id: str) -> int:
+        """Start (or restart) a stream and return its generation."""
+        with self._lock:
+            self._next.pop(stream_id, None)
+            self._held.pop(stream_id, None)
+            generation = self._generation[stream_id] = next(self._generations)
+            return generation
+
+    def generation(self, stream_id: str) -> Optional[int]:
+        """Current generation of an open stream (None once forgotten)."""
+        with self._lock:
+            return self._generation.get(stream_id)
+
+    def add(self, stream_id: str, seq: int, value: Any, generation: Optional[int]):
+        """Record a result and deliver every result that is now next in line for the stream.
+
+        A value of None marks a sequence number that will never produce a result (dropped chunk).
+        Results for another generation than the stream's current one are discarded.
+        Delivery happens under the lock, so results of one stream are never delivered concurrently.
+        """
+        with self._lock:
+            if generation is None or self._generation.get(stream_id) != generation:
+                return
+            held = self._held.setdefault(stream_id, {})
+            held[seq] = value
+            next_seq = self._next.get(stream_id, 0)
+            while next_seq in held:
+                value = held.pop(next_seq)
+                if value is not None:
+                    self.deliver(stream_id, value)
+                next_seq += 1
+            self._next[stream_id] = next_seq
+
+    def forget(self, stream_id: str):
+        """Drop the state of a removed stream, including results still waiting for an earlier one."""
+        with self._lock:
+            self._next.pop(stream_id, None)
+            self._held.pop(stream_id, None)
+            self._generation.pop(stream_id, None)
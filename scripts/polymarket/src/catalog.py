@@ -0,0 +1,247 @@
+"""
+Local market metadata index for the Polymarket client.
+Gamma events are cached by slug with their markets indexed by normalized
+question and by token ID, so a market lookup is a dict access instead of a
+download, a JSON parse and a linear scan. Entries expire after a TTL and are
+revalidated with ETag / If-Modified-Since; stale entries keep answering while
+they are refreshed in the background. The catalog can be saved to disk and
+loaded again for warm starts.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from transport import AsyncHttpClient
+
+_NON_WORD = re.compile(r'[^\w]+')
+# Substring lookups remembered per event; callers may search with arbitrary text, so this is bounded
+SUBSTRING_CACHE_SIZE = 256
+# An event older than this many TTLs is not served until it was revalidated
+MAX_AGE_TTLS = 5
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase words separated by single spaces, without punctuation."""
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+@dataclass
+class MarketEntry:
+    event_slug: str
+    id: str
+    question: str
+    normalized: str
+    token_ids: list[str]
+    best_ask: Optional[float] = None
+    last_trade_price: Optional[float] = None
+    tick_size: str = '0.01'
+    neg_risk: bool = False
+
+    @classmethod
+    def from_market(cls, event_slug: str, market: dict) -> 'MarketEntry':
+        token_ids = market.get('clobTokenIds') or '[]'
+        return cls(
+            event_slug=event_slug,
+            id=str(market.get('id')),
+            question=market.get('question') or '',
+            normalized=normalize_question(market.get('question') or ''),
+            # clobTokenIds is a JSON string array in the Gamma payload
+            token_ids=json.loads(token_ids) if isinstance(token_ids, str) else list(token_ids),
+            best_ask=market.get('bestAsk'),
+            last_trade_price=market.get('lastTradePrice'),
+            tick_size=str(market.get('orderPriceMinTickSize') or 0.01),
+            neg_risk=bool(market.get('negRisk', False)),
+        )
+
+    def token_id(self, side: str) -> Optional[str]:
+        index = 0 if side == 'YES' else 1
+        return self.token_ids[index] if index < len(self.token_ids) else None
+
+
+@dataclass
+class CachedEvent:
+    slug: str
+    event: dict  # Gamma payload, kept for snapshots
+    fetched_at: float  # Unix time of the last download or successful revalidation
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    markets: list[MarketEntry] = field(default_factory=list)
+    by_question: dict[str, MarketEntry] = field(default_factory=dict)
+    substring_hits: OrderedDict[str, MarketEntry] = field(default_factory=OrderedDict)  # LRU, oldest first
+    failed: bool = False  # The last revalidation failed; not served again until one succeeds
+
+    @classmethod
+    def from_event(cls, slug: str, event: dict, fetched_at: float, etag: Optional[str] = None,
+                   last_modified: Optional[str] = None) -> 'CachedEvent':
+        markets = [MarketEntry.from_market(slug, m) for m in event.get('markets') or [] if m.get('question')]
+        cached = cls(slug, event, fetched_at, etag, last_modified, markets)
+        for market in markets:
+            cached.by_question.setdefault(market.normalized, market)
+        return cached
+
+    def find(self, question: str) -> Optional[MarketEntry]:
+        """Exact normalized question, else the first market whose question contains it."""
+        wanted = normalize_question(question)
+        market = self.by_question.get(wanted)
+        if market is not None:
+            return market
+        market = self.substring_hits.get(wanted)
+        if market is not None:
+            self.substring_hits.move_to_end(wanted)
+            return market
+        market = next((m for m in self.markets if wanted in m.normalized), None)
+        if market is not None:
+            self.substring_hits[wanted] = market  # Later lookups of the same text are a dict hit
+            if len(self.substring_hits) > SUBSTRING_CACHE_SIZE:
+                self.substring_hits.popitem(last=False)
+        return market
+
+
+class MarketCatalog:
+    """Gamma events cached by slug, with markets indexed by question and token ID.
+
+    find() answers from memory; a stale event (older than ttl seconds) is still used and is
+    revalidated in the background. An event that was never fetched, is older than max_age
+    seconds (MAX_AGE_TTLS TTLs by default) or failed its last revalidation is fetched before it
+    is returned, so prices from an old snapshot are never used. With snapshot_path, load()
+    restores a saved catalog and save() writes it atomically.
+    """
+
+    def __init__(self, http: AsyncHttpClient, ttl: float = 60.0, snapshot_path: Optional[str] = None,
+                 max_age: Optional[float] = None):
+        self.http = http
+        self.ttl = ttl
+        self.max_age = max_age if max_age is not None else MAX_AGE_TTLS * ttl
+        self.snapshot_path = snapshot_path
+        self.events: dict[str, CachedEvent] = {}
+        self.by_token: dict[str, tuple[MarketEntry, int]] = {}  # Token ID -> (market, outcome index)
+        self.downloads = 0
+        self.revalidations = 0  # Requests answered with 304 Not Modified
+        self._fetching: dict[str, asyncio.Future] = {}
+
+    def cached(self, slug: str) -> Optional[CachedEvent]:
+        return self.events.get(slug)
+
+    def is_fresh(self, cached: CachedEvent) -> bool:
+        return time.time() - cached.fetched_at < self.ttl
+
+    async def event(self, slug: str) -> Optional[CachedEvent]:
+        """The cached event, fetching it first if it is missing or too old (None if it does not exist).
+
+        Raises if such a fetch fails.
+        """
+        cached = self.events.get(slug)
+        if cached is None or cached.failed or time.time() - cached.fetched_at >= self.max_age:
+            return await self.refresh(slug)
+        if not self.is_fresh(cached):
+            self._refresh_in_background(slug)
+        return cached
+
+    async def find(self, slug: str, question: str) -> Optional[MarketEntry]:
+        cached = await self.event(slug)
+        return cached.find(question) if cached else None
+
+    def token(self, token_id: str) -> Optional[tuple[MarketEntry, int]]:
+        return self.by_token.get(token_id)
+
+    async def refresh(self, slug: str) -> Optional[CachedEvent]:
+        """Revalidate or download an event now; concurrent calls for one slug share the request."""
+        return await asyncio.shield(self._start_fetch(slug))
+
+    def _refresh_in_background(self, slug: str):
+        if slug not in self._fetching:
+            self._start_fetch(slug).add_done_callback(lambda task: self._log_failure(slug, task))
+
+    def _start_fetch(self, slug: str) -> asyncio.Future:
+        task = self._fetching.get(slug)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(slug))
+            self._fetching[slug] = task
+            task.add_done_callback(lambda _: self._fetching.pop(slug, None))
+        return task
+
+    @staticmethod
+    def _log_failure(slug: str, task: asyncio.Future):
+        if not task.cancelled() and task.exception():
+            print(f'Error refreshing event "{slug}": {task.exception()}')
+
+    async def _fetch(self, slug: str) -> Optional[CachedEvent]:
+        cached = self.events.get(slug)
+        headers = {}
+        if cached and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+        try:
+            response = await self.http.get('/events', params={'slug': slug, 'limit': '10', 'offset': '0'},
+                                           headers=headers)
+            if not response.ok and not (response.status_code == 304 and cached):
+                raise Exception(f'Failed to fetch event: {response.reason}')
+        except Exception:
+            if cached:
+                cached.failed = True
+            raise
+        if response.status_code == 304 and cached:
+            cached.fetched_at = time.time()
+            cached.failed = False
+            self.revalidations += 1
+            return cached
+        self.downloads += 1
+        events = response.json()
+        if not events:
+            self._forget(slug)
+            return None
+        fresh = CachedEvent.from_event(slug, events[0], time.time(), response.headers.get('ETag'),
+                                       response.headers.get('Last-Modified'))
+        self._store(fresh)
+        return fresh
+
+    def _store(self, cached: CachedEvent):
+        self._forget(cached.slug)
+        self.events[cached.slug] = cached
+        for market in cached.markets:
+            for index, token_id in enumerate(market.token_ids):
+                self.by_token[token_id] = (market, index)
+
+    def _forget(self, slug: str):
+        old = self.events.pop(slug, None)
+        if old:
+            for market in old.markets:
+                for token_id in market.token_ids:
+                    self.by_token.pop(token_id, None)
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.snapshot_path
+        snapshot = {slug: {'event': c.event, 'fetched_at': c.fetched_at, 'etag': c.etag,
+                           'last_modified': c.last_modified}
+                    for slug, c in self.events.items()}
+        temp = f"{path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp, path)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Restore a saved catalog; returns the number of events (0 if there is no snapshot).
+
+        Loaded events keep their original fetch time, so old ones are revalidated on first use,
+        before they are returned once they are older than max_age.
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Ignoring unreadable market snapshot {path}: {e}')
+            return 0
+        for slug, item in snapshot.items():
+            self._store(CachedEvent.from_event(slug, item['event'], item['fetched_at'], item.get('etag'),
+                                               item.get('last_modified')))
+        return len(snapshot)
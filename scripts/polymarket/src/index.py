@@ -1,24 +1,36 @@
-# pip install eth-account requests web3
+# pip install -r requirements.txt
 # Client initialization example and dumping API Keys
 
 import asyncio
-import json
 import math
+import os
 import time
 from typing import Optional, Literal
 from dataclasses import dataclass
 from eth_account import Account
 from eth_account.messages import encode_defunct
 import requests
-from web3 import Web3
+from urllib3.exceptions import NewConnectionError
+
+from catalog import MarketCatalog
+from orderbook import MarketBookClient, OrderBook
+from ratelimit import RateLimitedClient
+from signing import OrderSigner
+from transport import AsyncHttpClient
 
 # Hardcoded secrets (replace with actual values)
 SECRET_POLYMARKET_ADDRESS = "TEST_ADDRESS"  # This is the address listed below your profile picture when using the Polymarket site.
 SECRET_POLYMARKET_API_KEY = "TEST_API_KEY"  # This is your Private Key. If using email login export from https://reveal.magic.link/polymarket otherwise export from your Web3 Application
 
 host = 'https://clob.polymarket.com'
+GAMMA_API = 'https://gamma-api.polymarket.com'
+# Optional market catalog snapshot for warm starts
+MARKET_SNAPSHOT = os.environ.get('POLYMARKET_MARKET_SNAPSHOT')
+# Seconds to wait for the first order book snapshot from the market channel
+BOOK_TIMEOUT = 10.0
+# Most orders the CLOB accepts in one POST /orders request
+MAX_BATCH_ORDERS = 15
 funder = SECRET_POLYMARKET_ADDRESS
-signer = Account.from_key(SECRET_POLYMARKET_API_KEY)
 
 # In general don't create a new API key, always derive or createOrDerive
 # Note: This is a simplified version - the actual ClobClient.createOrDeriveApiKey() 
@@ -51,15 +63,47 @@ class Event:
     markets: Optional[list[Market]] = None
 
 
+_gamma_client: Optional[AsyncHttpClient] = None
+
+
+def gamma_client() -> AsyncHttpClient:
+    """Shared Gamma API client, so market lookups reuse its open connections"""
+    global _gamma_client
+    if _gamma_client is None:
+        _gamma_client = AsyncHttpClient(GAMMA_API)
+    return _gamma_client
+
+
+_market_catalog: Optional[MarketCatalog] = None
+
+
+def market_catalog() -> MarketCatalog:
+    """Shared market catalog over the Gamma API client"""
+    global _market_catalog
+    if _market_catalog is None:
+        _market_catalog = MarketCatalog(gamma_client(), snapshot_path=MARKET_SNAPSHOT)
+        _market_catalog.load()
+    return _market_catalog
+
+
 class ClobClient:
-    def __init__(self, host: str, chain_id: int, signer: Account, api_key: dict, signature_type: int, funder: str):
+    def __init__(self, host: str, chain_id: int, signer: Account, api_key: dict, signature_type: int, funder: str,
+                 http: Optional[AsyncHttpClient] = None):
         self.host = host
         self.chain_id = chain_id
         self.signer = signer
         self.api_key = api_key
         self.signature_type = signature_type
         self.funder = funder
-        self.w3 = Web3()
+        # Domain separators and the key object are prepared once, not per order
+        self.order_signer = OrderSigner(signer.key, chain_id, funder, signature_type)
+        # Keep-alive connections to the CLOB, shared by every concurrent order
+        self.http = http or AsyncHttpClient(host)
+        # Per-endpoint rate limits and 429 retries for everything sent to the CLOB
+        self.limiter = RateLimitedClient(self.http)
+
+    def close(self):
+        self.http.close()
 
     def _sign_message(self, message: str) -> str:
         """Sign a message using the wallet"""
@@ -125,117 +169,211 @@ class ClobClient:
         
         return response.json()
 
+    def _build_order(self, order_params: dict, market_params: dict) -> dict:
+        """Build an unsigned order from createAndPostOrder-style params"""
+        return self.order_signer.build(
+            order_params["tokenID"],
+            order_params["price"],
+            order_params["size"],
+            order_params["side"],
+            tick_size=market_params.get("tickSize", "0.01"),
+            fee_rate_bps=order_params.get("feeRateBps", 0),
+            nonce=order_params.get("nonce", 0),
+            expiration=order_params.get("expiration", 0),
+        )
+
+    def _order_payload(self, signed_order: dict, order_type: str) -> dict:
+        """A signed order in the form POST /order and POST /orders expect"""
+        return {
+            "order": signed_order,
+            "owner": self.api_key.get("key") if self.api_key else None,
+            "orderType": order_type
+        }
+
+    @staticmethod
+    def _unknown_result(detail) -> dict:
+        """Result for an order the CLOB may have placed; check open orders before retrying it"""
+        return {'success': None, 'status': 'unknown', 'response': detail}
+
+    @classmethod
+    def _error_result(cls, error: requests.RequestException) -> dict:
+        """Result for a request that raised: failed only if it never reached the CLOB"""
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        if isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError):
+            return {'success': False, 'errorMsg': str(error)}
+        # A read timeout or a connection reset can come after the CLOB got the order
+        return cls._unknown_result(str(error))
+
+    @classmethod
+    def _status_result(cls, response: requests.Response) -> dict:
+        """Result for an error status: a 4xx rejected the order, a 5xx from a gateway says nothing about it"""
+        detail = f'{response.status_code} {response.text}'
+        return cls._unknown_result(detail) if response.status_code >= 500 else {'success': False, 'errorMsg': detail}
+
     async def createAndPostOrder(
         self,
         order_params: dict,
         market_params: dict,
         order_type: str
     ) -> dict:
-        """Create and post an order to Polymarket"""
-        # This is a simplified implementation
-        # The actual ClobClient would handle the full order creation flow
-        # including signing, nonce management, etc.
-        
-        url = f"{self.host}/order"
-        
-        # Construct the order payload
-        payload = {
-            "tokenID": order_params["tokenID"],
-            "price": str(order_params["price"]),
-            "side": order_params["side"],
-            "size": str(order_params["size"]),
-            "feeRateBps": str(order_params.get("feeRateBps", 0)),
-            "tickSize": market_params.get("tickSize", "0.01"),
-            "negRisk": market_params.get("negRisk", False),
-            "orderType": order_type
-        }
-        
-        # In a real implementation, you would:
-        # 1. Get the order ID from the API
-        # 2. Sign the order
-        # 3. Post the signed order
-        
-        # For now, this is a placeholder that shows the structure
-        # You would need to implement the full Polymarket CLOB API integration
-        response = requests.post(url, json=payload, headers=self._get_headers())
+        """Create, sign and post an order to Polymarket"""
+        order = self._build_order(order_params, market_params)
+        payload = self._order_payload(self.order_signer.sign(order, market_params.get("negRisk", False)), order_type)
+        response = await self.limiter.post('/order', json=payload, headers=self._get_headers())
         response.raise_for_status()
         return response.json()
 
+    async def createAndPostOrders(
+        self,
+        orders: list[tuple[dict, dict]],
+        order_type: str
+    ) -> list[dict]:
+        """Create, sign and post many (order_params, market_params) orders at once.
+
+        Orders go out in POST /orders batches of up to MAX_BATCH_ORDERS, all batches
+        concurrently; a lone leftover order, or a batch the endpoint refuses outright, goes
+        through POST /order instead. Returns one result per order, in order:
+        - the CLOB's reply for the order,
+        - {'success': False, 'errorMsg': ...} for an order that was not placed (invalid, rejected
+          with a 4xx, or the connection could not be opened),
+        - {'success': None, 'status': 'unknown', 'response': ...} when the order may have been
+          placed: a 2xx reply that does not say what happened to it, a 5xx, a read timeout or a
+          connection lost after sending. Check open orders before retrying such an order.
+        """
+        results: list[Optional[dict]] = [None] * len(orders)
+        built = []
+        for index, (order_params, market_params) in enumerate(orders):
+            try:
+                built.append((index, self._build_order(order_params, market_params), market_params.get("negRisk", False)))
+            except (KeyError, ValueError, ArithmeticError) as error:
+                results[index] = {'success': False, 'errorMsg': f'Invalid order: {error}'}
+
+        # Signing is CPU-bound: do the whole burst at once, off the event loop. In this process, since a
+        # burst is far too small to pay for starting a worker pool
+        signed = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.order_signer.sign_batch([(order, neg_risk) for _, order, neg_risk in built], workers=1))
+        payloads = [(index, self._order_payload(order, order_type)) for (index, _, _), order in zip(built, signed)]
+
+        async def post_one(index: int, payload: dict):
+            try:
+                response = await self.limiter.post('/order', json=payload, headers=self._get_headers())
+            except requests.RequestException as error:
+                results[index] = self._error_result(error)
+                return
+            if not response.ok:
+                results[index] = self._status_result(response)
+                return
+            try:
+                results[index] = response.json()
+            except ValueError:
+                results[index] = self._unknown_result(response.text)
+
+        async def post_batch(batch: list[tuple[int, dict]]):
+            if len(batch) == 1:
+                return await post_one(*batch[0])
+            try:
+                response = await self.limiter.post('/orders', json=[payload for _, payload in batch],
+                                                   headers=self._get_headers())
+            except requests.RequestException as error:
+                for index, _ in batch:
+                    results[index] = self._error_result(error)
+                return
+            if response.ok:
+                try:
+                    replies = response.json()
+                except ValueError:
+                    replies = response.text
+                if isinstance(replies, list) and len(replies) == len(batch):
+                    for (index, _), reply in zip(batch, replies):
+                        results[index] = reply
+                else:
+                    for index, _ in batch:
+                        results[index] = self._unknown_result(replies)
+            elif response.status_code in (404, 405):
+                # No batch endpoint on this host
+                await asyncio.gather(*(post_one(index, payload) for index, payload in batch))
+            else:
+                for index, _ in batch:
+                    results[index] = self._status_result(response)
+
+        batches = [payloads[i:i + MAX_BATCH_ORDERS] for i in range(0, len(payloads), MAX_BATCH_ORDERS)]
+        await asyncio.gather(*(post_batch(batch) for batch in batches))
+        return results
+
 
 async def getTokenIdForMarket(
     event_slug: str,
     market_question: str,
-    side: Literal['YES', 'NO'] = 'YES'
+    side: Literal['YES', 'NO'] = 'YES',
+    catalog: Optional[MarketCatalog] = None
 ) -> Optional[dict]:
-    """Fetch token ID for a market by searching for the market question"""
+    """Look up the token ID for a market by its question (from the cached catalog once the event is known)"""
     try:
-        url = 'https://gamma-api.polymarket.com/events'
-        params = {
-            'slug': event_slug,
-            'limit': '10',
-            'offset': '0'
-        }
-
-        response = requests.get(url, params=params, headers={'Accept': 'application/json'})
+        event = await (catalog or market_catalog()).event(event_slug)
 
-        if not response.ok:
-            raise Exception(f'Failed to fetch event: {response.reason}')
-
-        events = response.json()
-
-        if len(events) == 0:
+        if event is None:
             print(f'Event with slug "{event_slug}" not found')
             return None
 
-        event = events[0]
-
-        if not event.get('markets') or len(event['markets']) == 0:
+        if not event.markets:
             print(f'No markets found for event "{event_slug}"')
             return None
 
-        # Search for the market by question (case-insensitive, partial match)
-        market = None
-        for m in event['markets']:
-            if m.get('question') and market_question.lower() in m['question'].lower():
-                market = m
-                break
+        # Case-insensitive, partial match on the normalized question
+        market = event.find(market_question)
 
         if not market:
             print(f'Market "{market_question}" not found in event "{event_slug}"')
             return None
 
-        # Parse clobTokenIds (it's a JSON string array)
-        if not market.get('clobTokenIds'):
+        if not market.token_ids:
             print(f'No token IDs found for market "{market_question}"')
             return None
 
-        token_ids = json.loads(market['clobTokenIds'])
-
         # Determine which token ID corresponds to YES or NO
-        token_id = None
-        side_index = 0 if side == 'YES' else 1
-
-        if side_index < len(token_ids):
-            token_id = token_ids[side_index]
-        else:
+        token_id = market.token_id(side)
+        if token_id is None:
             print(f'Token for {side} side not found for market "{market_question}"')
             return None
 
-        # Get current price (prefer bestAsk, fallback to lastTradePrice, or use 0.66 as default)
-        price = market.get('bestAsk') or market.get('lastTradePrice') or 0.66
-        tick_size = str(market.get('orderPriceMinTickSize') or 0.01)
-        neg_risk = market.get('negRisk', False)
+        # Gamma's snapshot price, only used when the live order book is unavailable
+        price = market.best_ask or market.last_trade_price
 
-        print(f'Found token ID: {token_id} for market: {market.get("question")} ({side} side)')
-        print(f'Price: {price}, TickSize: {tick_size}, NegRisk: {neg_risk}')
+        print(f'Found token ID: {token_id} for market: {market.question} ({side} side)')
+        print(f'Price: {price}, TickSize: {market.tick_size}, NegRisk: {market.neg_risk}')
 
-        return {'tokenId': token_id, 'price': price, 'tickSize': tick_size, 'negRisk': neg_risk}
+        return {'tokenId': token_id, 'price': price, 'tickSize': market.tick_size, 'negRisk': market.neg_risk}
     except Exception as error:
         print(f'Error fetching token ID: {error}')
         return None
 
 
+def priceOrderFromBook(book: OrderBook, min_order_value: float) -> Optional[tuple[float, int]]:
+    """Limit price and share count for a BUY of at least min_order_value, taken from the live asks.
+
+    None if the book is stale, empty, or its asks are shallower than that size: a limit above
+    the deepest ask would rest far above the touch, and fewer shares would not reach the minimum.
+    """
+    if book.stale:
+        print(f'Order book of {book.asset_id} is stale (market channel disconnected)')
+        return None
+    best_ask = book.best_ask()
+    if best_ask is None:
+        return None
+    size = max(1, math.ceil(min_order_value / best_ask))
+    # Walk the depth so the limit price covers the whole size, not just the top level
+    price = book.price_to_buy(size)
+    if price is None:
+        depth = sum(shares for _, shares in book.asks.levels())
+        print(f'Only {depth} shares on the asks, {size} needed for a ${min_order_value} order')
+        return None
+    return price, size
+
+
 async def main():
+    # Parsed here, not at import, so the module can be imported without real secrets
+    signer = Account.from_key(SECRET_POLYMARKET_API_KEY)
+
     # Create or derive API key for authentication
     print('Creating/deriving API key...')
     api_key_creds = ClobClient.createOrDeriveApiKey(host, signer, signature_type)
@@ -254,20 +392,40 @@ async def main():
         print('Could not find token ID for Abraham market. Please check the market name or set tokenID manually.')
         exit(1)
 
-    # Calculate minimum shares needed to meet $1 minimum order size
     min_order_value = 1.0  # $1 minimum
-    min_shares = math.ceil(min_order_value / market_info['price'])
-    order_size = max(1, min_shares)  # At least 1 share, but meet minimum if needed
 
-    print(
-        f'Order details: {order_size} shares at ${market_info["price"]} = ${(order_size * market_info["price"]):.2f}'
-    )
+    # Price off the live order book of the token
+    book_client = MarketBookClient([market_info['tokenId']])
+    book_client.start()
+    book = await book_client.wait_ready(market_info['tokenId'], BOOK_TIMEOUT)
+    if book and book.tick_size is None:
+        book.tick_size = float(market_info['tickSize'])
+    priced = priceOrderFromBook(book, min_order_value) if book else None
+    await book_client.stop()
+
+    if priced:
+        price, order_size = priced
+        print(f'Live book: best bid {book.best_bid()}, best ask {book.best_ask()}, spread {book.spread()}')
+    elif book and not book.stale and book.best_ask() is not None:
+        print('Not enough depth on the live asks for the minimum order; not placing it.')
+        clob_client.close()
+        exit(1)
+    elif market_info['price']:
+        print('No live asks for this token; falling back to the Gamma market price')
+        price = market_info['price']
+        order_size = max(1, math.ceil(min_order_value / price))  # At least 1 share, but meet minimum if needed
+    else:
+        print('No price available for this market (empty order book and no Gamma price).')
+        clob_client.close()
+        exit(1)
+
+    print(f'Order details: {order_size} shares at ${price} = ${(order_size * price):.2f}')
 
     # Buy YES shares for Abraham at current market price
     resp2 = await clob_client.createAndPostOrder(
         {
             'tokenID': market_info['tokenId'],
-            'price': market_info['price'],
+            'price': price,
             'side': 'BUY',
             'size': order_size,  # Buy enough shares to meet minimum order size
             'feeRateBps': 0
@@ -277,6 +435,9 @@ async def main():
     )
 
     print('Order created successfully:', resp2)
+    clob_client.close()
+    if MARKET_SNAPSHOT:
+        market_catalog().save()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,299 @@
+"""
+Streaming L2 order books for the Polymarket client.
+Subscribes to the CLOB market WebSocket channel and keeps an in-memory book
+per token from "book" snapshots and incremental "price_change" messages, so
+orders can be priced off live depth instead of a stale Gamma snapshot.
+"""
+
+import asyncio
+import heapq
+import json
+import math
+from typing import Awaitable, Callable, Iterable, Optional
+
+from wsclient import WebSocketConnection, WebSocketError
+
+MARKET_CHANNEL_URL = 'wss://ws-subscriptions-clob.polymarket.com/ws/market'
+# Prices are kept as integers in millionths, so levels compare and hash exactly
+PRICE_SCALE = 1_000_000
+# Seconds between keep-alive PINGs the market channel expects from clients
+PING_INTERVAL = 10.0
+
+
+def price_key(price) -> int:
+    return int(round(float(price) * PRICE_SCALE))
+
+
+class BookSide:
+    """Price levels of one side.
+
+    Sizes are kept in a dict by integer price, so a size change is O(1) and a new level adds
+    an O(log n) heap push. The heap holds the levels best-first, which makes reading the best
+    level O(1); removed levels leave it lazily when they reach the top. Depth walks use a
+    best-first key list that is only re-sorted after levels were added or removed.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._sizes: dict[int, float] = {}  # Price key (negated for bids, so best sorts first) -> size
+        self._heap: list[int] = []  # May still hold removed levels
+        self._in_heap: set[int] = set()
+        self._sorted: Optional[list[int]] = None  # Best-first keys; None once levels changed
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def _key(self, price) -> int:
+        return -price_key(price) if self.is_bid else price_key(price)
+
+    def set(self, price, size):
+        """Set the resting size at a price; size 0 removes the level."""
+        key = self._key(price)
+        size = float(size)
+        if size <= 0:
+            if self._sizes.pop(key, None) is not None:
+                self._sorted = None
+                if len(self._heap) > 2 * len(self._sizes) + 64:
+                    self._compact()
+        else:
+            if key not in self._sizes:
+                self._sorted = None
+                if key not in self._in_heap:
+                    heapq.heappush(self._heap, key)
+                    self._in_heap.add(key)
+            self._sizes[key] = size
+
+    def _compact(self):
+        """Drop removed levels from the heap so it cannot outgrow the book."""
+        self._heap = list(self._sizes)
+        heapq.heapify(self._heap)
+        self._in_heap = set(self._heap)
+
+    def clear(self):
+        self._sizes.clear()
+        self._heap.clear()
+        self._in_heap.clear()
+        self._sorted = None
+
+    def best(self) -> Optional[tuple[float, float]]:
+        """(price, size) of the best level, or None if the side is empty."""
+        heap = self._heap
+        while heap and heap[0] not in self._sizes:
+            self._in_heap.discard(heapq.heappop(heap))
+        if not heap:
+            return None
+        return abs(heap[0]) / PRICE_SCALE, self._sizes[heap[0]]
+
+    def _best_first(self) -> list[int]:
+        if self._sorted is None:
+            self._sorted = sorted(self._sizes)
+        return self._sorted
+
+    def levels(self, depth: Optional[int] = None) -> list[tuple[float, float]]:
+        """(price, size) from the best level outwards."""
+        return [(abs(key) / PRICE_SCALE, self._sizes[key]) for key in self._best_first()[:depth]]
+
+    def fill_price(self, size: float) -> Optional[float]:
+        """Worst price reached when taking `size` from this side (None if the depth is not there)."""
+        remaining = size
+        for key in self._best_first():
+            remaining -= self._sizes[key]
+            if remaining <= 1e-9:
+                return abs(key) / PRICE_SCALE
+        return None
+
+
+class OrderBook:
+    """L2 book of one token."""
+
+    def __init__(self, asset_id: str):
+        self.asset_id = asset_id
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.timestamp: Optional[int] = None  # Milliseconds, from the last applied message
+        self.hash: Optional[str] = None
+        self.tick_size: Optional[float] = None
+        self.last_trade_price: Optional[float] = None
+        self.ready = asyncio.Event()  # Set once the first snapshot arrived
+        # True until a snapshot arrives and again whenever the feed drops, until the next snapshot
+        self.stale = True
+
+    def apply_snapshot(self, bids: Iterable[dict], asks: Iterable[dict], timestamp=None, book_hash=None):
+        self.bids.clear()
+        self.asks.clear()
+        for level in bids:
+            self.bids.set(level['price'], level['size'])
+        for level in asks:
+            self.asks.set(level['price'], level['size'])
+        self._stamp(timestamp, book_hash)
+        self.stale = False
+        self.ready.set()
+
+    def apply_change(self, side: str, price, size, timestamp=None, book_hash=None):
+        (self.bids if side.upper() in ('BUY', 'BID') else self.asks).set(price, size)
+        self._stamp(timestamp, book_hash)
+
+    def _stamp(self, timestamp, book_hash):
+        if timestamp is not None:
+            self.timestamp = int(timestamp)
+        if book_hash is not None:
+            self.hash = book_hash
+
+    def best_bid(self) -> Optional[float]:
+        best = self.bids.best()
+        return best[0] if best else None
+
+    def best_ask(self) -> Optional[float]:
+        best = self.asks.best()
+        return best[0] if best else None
+
+    def midpoint(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        return round(ask - bid, 6) if bid is not None and ask is not None else None
+
+    def price_to_buy(self, size: float) -> Optional[float]:
+        """Limit price that fills `size` shares against the resting asks, rounded up to the tick."""
+        return self._on_tick(self.asks.fill_price(size), math.ceil)
+
+    def price_to_sell(self, size: float) -> Optional[float]:
+        """Limit price that fills `size` shares against the resting bids, rounded down to the tick."""
+        return self._on_tick(self.bids.fill_price(size), math.floor)
+
+    def _on_tick(self, price: Optional[float], rounding) -> Optional[float]:
+        if price is None or not self.tick_size:
+            return price
+        ticks = rounding(round(price / self.tick_size, 9))
+        return round(ticks * self.tick_size, 6)
+
+
+class MarketBookClient:
+    """Keeps OrderBooks for a set of tokens up to date from the market WebSocket channel.
+
+    start() runs the subscription in the background and reconnects with backoff when the
+    connection drops or a message cannot be applied; the books are marked stale until the
+    reconnect brings fresh snapshots. on_update, if given, is called with each book after a
+    message changed it.
+    """
+
+    def __init__(self, asset_ids: Iterable[str], url: str = MARKET_CHANNEL_URL,
+                 on_update: Optional[Callable[[OrderBook], None]] = None,
+                 connect: Callable[[str], Awaitable[WebSocketConnection]] = WebSocketConnection.connect):
+        self.books = {asset_id: OrderBook(asset_id) for asset_id in asset_ids}
+        self.url = url
+        self.on_update = on_update
+        self.connect = connect
+        self.messages = 0
+        self._task: Optional[asyncio.Task] = None
+        self._connection: Optional[WebSocketConnection] = None
+        self._stopped = False
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._connection:
+            await self._connection.close()
+
+    async def wait_ready(self, asset_id: str, timeout: float = 10.0) -> Optional[OrderBook]:
+        """The token's book once its first snapshot arrived, or None after timeout seconds."""
+        book = self.books[asset_id]
+        try:
+            await asyncio.wait_for(book.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return book
+
+    async def run(self):
+        failures = 0
+        while not self._stopped:
+            try:
+                self._connection = await self.connect(self.url)
+                if self._stopped:
+                    # asyncio.wait_for can swallow a cancel that lands as the handshake completes
+                    break
+                await self._connection.send(json.dumps({'assets_ids': list(self.books), 'type': 'market'}))
+                failures = 0
+                await self._read(self._connection)
+            except (OSError, asyncio.TimeoutError, WebSocketError) as e:
+                print(f'Market channel error: {e}')
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # A message that cannot be applied leaves the books in doubt: resubscribe for snapshots
+                print(f'Market channel sent a malformed message ({type(e).__name__}: {e}); resubscribing')
+            self._mark_stale()
+            if self._connection:
+                await self._connection.close()
+            failures += 1
+            await asyncio.sleep(self.backoff(failures))
+
+    @staticmethod
+    def backoff(failures: int) -> float:
+        return min(2 ** failures, 30)
+
+    def _mark_stale(self):
+        for book in self.books.values():
+            book.stale = True
+
+    async def _read(self, connection: WebSocketConnection):
+        pinger = asyncio.ensure_future(self._ping(connection))
+        try:
+            while True:
+                message = await connection.recv()
+                if message is None:
+                    print('Market channel closed; reconnecting')
+                    return
+                if message == 'PONG':
+                    continue
+                data = json.loads(message)
+                for event in data if isinstance(data, list) else [data]:
+                    self.handle(event)
+        finally:
+            pinger.cancel()
+
+    @staticmethod
+    async def _ping(connection: WebSocketConnection):
+        while not connection.closed:
+            await asyncio.sleep(PING_INTERVAL)
+            await connection.send('PING')
+
+    def handle(self, event: dict):
+        """Apply one market channel event to the books."""
+        self.messages += 1
+        kind = event.get('event_type')
+        changed = []
+        if kind == 'book':
+            book = self.books.get(event.get('asset_id'))
+            if book:
+                # Older payloads name the sides buys/sells
+                book.apply_snapshot(event.get('bids', event.get('buys', [])), event.get('asks', event.get('sells', [])),
+                                    event.get('timestamp'), event.get('hash'))
+                changed.append(book)
+        elif kind == 'price_change':
+            # Current payloads carry one entry per token; older ones a token-level list of changes
+            changes = event.get('price_changes') or [dict(change, asset_id=event.get('asset_id'))
+                                                     for change in event.get('changes', [])]
+            for change in changes:
+                book = self.books.get(change.get('asset_id'))
+                if book and not book.stale:
+                    book.apply_change(change['side'], change['price'], change['size'], event.get('timestamp'),
+                                      change.get('hash'))
+                    if book not in changed:
+                        changed.append(book)
+        elif kind == 'tick_size_change':
+            book = self.books.get(event.get('asset_id'))
+            if book:
+                book.tick_size = float(event['new_tick_size'])
+        elif kind == 'last_trade_price':
+            book = self.books.get(event.get('asset_id'))
+            if book:
+                book.last_trade_price = float(event['price'])
+        if self.on_update:
+            for book in changed:
+                self.on_update(book)
@@ -0,0 +1,112 @@
+"""
+Rate-limit-aware request scheduling for the Polymarket CLOB.
+Each endpoint gets a token bucket, so bursts go out immediately up to the
+bucket size and then at the sustained rate instead of running into 429s.
+Requests that are still rejected with 429 are retried after Retry-After or
+an exponential backoff with jitter, and the endpoint's bucket is paused for
+everyone in the meantime.
+"""
+
+import asyncio
+import random
+import time
+from typing import Optional
+
+import requests
+
+from transport import AsyncHttpClient
+
+# path -> (requests per second, burst); conservative, below the CLOB's published limits
+DEFAULT_LIMITS = {
+    '/order': (40.0, 200),
+    '/orders': (20.0, 100),
+}
+DEFAULT_LIMIT = (10.0, 50)
+MAX_RETRIES = 4
+# Seconds; retry n waits up to BACKOFF_BASE * 2 ** n when the server gives no Retry-After
+BACKOFF_BASE = 0.25
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most capacity; acquire() waits for a token."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()  # Waiters are served in arrival order
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Hold back every request on this bucket for the given time (after a 429)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until  # Refill from the end of the pause
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds from a Retry-After header given in seconds (HTTP dates are ignored)."""
+    try:
+        return max(0.0, float(response.headers['Retry-After']))
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimitedClient:
+    """Sends requests through per-endpoint token buckets and retries 429 responses.
+
+    limits maps paths to (requests per second, burst); other paths share DEFAULT_LIMIT
+    per path. The final response is returned as is, including a 429 once retries run out.
+    """
+
+    def __init__(self, http: AsyncHttpClient, limits: Optional[dict] = None, max_retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_BASE):
+        self.http = http
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.buckets: dict[str, TokenBucket] = {}
+        self.retries = 0
+
+    def bucket(self, path: str) -> TokenBucket:
+        bucket = self.buckets.get(path)
+        if bucket is None:
+            bucket = self.buckets[path] = TokenBucket(*self.limits.get(path, DEFAULT_LIMIT))
+        return bucket
+
+    async def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        bucket = self.bucket(path)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            response = await self.http.request(method, path, **kwargs)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            self.retries += 1
+            wait = retry_after(response)
+            # Full jitter, so requests rejected together do not come back together
+            delay = (wait if wait is not None else 0) + random.uniform(0, self.backoff * 2 ** attempt)
+            bucket.pause(delay)
+
+    async def get(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('POST', path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('DELETE', path, **kwargs)
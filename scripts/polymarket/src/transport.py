@@ -0,0 +1,90 @@
+"""
+Async HTTP transport for the Polymarket client.
+Requests run on a small thread pool, so coroutines never block the event loop
+and several requests are in flight at once. Each pool thread has its own
+requests.Session, all sharing one HTTPAdapter, so connections to each host stay
+open (keep-alive) instead of paying a new TCP+TLS handshake per call.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5.0, 15.0)
+
+Timeout = Union[float, tuple[float, float]]
+
+
+class AsyncHttpClient:
+    """Keep-alive connection pools per host with up to max_in_flight concurrent requests.
+
+    Relative URLs are joined to base_url. Responses are plain requests.Response objects.
+    Use as an async context manager, or call close() when done.
+
+    requests does not document Session as thread-safe (its cookie jar and header merging are
+    shared state), so every executor thread gets its own; the mounted adapter, whose urllib3
+    pools are thread-safe, is shared, so all threads draw on the same open connections.
+    """
+
+    def __init__(self, base_url: str = '', max_in_flight: int = 16, timeout: Timeout = DEFAULT_TIMEOUT,
+                 headers: Optional[dict] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.headers = {'Accept': 'application/json', **(headers or {})}
+        # One pool per host, each able to keep a connection for every request in flight
+        self.adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max_in_flight, pool_block=True, max_retries=0)
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='http')
+
+    def session(self) -> requests.Session:
+        """The calling thread's session, created on its first request."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            with self._sessions_lock:
+                self._sessions.append(session)
+            self._local.session = session
+        return session
+
+    def url(self, path: str) -> str:
+        return path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method: str, path: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """Send a request without blocking the event loop; kwargs are passed to requests (params, json, headers, ...)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.session().request(method, self.url(path), timeout=timeout or self.timeout, **kwargs))
+
+    async def get(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('POST', path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> requests.Response:
+        return await self.request('DELETE', path, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self.adapter.close()
+
+    async def __aenter__(self) -> 'AsyncHttpClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
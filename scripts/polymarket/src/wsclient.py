@@ -0,0 +1,163 @@
+"""
+Minimal asyncio WebSocket client (RFC 6455) for the Polymarket streaming channels.
+Text messages: masked client frames, fragmented messages, ping/pong and
+close. Enough for JSON subscription feeds without another dependency.
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import ssl
+import struct
+from typing import Optional
+from urllib.parse import urlsplit
+
+_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+# Largest message accepted, fragments included; a bigger one closes the connection with status 1009
+MAX_MESSAGE_SIZE = 1 << 22
+CLOSE_NORMAL = 1000
+CLOSE_TOO_BIG = 1009
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool = True) -> bytes:
+    """One final frame; client frames must be masked."""
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header += bytes([mask_bit | len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack('!H', len(payload))
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('!Q', len(payload))
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    # XOR with the repeated key, done on whole integers instead of byte by byte
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    masked = (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+    return header + key + masked
+
+
+class WebSocketConnection:
+    """A connected WebSocket; use connect() to open one."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 max_message_size: int = MAX_MESSAGE_SIZE):
+        self.reader = reader
+        self.writer = writer
+        self.max_message_size = max_message_size
+        self.closed = False
+        self._send_lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, url: str, timeout: float = 10.0, headers: Optional[dict] = None) -> 'WebSocketConnection':
+        parts = urlsplit(url)
+        secure = parts.scheme == 'wss'
+        port = parts.port or (443 if secure else 80)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None,
+                                    limit=1 << 22),
+            timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Upgrade: websocket', 'Connection: Upgrade',
+                 f'Sec-WebSocket-Key: {key}', 'Sec-WebSocket-Version: 13']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        try:
+            response = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            writer.close()
+            raise WebSocketError(f'handshake failed: {e}')
+        status_line, *header_lines = response.decode('latin-1').split('\r\n')
+        if ' 101 ' not in f'{status_line} ':
+            writer.close()
+            raise WebSocketError(f'handshake rejected: {status_line}')
+        received = {name.strip().lower(): value.strip() for name, _, value in
+                    (line.partition(':') for line in header_lines if line)}
+        expected = base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+        if received.get('sec-websocket-accept') != expected:
+            writer.close()
+            raise WebSocketError('handshake failed: bad Sec-WebSocket-Accept')
+        return cls(reader, writer)
+
+    async def send(self, text: str):
+        await self._send(OP_TEXT, text.encode())
+
+    async def _send(self, opcode: int, payload: bytes):
+        async with self._send_lock:
+            self.writer.write(encode_frame(opcode, payload))
+            await self.writer.drain()
+
+    async def recv(self) -> Optional[str]:
+        """Next text message, or None once the connection is closed.
+
+        Raises WebSocketError, after closing the connection, for a message over max_message_size.
+        """
+        message = bytearray()
+        while not self.closed:
+            try:
+                fin, opcode, payload = await self._read_frame(self.max_message_size - len(message))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                self.writer.close()
+                return None
+            except WebSocketError:
+                await self.close(CLOSE_TOO_BIG)
+                raise
+            if opcode == OP_PING:
+                await self._send(OP_PONG, payload)
+            elif opcode == OP_PONG:
+                continue
+            elif opcode == OP_CLOSE:
+                await self.close()  # Answers the server's close frame
+                return None
+            else:
+                if opcode != OP_CONTINUATION:
+                    message.clear()
+                message += payload
+                if fin:
+                    return message.decode('utf-8', errors='replace')
+        return None
+
+    async def _read_frame(self, limit: Optional[int] = None) -> tuple[bool, int, bytes]:
+        """One frame; raises WebSocketError, before reading its payload, if a data frame is over limit bytes."""
+        limit = self.max_message_size if limit is None else limit
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+        # Control frames carry at most 125 bytes
+        if length > (125 if first & 0x08 else limit):
+            raise WebSocketError(f'frame of {length} bytes exceeds the {self.max_message_size} byte message limit')
+        key = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        if key:
+            repeated = (key * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(length, 'big')
+        return bool(first & 0x80), first & 0x0F, payload
+
+    async def close(self, code: int = CLOSE_NORMAL):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, struct.pack('!H', code)))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
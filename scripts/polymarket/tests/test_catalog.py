@@ -0,0 +1,176 @@
+"""
+Market catalog tests against a local Gamma stub: fresh hits stay in memory,
+stale events are revalidated with ETags, events past max_age are refetched
+before use and snapshots restore the catalog.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from catalog import MarketCatalog  # noqa: E402
+from transport import AsyncHttpClient  # noqa: E402
+
+EVENT = {
+    'id': '1',
+    'slug': 'forum',
+    'markets': [
+        {'id': '10', 'question': 'Will Abraham be said?', 'clobTokenIds': '["111", "112"]', 'bestAsk': 0.42,
+         'lastTradePrice': 0.41, 'orderPriceMinTickSize': 0.01, 'negRisk': False},
+        {'id': '11', 'question': 'Will Moses be said?', 'clobTokenIds': '["121", "122"]', 'bestAsk': 0.2},
+    ],
+}
+
+
+class GammaStub(BaseHTTPRequestHandler):
+    """GET /events?slug=forum with an ETag; answers 304 to a matching If-None-Match."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        if server.failing:
+            return self._send(500, b'{}')
+        url = urlsplit(self.path)
+        slug = parse_qs(url.query).get('slug', [None])[0]
+        if self.headers.get('If-None-Match') == server.etag:
+            return self._send(304, b'')
+        events = [server.event] if slug == server.event['slug'] else []
+        self._send(200, json.dumps(events).encode())
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', self.server.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MarketCatalogTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GammaStub)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.failing = False
+        self.server.etag = '"v1"'
+        self.server.event = EVENT
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.http = AsyncHttpClient(f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def settle(self, catalog: MarketCatalog):
+        """Wait for background revalidations to finish."""
+        while catalog._fetching:
+            await asyncio.gather(*catalog._fetching.values(), return_exceptions=True)
+
+    async def test_fresh_event_is_answered_from_memory(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        market = await catalog.find('forum', 'abraham')
+        self.assertEqual(market.token_ids, ['111', '112'])
+        self.assertEqual(catalog.token('121')[0].question, 'Will Moses be said?')
+        await catalog.find('forum', 'Will Moses be said?')
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(catalog.downloads, 1)
+
+    async def test_stale_event_is_revalidated_with_its_etag(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        cached = await catalog.event('forum')
+        cached.fetched_at -= 120  # Stale, but within max_age
+        self.assertIs(await catalog.event('forum'), cached)  # Served while revalidating
+        await self.settle(catalog)
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+        self.assertEqual(catalog.revalidations, 1)
+        self.assertTrue(catalog.is_fresh(cached))
+
+    async def test_changed_event_replaces_the_cached_one(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        cached = await catalog.event('forum')
+        cached.fetched_at -= 120
+        self.server.etag = '"v2"'
+        self.server.event = dict(EVENT, markets=[dict(EVENT['markets'][0], bestAsk=0.5)])
+        await catalog.event('forum')
+        await self.settle(catalog)
+        self.assertEqual((await catalog.find('forum', 'abraham')).best_ask, 0.5)
+        self.assertIsNone(catalog.token('121'))  # Markets gone from the event leave the token index
+
+    async def test_expired_event_is_refetched_before_use(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        cached = await catalog.event('forum')
+        cached.fetched_at -= catalog.max_age
+        self.server.etag = '"v2"'
+        self.server.event = dict(EVENT, markets=[dict(EVENT['markets'][0], bestAsk=0.5)])
+        self.assertEqual((await catalog.find('forum', 'abraham')).best_ask, 0.5)
+
+    async def test_expired_event_is_not_served_when_the_fetch_fails(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        cached = await catalog.event('forum')
+        cached.fetched_at -= catalog.max_age
+        self.server.failing = True
+        with self.assertRaises(Exception):
+            await catalog.event('forum')
+
+    async def test_event_is_not_served_after_a_failed_revalidation(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        cached = await catalog.event('forum')
+        cached.fetched_at -= 120
+        self.server.failing = True
+        await catalog.event('forum')  # Still within max_age: served, revalidated in the background
+        await self.settle(catalog)
+        self.assertTrue(cached.failed)
+        with self.assertRaises(Exception):
+            await catalog.event('forum')
+        self.server.failing = False
+        self.assertIs(await catalog.event('forum'), cached)  # 304 clears the failure
+        self.assertFalse(cached.failed)
+
+    async def test_snapshot_round_trip(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        await catalog.event('forum')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'markets.json')
+            catalog.save(path)
+
+            restored = MarketCatalog(self.http, ttl=60, snapshot_path=path)
+            self.assertEqual(restored.load(), 1)
+            self.assertEqual(restored.token('112')[1], 1)
+            self.assertEqual((await restored.find('forum', 'abraham')).best_ask, 0.42)
+            self.assertEqual(len(self.server.requests), 1)  # Warm start: no request
+
+            old = MarketCatalog(self.http, ttl=60, snapshot_path=path)
+            old.load()
+            old.cached('forum').fetched_at = time.time() - 3 * 86400  # A days-old snapshot
+            self.server.failing = True
+            with self.assertRaises(Exception):
+                await old.find('forum', 'abraham')
+            self.server.failing = False
+            self.assertEqual((await old.find('forum', 'abraham')).best_ask, 0.42)
+            self.assertEqual(self.server.requests[-1], '"v1"')  # Revalidated with the snapshot's ETag
+
+    async def test_missing_event(self):
+        catalog = MarketCatalog(self.http, ttl=60)
+        self.assertIsNone(await catalog.event('nope'))
+        self.assertIsNone(await catalog.find('nope', 'abraham'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+Order book tests: replays recorded market channel messages through a local
+WebSocket stand-in and checks the books, reconnects and stale flags.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from index import priceOrderFromBook  # noqa: E402
+from orderbook import BookSide, MarketBookClient, OrderBook  # noqa: E402
+from wsclient import (OP_CLOSE, OP_CONTINUATION, OP_PING, OP_PONG, OP_TEXT, WebSocketConnection,  # noqa: E402
+                      encode_frame)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'market_channel.jsonl')
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+DROP = 'drop'  # Script step: cut the TCP connection
+REJECT = 'reject'  # Script step: refuse the WebSocket handshake
+
+
+def recorded_messages() -> list[str]:
+    with open(FIXTURE) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class MarketChannelStub:
+    """Local stand-in for the market channel; each connection plays the next script.
+
+    A script is a list of text messages and DROP / REJECT steps. After its messages the
+    connection stays open until the client goes away.
+    """
+
+    def __init__(self, scripts: list[list[str]]):
+        self.scripts = scripts
+        self.subscriptions = []
+        self.pongs = []
+        self.connections = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return f'ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/ws/market'
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        script = self.scripts[min(self.connections, len(self.scripts) - 1)]
+        self.connections += 1
+        request = (await reader.readuntil(b'\r\n\r\n')).decode()
+        if script and script[0] == REJECT:
+            writer.write(b'HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n')
+            writer.close()
+            return
+        key = next(line.split(':', 1)[1].strip() for line in request.split('\r\n')
+                   if line.lower().startswith('sec-websocket-key'))
+        accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode())
+        connection = WebSocketConnection(reader, writer)
+        try:
+            _, _, payload = await connection._read_frame()
+        except asyncio.IncompleteReadError:
+            return  # Client stopped before subscribing
+        self.subscriptions.append(json.loads(payload))
+        writer.write(encode_frame(OP_PING, b'keepalive', mask=False))
+        for step in script:
+            if step == DROP:
+                writer.transport.abort()
+                return
+            data = step.encode()
+            # Send the long messages fragmented, as servers may
+            if len(data) > 300:
+                writer.write(bytes([OP_TEXT]) + encode_frame(OP_TEXT, data[:100], mask=False)[1:])
+                writer.write(bytes([OP_CONTINUATION]) + encode_frame(OP_CONTINUATION, data[100:200], mask=False)[1:])
+                writer.write(encode_frame(OP_CONTINUATION, data[200:], mask=False))
+            else:
+                writer.write(encode_frame(OP_TEXT, data, mask=False))
+        await writer.drain()
+        try:
+            while True:
+                _, opcode, payload = await connection._read_frame()
+                if opcode == OP_PONG:
+                    self.pongs.append(payload)
+                elif opcode == OP_CLOSE:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+
+async def until(condition, timeout: float = 3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError('condition not reached in time')
+        await asyncio.sleep(0.01)
+
+
+class BookSideTest(unittest.TestCase):
+    def test_matches_sorted_reference(self):
+        rnd = random.Random(7)
+        for is_bid in (True, False):
+            side, reference = BookSide(is_bid), {}
+            for _ in range(20000):
+                price = rnd.randint(1, 200) / 1000
+                size = rnd.choice([0, 0, 1, 5, 10])
+                side.set(price, size)
+                if size:
+                    reference[price] = float(size)
+                else:
+                    reference.pop(price, None)
+                if rnd.random() < 0.05:
+                    expected = sorted(reference.items(), reverse=is_bid)
+                    self.assertEqual(side.levels(), expected)
+                    self.assertEqual(side.best(), expected[0] if expected else None)
+            self.assertEqual(len(side), len(reference))
+            self.assertLessEqual(len(side._heap), 2 * len(reference) + 64)
+
+    def test_fill_price_walks_depth(self):
+        side = BookSide(is_bid=False)
+        for price, size in ((0.53, 2), (0.55, 500), (0.52, 1)):
+            side.set(price, size)
+        self.assertEqual(side.fill_price(1), 0.52)
+        self.assertEqual(side.fill_price(3), 0.53)
+        self.assertEqual(side.fill_price(4), 0.55)
+        self.assertIsNone(side.fill_price(1000))
+
+
+class PriceOrderFromBookTest(unittest.TestCase):
+    def book(self, asks) -> OrderBook:
+        book = OrderBook('1')
+        book.apply_snapshot([{'price': '0.40', 'size': '100'}], [{'price': p, 'size': s} for p, s in asks])
+        book.tick_size = 0.01
+        return book
+
+    def test_prices_the_size_against_the_depth(self):
+        book = self.book([('0.50', '1'), ('0.52', '10')])
+        self.assertEqual(priceOrderFromBook(book, 1.0), (0.52, 2))
+
+    def test_shallow_asks_are_not_priced(self):
+        book = self.book([('0.05', '3'), ('0.90', '2')])
+        # $1 at the 0.05 touch needs 20 shares; only 5 rest on the asks
+        self.assertIsNone(priceOrderFromBook(book, 1.0))
+
+    def test_stale_or_empty_book_is_not_priced(self):
+        book = self.book([('0.50', '10')])
+        book.stale = True
+        self.assertIsNone(priceOrderFromBook(book, 1.0))
+        self.assertIsNone(priceOrderFromBook(self.book([]), 1.0))
+
+
+class MarketBookClientTest(unittest.IsolatedAsyncioTestCase):
+    async def start(self, scripts):
+        self.stub = MarketChannelStub(scripts)
+        url = await self.stub.start()
+        self.client = MarketBookClient(['111', '222'], url=url)
+        self.client.backoff = lambda failures: 0.05
+        self.client.start()
+
+    async def asyncTearDown(self):
+        await self.client.stop()
+        await self.stub.stop()
+
+    async def test_snapshot_and_deltas(self):
+        messages = recorded_messages()
+        await self.start([messages])
+        await until(lambda: self.client.messages == 6)
+        a, b = self.client.books['111'], self.client.books['222']
+        self.assertEqual(self.stub.subscriptions, [{'assets_ids': ['111', '222'], 'type': 'market'}])
+        self.assertEqual(a.bids.levels(), [(0.49, 5.0), (0.48, 30.0), (0.47, 100.0)])
+        self.assertEqual(a.asks.levels(), [(0.53, 2.0), (0.55, 500.0)])
+        self.assertEqual((a.best_bid(), a.best_ask(), a.spread()), (0.49, 0.53, 0.04))
+        self.assertEqual((a.hash, a.timestamp, a.tick_size, a.last_trade_price), ('h4', 1001, 0.001, 0.52))
+        self.assertEqual(b.bids.levels(), [(0.5, 10.0)])
+        self.assertEqual(b.asks.levels(), [(0.505, 3.0), (0.51, 10.0)])
+        self.assertEqual((a.price_to_buy(3), a.price_to_sell(20)), (0.55, 0.48))
+        self.assertFalse(a.stale or b.stale)
+        await until(lambda: self.stub.pongs == [b'keepalive'])
+
+    async def test_reconnects_after_drop(self):
+        snapshot, *_ = recorded_messages()
+        second = json.dumps([{'event_type': 'book', 'asset_id': '111', 'bids': [{'price': '0.40', 'size': '7'}],
+                              'asks': [{'price': '0.60', 'size': '8'}], 'timestamp': '2000', 'hash': 'h9'}])
+        await self.start([[snapshot, DROP], [second]])
+        book = self.client.books['111']
+        await until(lambda: self.stub.connections == 2 and book.hash == 'h9')
+        self.assertEqual((book.best_bid(), book.best_ask()), (0.4, 0.6))
+        self.assertEqual(len(self.stub.subscriptions), 2)
+        self.assertFalse(book.stale)
+        # Token 222 had no snapshot since the drop
+        self.assertTrue(self.client.books['222'].stale)
+
+    async def test_malformed_message_marks_stale_and_resubscribes(self):
+        snapshot, *_ = recorded_messages()
+        malformed = json.dumps({'event_type': 'price_change', 'price_changes': [{'asset_id': '111', 'side': 'BUY'}]})
+        await self.start([[snapshot, malformed], []])
+        await until(lambda: self.stub.connections == 2)
+        self.assertTrue(self.client.books['111'].stale)
+        # Deltas are not applied until a new snapshot arrives
+        self.client.handle({'event_type': 'price_change', 'price_changes': [
+            {'asset_id': '111', 'price': '0.30', 'size': '1', 'side': 'BUY'}]})
+        self.assertNotIn((0.3, 1.0), self.client.books['111'].bids.levels())
+
+    async def test_retries_rejected_handshake(self):
+        snapshot, *_ = recorded_messages()
+        await self.start([[REJECT], [snapshot]])
+        book = await self.client.wait_ready('111', timeout=3)
+        self.assertIsNotNone(book)
+        self.assertEqual(self.stub.connections, 2)
+        self.assertFalse(book.stale)
+
+
+if __name__ == '__main__':
+    unittest.main()
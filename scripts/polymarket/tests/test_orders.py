@@ -0,0 +1,172 @@
+"""
+Order posting tests against a local CLOB stub: batches, per-order replies,
+the single-order fallback, 429 retries, and which failures are reported as
+not placed versus unknown.
+Run with: python -m pytest tests
+"""
+
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_account import Account
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from index import MAX_BATCH_ORDERS, ClobClient  # noqa: E402
+from transport import AsyncHttpClient  # noqa: E402
+
+TOKEN = '1234567890'
+
+
+class ClobStub(BaseHTTPRequestHandler):
+    """POST /order and /orders; server.replies[path] is a list of (status, reply) consumed in order.
+
+    A reply of None places every order and echoes its salt; 'reset' drops the connection after
+    reading the request. Once a path's list is empty it keeps placing orders.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.posts.append((self.path, body))
+            scripted = server.replies.get(self.path)
+            status, reply = scripted.pop(0) if scripted else (200, None)
+        if reply == 'reset':
+            self.close_connection = True
+            return
+        if reply is None:
+            placed = [{'success': True, 'orderID': f"0x{payload['order']['salt']:x}"}
+                      for payload in (body if isinstance(body, list) else [body])]
+            reply = placed if isinstance(body, list) else placed[0]
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def order(size: float = 10, side: str = 'BUY') -> tuple[dict, dict]:
+    return {'tokenID': TOKEN, 'price': 0.5, 'size': size, 'side': side}, {'tickSize': '0.01', 'negRisk': False}
+
+
+class CreateAndPostOrdersTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ClobStub)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.posts = []
+        self.server.replies = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = self.make_client(f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def make_client(url: str) -> ClobClient:
+        account = Account.from_key('0x' + secrets.token_hex(32))
+        return ClobClient(url, 137, account, {'key': 'test'}, 1, account.address, http=AsyncHttpClient(url))
+
+    def posted_salts(self) -> list[int]:
+        return [payload['order']['salt'] for path, body in self.server.posts
+                for payload in (body if isinstance(body, list) else [body])]
+
+    async def test_orders_go_out_in_batches(self):
+        results = await self.client.createAndPostOrders([order() for _ in range(2 * MAX_BATCH_ORDERS + 1)], 'GTC')
+        paths = sorted((path, len(body) if isinstance(body, list) else 1) for path, body in self.server.posts)
+        # A lone leftover order goes through POST /order
+        self.assertEqual(paths, [('/order', 1), ('/orders', MAX_BATCH_ORDERS), ('/orders', MAX_BATCH_ORDERS)])
+        self.assertTrue(all(result['success'] for result in results))
+
+    async def test_results_keep_the_order_of_the_input(self):
+        orders = [order(size=i + 1) for i in range(MAX_BATCH_ORDERS * 2)]
+        results = await self.client.createAndPostOrders(orders, 'GTC')
+        sizes = {payload['order']['salt']: int(payload['order']['takerAmount'])
+                 for _, body in self.server.posts for payload in body}
+        by_id = {f'0x{salt:x}': size for salt, size in sizes.items()}
+        self.assertEqual([by_id[result['orderID']] for result in results],
+                         [(i + 1) * 10 ** 6 for i in range(MAX_BATCH_ORDERS * 2)])
+
+    async def test_partial_batch_reports_each_order(self):
+        replies = [{'success': True, 'orderID': '0x1'}, {'success': False, 'errorMsg': 'not enough balance'},
+                   {'success': True, 'orderID': '0x3'}]
+        self.server.replies['/orders'] = [(200, replies)]
+        results = await self.client.createAndPostOrders([order(), order(), order()], 'GTC')
+        self.assertEqual(results, replies)
+
+    async def test_ambiguous_batch_reply_is_unknown(self):
+        self.server.replies['/orders'] = [(200, {'success': True})]
+        results = await self.client.createAndPostOrders([order(), order()], 'GTC')
+        self.assertEqual([result['status'] for result in results], ['unknown', 'unknown'])
+        self.assertEqual(results[0]['response'], {'success': True})
+
+    async def test_missing_batch_endpoint_falls_back_to_single_orders(self):
+        self.server.replies['/orders'] = [(404, {'error': 'not found'})]
+        results = await self.client.createAndPostOrders([order(), order(), order()], 'GTC')
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual([path for path, _ in self.server.posts].count('/order'), 3)
+
+    async def test_rate_limited_batch_is_retried(self):
+        self.server.replies['/orders'] = [(429, {'error': 'too many requests'})]
+        results = await self.client.createAndPostOrders([order(), order()], 'GTC')
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(self.client.limiter.retries, 1)
+        self.assertEqual(len(self.server.posts), 2)
+
+    async def test_rejected_batch_is_failed(self):
+        self.server.replies['/orders'] = [(400, {'error': 'invalid order'})]
+        results = await self.client.createAndPostOrders([order(), order()], 'GTC')
+        self.assertEqual([result['success'] for result in results], [False, False])
+
+    async def test_server_error_is_unknown(self):
+        for status in (500, 502, 503, 504):
+            self.server.replies['/orders'] = [(status, {'error': 'gateway'})]
+            self.server.replies['/order'] = [(status, {'error': 'gateway'})]
+            # A full batch through /orders and a lone leftover through /order
+            results = await self.client.createAndPostOrders([order() for _ in range(MAX_BATCH_ORDERS + 1)], 'GTC')
+            self.assertEqual({result['status'] for result in results}, {'unknown'}, status)
+
+    async def test_connection_lost_after_sending_is_unknown(self):
+        self.server.replies['/orders'] = [(200, 'reset')]
+        self.server.replies['/order'] = [(200, 'reset')]
+        results = await self.client.createAndPostOrders([order(), order(), order()], 'GTC')
+        self.assertEqual([result['status'] for result in results], ['unknown'] * 3)
+
+    async def test_connection_refused_is_failed(self):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        client = self.make_client(f'http://127.0.0.1:{port}')
+        try:
+            results = await client.createAndPostOrders([order(), order()], 'GTC')
+        finally:
+            client.close()
+        self.assertEqual([result['success'] for result in results], [False, False])
+
+    async def test_invalid_order_fails_alone(self):
+        results = await self.client.createAndPostOrders([order(), order(side='HOLD'), order()], 'GTC')
+        self.assertFalse(results[1]['success'])
+        self.assertIn('Invalid order', results[1]['errorMsg'])
+        self.assertTrue(results[0]['success'] and results[2]['success'])
+        self.assertEqual(len(self.posted_salts()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
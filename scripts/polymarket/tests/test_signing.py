@@ -0,0 +1,85 @@
+"""
+Order signing tests: signatures from the cached-domain signer match the
+eth_account typed-data reference on both exchanges, batches keep their order,
+and invalid prices, sizes and sides are refused before anything is signed.
+Run with: python -m pytest tests
+"""
+
+import os
+import secrets
+import sys
+import unittest
+
+from eth_account import Account
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from signing import BUY, SELL, OrderSigner, order_amounts, sign_per_call  # noqa: E402
+
+TOKEN = '71321045679252212594626385532706912750332728571942532289631379312455583992563'
+
+
+class OrderSignerTest(unittest.TestCase):
+    def setUp(self):
+        key = '0x' + secrets.token_hex(32)
+        self.account = Account.from_key(key)
+        self.signer = OrderSigner(key, chain_id=137)
+
+    def test_signatures_match_the_eth_account_reference(self):
+        orders = [self.signer.build(TOKEN, 0.52, 10, 'BUY'), self.signer.build(TOKEN, 0.07, 123.45, 'SELL', nonce=3,
+                                                                                  expiration=1900000000)]
+        for order in orders:
+            for neg_risk in (False, True):
+                signed = self.signer.sign(order, neg_risk)
+                self.assertEqual(signed['signature'], sign_per_call(self.account, order, 137, neg_risk))
+
+    def test_other_chain_and_funder(self):
+        key = '0x' + secrets.token_hex(32)
+        funder = Account.create().address
+        signer = OrderSigner(key, chain_id=80002, funder=funder, signature_type=2)
+        order = signer.build(TOKEN, 0.5, 2, 'BUY')
+        self.assertEqual(order['maker'], funder)
+        self.assertEqual(signer.sign(order)['signature'], sign_per_call(Account.from_key(key), order, 80002))
+
+    def test_batch_keeps_the_input_order(self):
+        orders = [(self.signer.build(TOKEN, 0.5, i + 1, 'BUY'), i % 2 == 0) for i in range(5)]
+        self.assertEqual(self.signer.sign_batch(orders, workers=1),
+                         [self.signer.sign(order, neg_risk) for order, neg_risk in orders])
+
+    def test_signed_side_is_named(self):
+        order = self.signer.build(TOKEN, 0.5, 1, 'SELL')
+        self.assertEqual(order['side'], SELL)
+        self.assertEqual(self.signer.sign(order)['side'], 'SELL')
+        self.assertEqual(self.signer.build(TOKEN, 0.5, 1, 'BUY')['side'], BUY)
+
+    def test_invalid_side(self):
+        with self.assertRaises(ValueError):
+            self.signer.build(TOKEN, 0.5, 1, 'buy')
+
+
+class OrderAmountsTest(unittest.TestCase):
+    def test_buy_and_sell_amounts(self):
+        self.assertEqual(order_amounts('BUY', 0.52, 10), (5_200_000, 10_000_000))
+        self.assertEqual(order_amounts('SELL', 0.52, 10), (10_000_000, 5_200_000))
+        self.assertEqual(order_amounts('BUY', 0.555, 3.999, tick_size='0.001'), (2_214_450, 3_990_000))
+
+    def test_price_must_be_on_the_tick(self):
+        with self.assertRaises(ValueError):
+            order_amounts('BUY', 0.525, 10)
+        with self.assertRaises(ValueError):
+            order_amounts('BUY', 0.55, 10, tick_size='0.1')
+
+    def test_price_must_be_within_one_tick_of_the_bounds(self):
+        for price in (0, 0.001, 1, 0.995, 1.5, -0.5):
+            with self.assertRaises(ValueError, msg=price):
+                order_amounts('BUY', price, 10)
+        order_amounts('BUY', 0.01, 10)
+        order_amounts('SELL', 0.99, 10)
+
+    def test_size_must_hold_a_share_hundredth(self):
+        with self.assertRaises(ValueError):
+            order_amounts('BUY', 0.5, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
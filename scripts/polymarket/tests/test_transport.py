@@ -0,0 +1,98 @@
+"""
+Transport tests against a local http.server stub: concurrent requests must
+overlap, reuse pooled keep-alive connections and leave the event loop free.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from transport import AsyncHttpClient  # noqa: E402
+
+DELAY = 0.2  # Seconds the stub takes to answer each request
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        time.sleep(DELAY)
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncHttpClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+        self.server.daemon_threads = True
+        self.server.clients = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.http = AsyncHttpClient(f'http://127.0.0.1:{self.server.server_port}', max_in_flight=16)
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def fetch_all(self, count: int) -> float:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(self.http.get(f'/item/{i}') for i in range(count)))
+        elapsed = time.perf_counter() - start
+        self.assertEqual([r.json()['path'] for r in responses], [f'/item/{i}' for i in range(count)])
+        return elapsed
+
+    async def test_requests_overlap(self):
+        elapsed = await self.fetch_all(32)
+        # 32 requests, 16 at a time: two rounds, not 32 sequential delays
+        self.assertLess(elapsed, 32 * DELAY / 4)
+
+    async def test_connections_are_pooled_and_reused(self):
+        await self.fetch_all(16)
+        first_round = set(self.server.clients)
+        self.assertLessEqual(len(first_round), 16)
+        await self.fetch_all(16)
+        # The second burst goes over the connections the first one opened
+        self.assertEqual(self.server.clients, first_round)
+
+    async def test_threads_have_their_own_sessions_over_one_adapter(self):
+        await self.fetch_all(16)
+        sessions = self.http._sessions
+        self.assertGreater(len(sessions), 1)
+        self.assertLessEqual(len(sessions), 16)
+        self.assertEqual(len({id(session) for session in sessions}), len(sessions))
+        for session in sessions:
+            self.assertIs(session.get_adapter('http://127.0.0.1/'), self.http.adapter)
+
+    async def test_event_loop_not_blocked(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await self.fetch_all(4)
+        task.cancel()
+        self.assertGreater(ticks, DELAY / 0.01 / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
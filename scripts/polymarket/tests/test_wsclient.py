@@ -0,0 +1,87 @@
+"""
+WebSocket client tests against a local server: fragmented messages are
+reassembled, and messages over the size limit close the connection with 1009
+before their payload is read.
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wsclient import (CLOSE_TOO_BIG, OP_CLOSE, OP_CONTINUATION, OP_TEXT, WebSocketConnection,  # noqa: E402
+                      WebSocketError, encode_frame)
+
+
+def fragment(opcode: int, payload: bytes, final: bool) -> bytes:
+    frame = encode_frame(opcode, payload, mask=False)
+    return frame if final else bytes([frame[0] & 0x7F]) + frame[1:]
+
+
+class WebSocketLimitTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.frames = b''
+        self.closes = []
+        self.sent = asyncio.Event()
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        port = self.server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        self.connection = WebSocketConnection(reader, writer, max_message_size=1000)
+
+    async def asyncTearDown(self):
+        await self.connection.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Sends self.frames, then records the client's close code."""
+        await self.sent.wait()
+        writer.write(self.frames)
+        await writer.drain()
+        peer = WebSocketConnection(reader, writer)
+        try:
+            while True:
+                _, opcode, payload = await peer._read_frame()
+                if opcode == OP_CLOSE:
+                    self.closes.append(struct.unpack('!H', payload[:2])[0])
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+    async def receive(self, frames: bytes):
+        self.frames = frames
+        self.sent.set()
+        return await asyncio.wait_for(self.connection.recv(), 5)
+
+    async def test_fragmented_message_within_the_limit(self):
+        message = await self.receive(fragment(OP_TEXT, b'a' * 400, False) + fragment(OP_CONTINUATION, b'b' * 400, False)
+                                     + fragment(OP_CONTINUATION, b'c' * 200, True))
+        self.assertEqual(message, 'a' * 400 + 'b' * 400 + 'c' * 200)
+
+    async def test_oversized_frame_closes_with_1009(self):
+        # Only the header: a 64-bit length the client must not try to read
+        with self.assertRaises(WebSocketError):
+            await self.receive(bytes([0x80 | OP_TEXT, 127]) + struct.pack('!Q', 1 << 40))
+        self.assertTrue(self.connection.closed)
+        await asyncio.wait_for(self._closed(), 5)
+        self.assertEqual(self.closes, [CLOSE_TOO_BIG])
+
+    async def test_fragments_over_the_limit_close_with_1009(self):
+        frames = b''.join(fragment(OP_TEXT if i == 0 else OP_CONTINUATION, b'x' * 300, False) for i in range(4))
+        with self.assertRaises(WebSocketError):
+            await self.receive(frames)
+        await asyncio.wait_for(self._closed(), 5)
+        self.assertEqual(self.closes, [CLOSE_TOO_BIG])
+
+    async def _closed(self):
+        while not self.closes:
+            await asyncio.sleep(0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()